@@ -3,6 +3,7 @@ import numpy
 import os
 
 from ssapy.strategies.downHillSimplex import downHillSS
+from ssapy.strategies.quasiNewton import quasiNewtonSS
 
 from ssapy import listBundles, msListRevenue, msDictRevenue
 from ssapy.pricePrediction.jointGMM import expectedSurplus_
@@ -44,6 +45,11 @@ def main():
                         required=False, default=-1,type=int,
                         help='Limit the number of evaluation samples used.')
     
+    parser.add_argument('-meth','--method',dest='method',
+                        required=False, default='nelderMead', type=str,
+                        choices=['nelderMead','quasiNewton'],
+                        help='Optimizer: Nelder-Mead simplex or smoothed L-BFGS-B.')
+    
     parser.add_argument('--verbose',dest='verbose',
                         required=False,default=False,
                         type=bool,help='Output debugg information')
@@ -75,10 +81,16 @@ def main():
         print 'iteration {0}'.format(itr)
         bundleRevenueDict = msDictRevenue(v,l)
         
-        bid = downHillSS(bundleRevenueDict,
-                         initBid = initBid,
-                         evalSamples = jointSamples,
-                         ret = 1) 
+        if args.method == 'quasiNewton':
+            bid = quasiNewtonSS(bundleRevenueDict,
+                                initBid = initBid,
+                                evalSamples = jointSamples,
+                                ret = 1)
+        else:
+            bid = downHillSS(bundleRevenueDict,
+                             initBid = initBid,
+                             evalSamples = jointSamples,
+                             ret = 1) 
         
         print '\t bid = {0}'.format(bid)
             
@@ -5,7 +5,7 @@ from .marketSchedule import straightMU as msStraightMU
 from .marketSchedule import straightMV as msStraightMV
 from .marketSchedule import targetPrice as msTargetPrice
 from .marketSchedule.condMVLocal import condMVLocal as msCondMVLocal
-from .marketSchedule.jointLocal import jointLocal
+from .marketSchedule.jointLocal import jointLocal, jointLocalExact
 
 
 
@@ -33,6 +33,8 @@ def agentFactory(**kwargs):
         return msCondMVLocal(**kwargs)
     elif agentType == "jointLocal":
         return jointLocal(**kwargs)
+    elif agentType == "jointLocalExact":
+        return jointLocalExact(**kwargs)
     else:
         raise ValueError("Unknown Agent Type {0}".format(agentType))
     
@@ -33,7 +33,59 @@ def randomValueVector(vmin = 1, vmax = 50, m = 5, l = None):
     
     v[(l-1):] = sortedRandInts
 
-    return v, l 
+    return v, l
+
+def randomValueVectors(vmin = 1, vmax = 50, m = 5, l = None, size = 1):
+    """
+    Vectorized version of randomValueVector. Draws numpy.prod(size) independent
+    value vectors in one call.
+
+    Parameters
+    ----------
+    vmin, vmax: int
+        Range of the random integer values.
+
+    m: int
+        Number of goods.
+
+    l: int or None
+        If None, each valuation draws its own lambda uniformly from 1..m.
+
+    size: int or tuple of ints
+        Leading shape of the returned arrays, e.g. (nGames, nAgents).
+
+    Returns
+    -------
+    v: ndarray, shape size + (m,)
+        v[...,:] is a value vector distributed as randomValueVector(...)[0]
+
+    l: ndarray, shape size
+        The lambda used for each value vector.
+    """
+    size = tuple(numpy.atleast_1d(size))
+
+    if l is None:
+        l = numpy.random.random_integers(low = 1, high = m, size = size)
+    else:
+        l = numpy.ones(size, dtype = int)*l
+
+    # only the last m-l+1 slots receive a value; push the unused
+    # draws to the end of each row before sorting in descending order
+    randInts = numpy.random.random_integers(low = vmin, high = vmax, size = size + (m,)).astype(numpy.float)
+
+    slots = numpy.arange(m)
+    randInts[slots < (l[...,numpy.newaxis] - 1)] = -numpy.inf
+
+    randInts = randInts.reshape(-1,m)
+    randInts = -numpy.sort(-randInts,1)
+
+    srcIdx = (slots - (l[...,numpy.newaxis]-1)).reshape(-1,m)
+    rows   = numpy.arange(randInts.shape[0])[:,numpy.newaxis]
+
+    v = randInts[rows, srcIdx.clip(0)]
+    v[srcIdx < 0] = 0.0
+
+    return v.reshape(size + (m,)), l
 
 def listRevenue(bundles, v, l):
     """Compute the revenue (valuation) for a given 
@@ -76,6 +128,38 @@ def listRevenue(bundles, v, l):
             
     return numpy.atleast_1d(valuation)
 
+def batchRevenue(bundles, v, l):
+    """
+    Row-wise listRevenue for many (bundle, valuation) pairs at once.
+
+    Parameters
+    ----------
+    bundles: array_like, shape (n, n_goods)
+        bundles[i] is evaluated under value vector v[i] and lambda l[i]
+
+    v: array_like, shape (n, n_goods)
+        Value vectors.
+
+    l: int or array_like, shape (n)
+        Minimal number of goods needed to obtain value.
+
+    Returns
+    -------
+    revenue: array_like, shape (n)
+    """
+    bundles = numpy.atleast_2d(bundles)
+    v       = numpy.atleast_2d(v)
+    l       = numpy.ones(bundles.shape[0], dtype = int)*l
+
+    reached = numpy.cumsum(bundles, 1) >= l[:,numpy.newaxis]
+
+    t = numpy.argmax(reached, 1)
+
+    revenue = v[numpy.arange(v.shape[0]), t]
+    revenue[~reached[:,-1]] = 0
+
+    return revenue
+
 def dictRevenue(v, l):
     
     m = numpy.asarray(v).shape[0]
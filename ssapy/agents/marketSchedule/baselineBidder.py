@@ -27,7 +27,18 @@ class baselineBidder(msAgent):
         for i in xrange(self.m):
             if i < self.l:
                 bids[i] = float(self.v[self.l-1]/self.l)
-                
+
+        return bids
+
+    def batchBid(self, v, l, **kwargs):
+        v = numpy.atleast_2d(v).astype(numpy.float)
+        l = numpy.ones(v.shape[0], dtype = int)*l
+
+        rows = numpy.arange(v.shape[0])
+
+        bids = (v[rows,l-1]/l)[:,numpy.newaxis]*numpy.ones(v.shape)
+        bids[numpy.arange(v.shape[1]) >= l[:,numpy.newaxis]] = 0.0
+
         return bids
             
         
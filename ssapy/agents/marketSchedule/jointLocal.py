@@ -2,6 +2,7 @@ import numpy
 from ssapy.agents.marketSchedule import listRevenue
 from ssapy.pricePrediction import jointGMM
 from ssapy.strategies.jointLocal import jointLocal as jointLocalStrategy
+from ssapy.strategies.jointLocal import jointLocalExact as jointLocalExactStrategy
 from ssapy.util import listBundles
 from ssapy.strategies.strategyFactory import strategyFactory
 
@@ -48,4 +49,69 @@ class jointLocal(msAgent):
         
         samples         = pricePrediction.sample(n_samples = nsamples)
         
-        return jointLocalStrategy(bundles, revenue, initBids, samples, maxItr, tol, verbose, ret)          
\ No newline at end of file
+        return jointLocalStrategy(bundles, revenue, initBids, samples, maxItr, tol, verbose, ret)
+    
+class jointLocalExact(jointLocal):
+    """
+    jointLocal agent which integrates the win pattern probabilities of the 
+    price prediction (e.g. jointGMM.otherBundleProbabilities) instead of sampling.
+    
+    Each update integrates the 2**(m-1) win patterns of the other goods once 
+    per mixture component. With method = 'lattice' (default) a deterministic 
+    quasi Monte Carlo rule of nShifts*nPoints points is used, so bids do not 
+    jitter and converge to tol; the defaults (nPoints = 250, nShifts = 4) are 
+    accurate to a few 1e-4 in probability, about 20 times better than 10000 
+    samples. With m = 5 and a 2 component jointGMM a bid takes a few tenths 
+    of a second. method = 'mvndst' uses maxpts, abseps and releps instead; 
+    its integrals are randomized, tol must then be larger than the 
+    integration error.
+    """
+    def __init__(self, **kwargs):
+        super(jointLocalExact, self).__init__(**kwargs)
+        
+        self.method  = kwargs.get('method', 'lattice')
+        
+        self.nPoints = kwargs.get('nPoints', 250)
+        
+        self.nShifts = kwargs.get('nShifts', 4)
+        
+        self.maxpts  = kwargs.get('maxpts')
+        
+        self.abseps  = kwargs.get('abseps', 1e-3)
+        
+        self.releps  = kwargs.get('releps', 1e-3)
+        
+    def bid(self, **kwargs):
+        pricePrediction = kwargs.get('pricePrediction', self.pricePrediction)
+        
+        bundles         = kwargs.get('bundles', self.listBundles())
+        
+        revenue         = kwargs.get('revenue', listRevenue(bundles, self.v, self.l))
+        
+        initStrategy    = kwargs.get('initStrategy', self.initStrategy)
+        
+        maxItr          = kwargs.get('maxItr', self.maxItr)
+        
+        tol             = kwargs.get('tol', self.tol)
+        
+        verbose         = kwargs.get('verbose', self.verbose)
+        
+        ret             = kwargs.get('ret', self.ret)
+        
+        method          = kwargs.get('method', self.method)
+        
+        if method == 'lattice':
+            accuracy = {'nPoints' : kwargs.get('nPoints', self.nPoints),
+                        'nShifts' : kwargs.get('nShifts', self.nShifts)}
+        else:
+            accuracy = {'abseps' : kwargs.get('abseps', self.abseps),
+                        'releps' : kwargs.get('releps', self.releps)}
+            
+            maxpts = kwargs.get('maxpts', self.maxpts)
+            if maxpts is not None:
+                accuracy['maxpts'] = maxpts
+        
+        initBids        = kwargs.get('initBids',initStrategy(bundles, revenue, pricePrediction))
+        
+        return jointLocalExactStrategy(bundles, revenue, initBids, pricePrediction, 
+                                       maxItr, tol, verbose, ret, method = method, **accuracy)
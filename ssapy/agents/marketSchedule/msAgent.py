@@ -98,7 +98,40 @@ class msAgent(agentBase):
         l    = kwargs.get('l')
         
         self.v, self.l = randomValueVector_(vmin, vmax, m, l)
-        
+
+    def batchBid(self, v, l, **kwargs):
+        """
+        Compute one bid for each row of a block of valuations.
+
+        The default implementation assigns each valuation to the agent in turn
+        and calls bid(...). Agents whose strategy can be evaluated for many
+        valuations at once should override this function.
+
+        INPUTS:
+            v        := (2d array-like) value vectors, shape (nValuations, m)
+
+            l        := (int or 1d array-like) lambda for each value vector
+
+            kwargs   := passed through to bid(...)
+
+        RETURNS:
+            bids     := (2d array-like) shape (nValuations, m)
+        """
+        v = numpy.atleast_2d(v)
+        l = numpy.ones(v.shape[0], dtype = int)*l
+
+        bids = numpy.zeros(v.shape)
+
+        vOld, lOld = self.v, self.l
+        for idx in xrange(v.shape[0]):
+            self.v = v[idx]
+            self.l = l[idx]
+            bids[idx,:] = self.bid(**kwargs)
+
+        self.v, self.l = vOld, lOld
+
+        return bids
+
 #    def revenue(self):
 #        return listRevenue(bundles, v, l)
 #    
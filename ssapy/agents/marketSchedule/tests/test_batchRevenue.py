@@ -0,0 +1,18 @@
+import unittest
+import numpy
+
+from ssapy.agents.marketSchedule import batchRevenue, listRevenue, randomValueVectors
+from ssapy.util import listBundles
+
+class test_batchRevenue(unittest.TestCase):
+    def test_batchRevenue(self):
+        m = 5
+        bundles = listBundles(m)
+        v, l = randomValueVectors(vmin = 1, vmax = 50, m = m, size = 20)
+        
+        for vi, li in zip(v,l):
+            numpy.testing.assert_equal(batchRevenue(bundles, numpy.tile(vi,(bundles.shape[0],1)), li),
+                                       listRevenue(bundles, vi, li))
+            
+if __name__ == "__main__":
+    unittest.main()
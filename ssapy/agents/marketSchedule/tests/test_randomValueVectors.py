@@ -0,0 +1,34 @@
+import unittest
+import numpy
+
+from ssapy.agents.marketSchedule import randomValueVectors
+
+class test_randomValueVectors(unittest.TestCase):
+    def test_shape(self):
+        v, l = randomValueVectors(vmin = 1, vmax = 50, m = 5, size = (10,8))
+        
+        numpy.testing.assert_equal(v.shape, (10,8,5))
+        numpy.testing.assert_equal(l.shape, (10,8))
+        
+    def test_structure(self):
+        """
+        Goods before slot l-1 have zero value, the remaining m-l+1 values
+        are drawn from [vmin,vmax] and sorted in descending order.
+        """
+        m = 5
+        v, l = randomValueVectors(vmin = 1, vmax = 50, m = m, size = 1000)
+        
+        for vi, li in zip(v,l):
+            numpy.testing.assert_equal(vi[:li-1], 0.)
+            numpy.testing.assert_(numpy.all(vi[li-1:] >= 1))
+            numpy.testing.assert_(numpy.all(vi[li-1:] <= 50))
+            numpy.testing.assert_(numpy.all(numpy.diff(vi[li-1:]) <= 0))
+            
+    def test_fixedLambda(self):
+        v, l = randomValueVectors(vmin = 1, vmax = 50, m = 5, l = 3, size = 100)
+        
+        numpy.testing.assert_equal(l, 3)
+        numpy.testing.assert_equal(v[:,:2], 0.)
+        
+if __name__ == "__main__":
+    unittest.main()
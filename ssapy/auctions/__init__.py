@@ -1,16 +1,75 @@
 __all__ = ["auctionBase", "simultaneousAuctions"]
 
 from ssapy.agents.agentFactory import agentFactory
+from ssapy.agents.marketSchedule import randomValueVectors as msRandomValueVectors
+from ssapy.util.sharedModel import sharedModel, attachModel, sharedDir
+from ssapy.util.chunkScheduler import dynamicMap
 
 import multiprocessing
 import numpy
+import tempfile
+import os
 
 def collectBids(agentList):
     
     bids = [agent.bid() for agent in agentList]
     return numpy.atleast_2d(bids)
 
+def reduceBids(bids, retType = 'firstPrice', selfIdx = None):
+    """
+    Reduce a tensor of bids to the requested auction statistic for every game at once.
+    
+    Parameters
+    ----------
+    bids: array_like, shape (nGames, nAgents, m)
+        bids[g,a,:] is the bid vector of agent a in game g.
+        
+    retType: string, optional - default = 'firstPrice'
+        'bids', 'firstPrice', 'secondPrice' or 'hob' (see simulateAuction)
+        
+    selfIdx: int, required if retType == 'hob'
+        Index of agent excluded from the highest other bid.
+        
+    Returns
+    -------
+    ret: ndarray, shape (nGames, nAgents, m) if retType == 'bids' else (nGames, m)
+    """
+    bids = numpy.asarray(bids, dtype = numpy.float)
+    if bids.ndim == 2:
+        bids = bids[numpy.newaxis,:,:]
+        
+    if retType == 'bids':
+        return bids
+    
+    elif retType == 'firstPrice':
+        return numpy.max(bids,1)
+    
+    elif retType == 'secondPrice':
+        if bids.shape[1] < 2:
+            return numpy.zeros((bids.shape[0],bids.shape[2]))
+        return numpy.sort(bids,1)[:,-2,:]
+    
+    elif retType == 'hob':
+        if selfIdx == None:
+            raise ValueError("ERROR - reduceBids(...):\n" + \
+                             "\t Must specify selfIdx when retType == 'hob'")
+        return numpy.max( numpy.delete(bids,selfIdx,1), 1 )
+    
+    else:
+        raise ValueError("reduceBids - Unknown return type {0}".format(retType))
+
 def simAuctionHelper(**kwargs):
+    """
+    Serial simulation engine behind simulateAuction.
+    
+    Valuations for all games and agents are drawn as one (nGames, nAgents, m) tensor.
+    Agents of the same type (sharing a price prediction) bid on all of their valuations 
+    in a single call to agent.batchBid(...) and the requested statistic is computed 
+    with one vectorized reduction over the full bid tensor.
+    
+    With kwargs['reducers'] the games are simulated kwargs['chunkSize'] at a time,
+    each chunk of bids is passed to the reducers and the reducers are returned.
+    """
     agentType = kwargs.get('agentType')
         
     if isinstance(agentType,list):
@@ -22,7 +81,7 @@ def simAuctionHelper(**kwargs):
     
     nGames          = kwargs.get('nGames')
         
-    pricePrediction = kwargs.get('pricePrediction')
+    pricePrediction = attachModel(kwargs.get('pricePrediction'))
         
     m            = kwargs.get('m',5)
     minValuation = kwargs.get('minValuation',0)
@@ -34,12 +93,23 @@ def simAuctionHelper(**kwargs):
     
     l            = kwargs.get('l')
     
-    if retType == 'hob':
-        selfIdx  = kwargs.get('selfIdx')
+    selfIdx      = kwargs.get('selfIdx')
+    
+    reducers     = kwargs.get('reducers')
+    
+    chunkSize    = kwargs.get('chunkSize', 1000)
+    
+    if reducers is not None:
+        reducerList = reducers if isinstance(reducers, list) else [reducers]
+        
+    elif retType == 'hob':
         if selfIdx == None:
             raise ValueError("ERROR - simulateAuction(...):\n" + \
                              "\t Must specify selfIdx when retType == 'hob'")
             
+    if reducers is None and retType not in ['bids', 'firstPrice', 'secondPrice', 'hob']:
+        raise ValueError("simulateAuction - Unknown return type")
+            
     if verbose:
         print 'In simulateAuction(...)'
         print 'agentType    = {0}'.format(agentType)
@@ -48,62 +118,242 @@ def simAuctionHelper(**kwargs):
         print 'minValuation = {0}'.format(minValuation)
         print 'maxValuation = {0}'.format(maxValuation)
         print 'retType      = {0}'.format(retType)
-        
-    if retType == 'bids':
-        ret = numpy.zeros((nGames,nAgents,m))
-    elif retType == 'firstPrice' or retType == 'hob':
-        ret = numpy.zeros((nGames,m))
-    else:
-        raise ValueError("simulateAuction - Unknown return type")
     
     agents = [agentFactory(agentType = atype, m = m, vmin = minValuation, vmax = maxValuation) for atype in agentType]
     
-    for itr in xrange(nGames):
-        if verbose:
-            print 'running serial game {0}'.format(itr)
+    # group agents which can share a single batchBid call
+    if isinstance(pricePrediction,list):
+        groups = [([agentIdx], agents[agentIdx], pp) for agentIdx, pp in enumerate(pricePrediction)]
+    else:
+        groups = []
+        for atype in sorted(set(agentType)):
+            agentIdxList = [idx for idx, t in enumerate(agentType) if t == atype]
+            groups.append((agentIdxList, agents[agentIdxList[0]], pricePrediction))
+    
+    def simulateBids(nGames):
+        v, lambdas = msRandomValueVectors(vmin = minValuation, 
+                                          vmax = maxValuation, 
+                                          m    = m, 
+                                          l    = l, 
+                                          size = (nGames, nAgents))
+        
+        bids = numpy.zeros((nGames,nAgents,m))
+        
+        for agentIdxList, agent, pp in groups:
+            if verbose:
+                print 'batch bidding {0} valuations for agents {1}'.format(nGames*len(agentIdxList), agentIdxList)
                 
-        if retType == 'firstPrice' or retType == 'secondPrice' or retType == 'hob':
-            gameBids = numpy.zeros((nAgents,m))   
+            groupBids = agent.batchBid(v               = v[:,agentIdxList,:].reshape(-1,m),
+                                       l               = lambdas[:,agentIdxList].ravel(),
+                                       pricePrediction = pp)
+            
+            bids[:,agentIdxList,:] = groupBids.reshape(nGames,len(agentIdxList),m)
+            
+        return bids
+    
+    if reducers is None:
+        return reduceBids(simulateBids(nGames), retType, selfIdx)
+    
+    # simulate chunkSize games at a time and only keep the reducer states
+    for start in xrange(0, nGames, chunkSize):
+        bids = simulateBids(min(chunkSize, nGames - start))
+        for r in reducerList:
+            r.update(bids)
+            
+    return reducers
         
-        if isinstance(pricePrediction,list):  
-             
-            for agentIdx, agent, pp in zip(numpy.arange(nAgents),agents,pricePrediction):
+        
+
+def _simulateChunk(start, stop, **kwargs):
+    """
+    Run simAuctionHelper(**kwargs) for games [start, stop).
+    """
+    kwargs['nGames'] = stop - start
+    return simAuctionHelper(**kwargs)
+    
+def _simulateIntoBuffer(start, stop, path = None, shape = None, **kwargs):
+    """
+    Run simAuctionHelper(**kwargs) for games [start, stop) and write the 
+    result to the same rows of the memory mapped output array at path.
+    """
+    out = numpy.memmap(path, dtype = numpy.float, mode = 'r+', shape = shape)
+    out[start:stop] = _simulateChunk(start, stop, **kwargs)
+    out.flush()
+    del out
+    
+def _initSimulationWorker():
+    # forked workers inherit the parent's random state; without reseeding
+    # every worker would simulate the same valuations
+    numpy.random.seed()
+    
+class simulationExecutor(object):
+    """
+    A long lived pool of simulation worker processes.
+    
+    Creating a multiprocessing.Pool forks nProc processes; doing so for every 
+    simulateAuction call (once per SCPP iteration) repeats that cost each time.
+    A simulationExecutor keeps its workers, and the modules they have loaded, 
+    alive across calls:
+    
+        with simulationExecutor(nProc = 4) as executor:
+            for itr in xrange(maxItr):
+                bids = simulateAuction(executor = executor, **kwargs)
                 
-                agent.randomValuation(l = l)     
-                    
-                if retType == 'bids':
-                    ret[itr, agentIdx, :] = agent.bid(pricePrediction = pp)
-                            
-                elif retType == 'firstPrice' or retType == 'secondPrice' or retType == 'hob':
-                    gameBids[agentIdx,:] = agent.bid(pricePrediction = pp)
-                    
+    The games of a call are not split statically over the workers; idle 
+    workers pull small chunks whose size adapts to the measured time per game
+    (see ssapy.util.chunkScheduler), so a few expensive games do not leave 
+    the other workers waiting.
+    
+    Parameters
+    ----------
+    nProc: int, optional - default = multiprocessing.cpu_count()
+        Number of worker processes.
+        
+    targetTime: float, optional - default = 0.5
+        Desired run time in seconds of one chunk of games.
+        
+    minChunk: int, optional - default = 1
+        Smallest number of games per chunk.
+    """
+    def __init__(self, nProc = None, targetTime = 0.5, minChunk = 1):
+        if nProc == None:
+            nProc = multiprocessing.cpu_count()
+            
+        self.nProc = nProc
+        
+        self.targetTime = targetTime
+        self.minChunk   = minChunk
+        
+        self.pool = multiprocessing.Pool(processes = nProc, initializer = _initSimulationWorker)
+        
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, excType, excValue, traceback):
+        if excType is None:
+            self.close()
         else:
-            for agentIdx, agent in enumerate(agents):
-                
-                agent.randomValuation(l=l)
-                
-                if retType == 'bids':
-                    ret[itr, agentIdx, :] = agent.bid(pricePrediction = pricePrediction)
-                    
-                elif retType == 'firstPrice' or retType == 'secondPrice' or retType == 'hob':
-                        gameBids[agentIdx,:] = agent.bid(pricePrediction = pricePrediction)
+            self.terminate()
+        
+    def apply_async(self, func, args = (), kwds = {}):
+        """
+        Run func(*args, **kwds) on one of the workers (see multiprocessing.Pool.apply_async).
+        """
+        return self.pool.apply_async(func, args, kwds)
+    
+    def simulate(self, **kwargs):
+        """
+        Schedule the kwargs['nGames'] games over the workers in chunks and run 
+        simAuctionHelper(**kwargs) on each chunk. Takes the same arguments as 
+        simulateAuction.
+        
+        The output array is allocated once in shared memory and every worker
+        writes its games into its own rows, so results are not pickled back
+        and no concatenation copy is made. With reducers, each chunk returns
+        its reducer states instead.
+        
+        Unless broadcast = False, the price prediction is published once as a
+        sharedModel for the duration of the call and the workers attach to it
+        instead of each receiving a pickled copy.
+        """
+        if self.pool is None:
+            raise ValueError("simulationExecutor.simulate - executor has been closed.")
+        
+        nGames = kwargs.get('nGames')
+        
+        pricePrediction = kwargs.get('pricePrediction')
+        if kwargs.get('broadcast', True) and pricePrediction is not None and \
+                not isinstance(pricePrediction, sharedModel):
+            with sharedModel(pricePrediction) as shared:
+                kwargs['pricePrediction'] = shared
+                return self.simulate(**kwargs)
+        
+        subArgs = {}
+        subArgs.update(kwargs)
+        subArgs.pop('executor', None)
+        subArgs['parallel'] = False
+        subArgs['verbose'] = False
+        
+        if kwargs.get('reducers') is not None:
+            return self._reduce(nGames, subArgs)
+        
+        agentType = kwargs.get('agentType')
+        if isinstance(agentType, list):
+            nAgents = len(agentType)
+        else:
+            nAgents = kwargs.get('nAgents',8)
             
-        if retType == 'firstPrice':
-            ret[itr,:] = numpy.max(gameBids,0)
+        if kwargs.get('retType','bids') == 'bids':
+            shape = (nGames, nAgents, kwargs.get('m',5))
+        else:
+            shape = (nGames, kwargs.get('m',5))
             
-        elif retType == 'hob':
+        # an empty file can not be memory mapped
+        if nGames == 0:
+            return numpy.zeros(shape)
             
-            ret[itr,:] = numpy.max( numpy.delete(gameBids,selfIdx,0), 0 )
+        # the workers write their games straight into one memory mapped array;
+        # once they are done the file is unlinked, the mapping stays valid
+        fd, path = tempfile.mkstemp(prefix = 'ssapySim_', suffix = '.dat', dir = sharedDir())
+        os.close(fd)
+        try:
+            out = numpy.memmap(path, dtype = numpy.float, mode = 'w+', shape = shape)
             
-        elif retType == 'secondPrice':
-            for goodIdx in xrange(gameBids.shape[1]):
-                goodBids = gameBids[:,m]
-                goodArgMax = numpy.argmax(goodBids)
-                ret[itr,goodIdx] = numpy.max(numpy.delete(goodBids,goodArgMax))
+            subArgs['path']  = path
+            subArgs['shape'] = shape
             
-    return ret
+            self.map(_simulateIntoBuffer, nGames, subArgs)
+        finally:
+            os.remove(path)
+            
+        return numpy.asarray(out)
+    
+    def _reduce(self, nGames, subArgs):
+        """
+        Every chunk of games is reduced into empty copies of the reducers; 
+        only those are sent back and merged, in game order, into 
+        kwargs['reducers'].
+        """
+        reducers = subArgs['reducers']
+        reducerList = reducers if isinstance(reducers, list) else [reducers]
         
+        subArgs['reducers'] = [r.spawn() for r in reducerList]
         
+        results, bounds = self.map(_simulateChunk, nGames, subArgs)
+        
+        for res in results:
+            for r, chunkReducer in zip(reducerList, res):
+                r.merge(chunkReducer)
+                
+        return reducers
+    
+    def map(self, func, nGames, kwds = {}):
+        """
+        Run func(start, stop, **kwds) on the workers for dynamically sized 
+        chunks of range(nGames), see ssapy.util.chunkScheduler.dynamicMap.
+        
+        Returns the results and (start, stop) of the chunks in game order.
+        """
+        return dynamicMap(self.pool, func, nGames, self.nProc, kwds,
+                          minChunk = self.minChunk, targetTime = self.targetTime)
+    
+    def close(self):
+        """
+        Wait for outstanding jobs and shut the workers down.
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+            
+    def terminate(self):
+        """
+        Stop the workers immediately.
+        """
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
 
 def simulateAuction(**kwargs):
     """
@@ -137,6 +387,15 @@ def simulateAuction(**kwargs):
     nProc: int, optional - default = multiprocessing.cpu_count()
         Number of cores to use if parallel flag is set to true.
         
+    executor: simulationExecutor, optional
+        Run the parallel simulation on the workers of an existing executor 
+        instead of starting a new pool (nProc is then ignored).
+        
+    broadcast: bool, optional - default = True
+        Publish the price prediction once in shared memory for the parallel 
+        workers (see ssapy.util.sharedModel) instead of pickling it into 
+        every job.
+        
     pricePrediction: (point, margDist, jointGmm) or list thereof, required
         Price prediction or list of price predictions 
         ( 1 for each agent ) used in the simulation
@@ -161,6 +420,16 @@ def simulateAuction(**kwargs):
             
     selfIdx: int, required if retType == 'hob'
         Index of agent considered to be self. Excluded from max bid calculation.
+        
+    reducers: streamReducer or list of streamReducer, optional
+        If given, retType is ignored. The bids of every chunk of games are 
+        passed to the reducers (see ssapy.auctions.reducers) as soon as the 
+        chunk is simulated and the bids are discarded; parallel workers only 
+        send back their reducer states. The reducers are updated in place and 
+        returned, memory does not grow with nGames.
+        
+    chunkSize: int, optional - default = 1000
+        Number of games simulated at once when reducers are given.
     """
 
     agentType = kwargs.get('agentType')
@@ -212,42 +481,186 @@ def simulateAuction(**kwargs):
     
     ret = []
     if parallel:
-        pool = multiprocessing.Pool(nProc)
-        
-        nGameList = [nGames//nProc]*nProc
-        nGameList[-1] += (nGames % nProc)
+        executor = kwargs.get('executor')
         
+        if executor == None:
+            ownExecutor = True
+            executor = simulationExecutor(nProc)
+        else:
+            ownExecutor = False
+            
         if verbose:
             print 'Running parallel simulation.'
-            print 'Number of cores = {0}'.format(nProc)
-            print 'Number of simulations per core = {0}'.format(nGameList)
-            print 'Total Number of simulations = {0}'.format((sum(nGameList)))
-            
-        results = []
-        
-        for p in xrange(nProc):
-            subArgs = {}
-            subArgs.update(kwargs)
-            subArgs['parallel'] = False
-            subArgs['nGames'] = nGameList[p]
-            subArgs['verbose'] = False
-                 
-            results.append(pool.apply_async(simAuctionHelper, kwds = subArgs))
-
-        pool.close()
-        pool.join()
-            
-
-        for idx, r in enumerate(results):
-            if idx == 0:
-                ret = r.get()
-            else:                
-                ret = numpy.concatenate((ret,r.get()))
-            r._value = []
+            print 'Number of cores = {0}'.format(executor.nProc)
+            print 'Target time per chunk of games = {0} seconds'.format(executor.targetTime)
+            print 'Total Number of simulations = {0}'.format(nGames)
             
-
+        try:
+            ret = executor.simulate(**kwargs)
+        finally:
+            if ownExecutor:
+                executor.close()
             
     else:
         ret = simAuctionHelper(**kwargs)
         
-    return ret               
\ No newline at end of file
+    return ret
+
+def simulateBidPool(**kwargs):
+    """
+    Bids of poolSize agents of one type for poolSize independent valuations.
+    
+    In a symmetric game the highest other bids only depend on the distribution
+    of a single agent's bid, so auctions can be built by resampling a pool of
+    bids (see resampleAuctions) instead of computing nAgents new bids per game.
+    
+    Parameters
+    ----------
+    agentType: string, required
+        Strategy of all agents.
+        
+    poolSize: int, required
+        Number of bids (valuations) in the pool.
+        
+    m, minValuation, maxValuation, l, pricePrediction, parallel, nProc, 
+    executor, broadcast, verbose: see simulateAuction
+    
+    Returns
+    -------
+    bidPool: ndarray, shape (poolSize, m)
+    """
+    if not isinstance(kwargs.get('agentType'), basestring):
+        raise ValueError("simulateBidPool - agentType must be a single strategy (symmetric game).")
+    
+    subArgs = {}
+    subArgs.update(kwargs)
+    subArgs.pop('reducers', None)
+    subArgs['nAgents'] = 1
+    subArgs['nGames']  = kwargs.get('poolSize')
+    subArgs['retType'] = 'bids'
+    
+    return simulateAuction(**subArgs)[:,0,:]
+
+def _samplePoolIndices(poolSize, nGames, nAgents, replace = True):
+    """
+    (nGames, nAgents) indices into a pool of poolSize bids, drawn independently
+    for every game with or without replacement within a game.
+    """
+    if replace:
+        return numpy.random.randint(0, poolSize, (nGames, nAgents))
+    
+    if nAgents > poolSize:
+        raise ValueError("resampleAuctions - nAgents = {0} > poolSize = {1} without replacement.".format(nAgents, poolSize))
+    
+    # Floyd's algorithm vectorized over games, nAgents steps
+    idx = numpy.zeros((nGames, nAgents), dtype = numpy.int)
+    for i, j in enumerate(xrange(poolSize - nAgents, poolSize)):
+        t = (numpy.random.random_sample(nGames)*(j + 1)).astype(numpy.int)
+        taken = numpy.any(idx[:,:i] == t[:,numpy.newaxis], 1)
+        idx[:,i] = numpy.where(taken, j, t)
+        
+    # Floyd's algorithm draws a uniform set, shuffle the seats as well
+    seats = numpy.argsort(numpy.random.random_sample((nGames, nAgents)), 1)
+    
+    return idx[numpy.arange(nGames)[:,numpy.newaxis], seats]
+
+def resampleAuctions(bidPool, nGames, nAgents, replace = True, retType = 'bids', selfIdx = None,
+                     reducers = None, chunkSize = 10000):
+    """
+    Simulate nGames auctions by seating nAgents bids drawn from a pool of bids 
+    (see simulateBidPool) in every game.
+    
+    Parameters
+    ----------
+    bidPool: array_like, shape (poolSize, m)
+    
+    nGames, nAgents: int
+    
+    replace: bool, optional - default = True
+        Draw the bids of a game with or without replacement.
+        
+    retType, selfIdx: see simulateAuction
+    
+    reducers: streamReducer or list of streamReducer, optional
+        If given, every chunk of chunkSize games is passed to the reducers 
+        (see ssapy.auctions.reducers) which are returned.
+        
+    chunkSize: int, optional - default = 10000
+        Number of games assembled at once.
+        
+    Returns
+    -------
+    see simulateAuction
+    """
+    bidPool = numpy.atleast_2d(numpy.asarray(bidPool, dtype = numpy.float))
+    
+    if reducers is not None:
+        reducerList = reducers if isinstance(reducers, list) else [reducers]
+    
+    ret = []
+    for start in xrange(0, nGames, chunkSize):
+        n = min(chunkSize, nGames - start)
+        
+        bids = bidPool[_samplePoolIndices(bidPool.shape[0], n, nAgents, replace)]
+        
+        if reducers is None:
+            ret.append(reduceBids(bids, retType, selfIdx))
+        else:
+            for r in reducerList:
+                r.update(bids)
+                
+    if reducers is not None:
+        return reducers
+    
+    if not ret:
+        return reduceBids(numpy.zeros((0, nAgents, bidPool.shape[1])), retType, selfIdx)
+    
+    return numpy.concatenate(ret)
+
+def bidPoolBootstrap(bidPool, nGames, nAgents, nBoot = 100, statistic = None, replace = True,
+                     retType = 'hob', selfIdx = 0, chunkSize = 10000):
+    """
+    Bootstrap estimate of the variance of a statistic of resampled auctions 
+    due to the finite bid pool (and the finite number of games).
+    
+    Each replicate draws poolSize bids from the pool with replacement, 
+    resamples nGames auctions from that pool and evaluates statistic on the 
+    (nGames, m) result of retType.
+    
+    Parameters
+    ----------
+    bidPool, nGames, nAgents, replace, retType, selfIdx, chunkSize: 
+        see resampleAuctions, retType must not be 'bids'
+        
+    nBoot: int, optional - default = 100
+        Number of bootstrap replicates.
+        
+    statistic: function, optional - default = mean price vector
+        statistic(prices) -> array_like
+        
+    Returns
+    -------
+    mean: ndarray
+        Bootstrap mean of the statistic.
+        
+    var: ndarray
+        Bootstrap variance of the statistic.
+    """
+    if retType == 'bids':
+        raise ValueError("bidPoolBootstrap - retType must reduce the bids.")
+    
+    if statistic is None:
+        statistic = lambda prices: numpy.mean(prices, 0)
+        
+    bidPool = numpy.atleast_2d(numpy.asarray(bidPool, dtype = numpy.float))
+    K = bidPool.shape[0]
+    
+    stats = []
+    for b in xrange(nBoot):
+        bootPool = bidPool[numpy.random.randint(0, K, K)]
+        prices = resampleAuctions(bootPool, nGames, nAgents, replace, retType, selfIdx, chunkSize = chunkSize)
+        stats.append(numpy.atleast_1d(statistic(prices)))
+        
+    stats = numpy.asarray(stats, dtype = numpy.float)
+    
+    return numpy.mean(stats, 0), numpy.var(stats, 0, ddof = 1)
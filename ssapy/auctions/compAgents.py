@@ -1,6 +1,9 @@
 from ssapy.agents.agentFactory import agentFactory
-from ssapy.auctions import simulateAuction
-from ssapy.auctions.simultaneousAuction import simultaneousAuction
+from ssapy.auctions import simulateAuction, simulationExecutor
+from ssapy.util.sharedModel import sharedModel, attachModel
+from ssapy.auctions.simultaneousAuction import clearAuctions
+from ssapy.agents.marketSchedule import randomValueVectors as msRandomValueVectors
+from ssapy.agents.marketSchedule import batchRevenue as msBatchRevenue
 
 import matplotlib.pyplot as plt
 import numpy
@@ -10,6 +13,12 @@ import pickle
 import os
 import copy
 
+def _comp2AgentsChunk(start, stop, **kwargs):
+    # pp1, pp2 are published once per call, not pickled with every chunk
+    kwargs['pp1'], kwargs['pp2'] = attachModel(kwargs.pop('pricePredictions'))
+    kwargs['nGames'] = stop - start
+    return comp2Agents(**kwargs)
+
 def comp2Agents(**kwargs):
     oDir         = kwargs.get('oDir')
     pp1          = kwargs.get('pp1')
@@ -45,45 +54,32 @@ def comp2Agents(**kwargs):
         print ''  
     
     if parallel:
-        pool = multiprocessing.Pool(nProc)
-        
-        nGameList = [nGames//nProc]*nProc
-        nGameList[-1] += (nGames % nProc)
-        
         if verbose:
             print 'Running parallel simulation.'
             print 'Number of cores = {0}'.format(nProc)
-            print 'Number of simulations per core = {0}'.format(nGameList)
-            print 'Total Number of simulations = {0}'.format((sum(nGameList)))
+            print 'Total Number of simulations = {0}'.format(nGames)
             
-        results = []
-        
-        for p in xrange(nProc):
-            subArgs = copy.deepcopy(kwargs)
-            subArgs.update(kwargs)
-            subArgs['parallel'] = False
-            subArgs['nGames'] = nGameList[p]
-            subArgs['verbose'] = False
-            subArgs['oDir'] = None
-                 
-            results.append(pool.apply_async(comp2Agents, kwds = subArgs))
-
-        pool.close()
-        pool.join()
-        
-        for idx, r in enumerate(results):
-            if idx == 0:
-                agentSurplus = r.get()
-            else:                
-                agentSurplus = numpy.concatenate((agentSurplus,r.get()))
-            r._value = []
+        subArgs = dict(kwargs)
+        subArgs['parallel'] = False
+        subArgs['verbose'] = False
+        subArgs['oDir'] = None
+        subArgs.pop('pp1', None)
+        subArgs.pop('pp2', None)
+        
+        # idle workers pull chunks of games, results come back in game order
+        with simulationExecutor(nProc) as executor:
+            with sharedModel([pp1, pp2]) as sharedPP:
+                subArgs['pricePredictions'] = sharedPP
+                results, bounds = executor.map(_comp2AgentsChunk, nGames, subArgs)
+            
+        if results:
+            agentSurplus = numpy.concatenate(results)
+        else:
+            agentSurplus = numpy.zeros((0, n1 + n2))
         
     else:
         
-        auction = simultaneousAuction( m       = m,
-                                       nPrice  = 2,
-                                       reserve = 0)
-        
+        agentList = []
         for i in xrange(n1):
             agent = agentFactory(agentType = agentType1, 
                                  m         = m, 
@@ -92,8 +88,7 @@ def comp2Agents(**kwargs):
             
             agent.pricePrediction = pp1
             
-            
-            auction.attachAgents(agent)
+            agentList.append(agent)
                                  
         for i in xrange(n2):
             agent = agentFactory(agentType = agentType2, 
@@ -103,29 +98,42 @@ def comp2Agents(**kwargs):
             
             agent.pricePrediction = pp2
             
-            auction.attachAgents(agent)
-        
-        agentSurplus = numpy.zeros((nGames,n1+n2))
-        
-        for itr in xrange(nGames):
-            if verbose:
-                print 'Simulating {0} out of {1} auctions'.format(itr,nGames)
-            [agent.randomValuation() for agent in auction.agentList]
+            agentList.append(agent)
             
-            if verbose:
-                for idx, agent in enumerate(auction.agentList):
-                    print 'agent[{0}] = {1} ; l = {2}, v = {3}'.format(idx, agent.type(), agent.l, agent.v)
+        nAgents = n1 + n2
             
-            auction.runAuction()
+        v, l = msRandomValueVectors(vmin = minValuation,
+                                    vmax = maxValuation,
+                                    m    = m,
+                                    size = (nGames, nAgents))
+        
+        # agents of the same type share a price prediction so 
+        # they can bid on all of their valuations in one call
+        bids = numpy.zeros((nGames, nAgents, m))
+        for agentIdxList, agentType in [(range(n1), agentType1), (range(n1, nAgents), agentType2)]:
+            if not agentIdxList:
+                continue
             
-            auction.notifyAgents()
+            if verbose:
+                print 'Bidding {0} valuations for {1}'.format(nGames*len(agentIdxList), agentType)
+                
+            groupBids = agentList[agentIdxList[0]].batchBid(v = v[:,agentIdxList,:].reshape(-1,m),
+                                                            l = l[:,agentIdxList].ravel())
             
-            surplus = auction.agentSurplus()
+            bids[:,agentIdxList,:] = groupBids.reshape(nGames, len(agentIdxList), m)
             
-            agentSurplus[itr,:] = surplus
+        winners, finalPrices, winningBids = clearAuctions(bids, nPrice = 2, reserve = 0)
+        
+        agentSurplus = numpy.zeros((nGames,nAgents))
+        
+        for agentIdx in xrange(nAgents):
+            bundleWon = winners == agentIdx
             
-            if verbose:
-                print 'Agent Surplus = {0}'.format(surplus)
+            agentSurplus[:,agentIdx] = msBatchRevenue(bundleWon, v[:,agentIdx,:], l[:,agentIdx]) -\
+                                        numpy.sum(bundleWon*finalPrices,1)
+            
+        if verbose:
+            print 'Mean Agent Surplus = {0}'.format(numpy.mean(agentSurplus,0))
         
     if oDir:
         oDir = os.path.realpath(oDir)
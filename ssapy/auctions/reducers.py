@@ -0,0 +1,292 @@
+"""
+this is /ssapy/auctions/reducers.py
+
+Streaming reducers for auction simulations.
+
+Instead of returning every bid of every game, simulateAuction(reducers = ...)
+feeds the bids of each chunk of games to a list of reducers as the chunk
+finishes and keeps only their (small) state. Parallel workers reduce their
+own games and only the reducer states are sent back and merged, so memory
+does not grow with the number of games (except for hobReducer which keeps
+one row per game by design).
+
+Every reducer reduces the bids of a chunk to one price vector per game with
+reduceBids(bids, retType, selfIdx) and accumulates those vectors:
+
+    hobReducer       - all price vectors, in game order
+    histogramReducer - per good histogram counts on fixed bin edges
+    momentReducer    - running count, mean and covariance
+    reservoirReducer - a uniform random sample of fixed size
+"""
+from ssapy.auctions import reduceBids
+
+import copy
+import numpy
+
+class streamReducer(object):
+    """
+    Base class of the streaming reducers.
+
+    Parameters
+    ----------
+    retType: string, optional - default = 'firstPrice'
+        Price statistic which is accumulated, 'firstPrice', 'secondPrice'
+        or 'hob' (see simulateAuction).
+
+    selfIdx: int, required if retType == 'hob'
+        Index of agent excluded from the highest other bid.
+    """
+    def __init__(self, retType = 'firstPrice', selfIdx = None):
+        if retType not in ['firstPrice', 'secondPrice', 'hob']:
+            raise ValueError("streamReducer - Unknown return type {0}".format(retType))
+
+        if retType == 'hob' and selfIdx == None:
+            raise ValueError("ERROR - streamReducer(...):\n" + \
+                             "\t Must specify selfIdx when retType == 'hob'")
+
+        self.retType = retType
+        self.selfIdx = selfIdx
+
+        self.reset()
+
+    def reset(self):
+        """
+        Forget all accumulated games.
+        """
+        raise NotImplementedError
+
+    def update(self, bids):
+        """
+        Accumulate the games of a bid tensor of shape (nGames, nAgents, m).
+        """
+        self.updateStat(reduceBids(bids, self.retType, self.selfIdx))
+
+    def updateStat(self, x):
+        """
+        Accumulate already reduced price vectors, shape (nGames, m).
+        """
+        raise NotImplementedError
+
+    def merge(self, other):
+        """
+        Add the games accumulated by other (a reducer of the same kind and
+        configuration, e.g. returned by a worker) to this reducer.
+        """
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+    def spawn(self):
+        """
+        An empty reducer with the same configuration.
+        """
+        r = copy.copy(self)
+        r.reset()
+        return r
+
+    def _checkMerge(self, other):
+        if type(other) != type(self) or other.retType != self.retType or other.selfIdx != self.selfIdx:
+            raise ValueError("{0}.merge - incompatible reducer.".format(type(self).__name__))
+
+class hobReducer(streamReducer):
+    """
+    Keep the price vector of every game, e.g. the highest other bids used to
+    fit the next price prediction. Memory is nGames x m instead of
+    nGames x nAgents x m for the full bids.
+
+    result() -> ndarray, shape (nGames, m)
+    """
+    def __init__(self, selfIdx = None, retType = 'hob'):
+        super(hobReducer, self).__init__(retType, selfIdx)
+
+    def reset(self):
+        self.chunks = []
+        self.n = 0
+
+    def updateStat(self, x):
+        x = numpy.atleast_2d(x)
+        self.chunks.append(x.copy())
+        self.n += x.shape[0]
+
+    def merge(self, other):
+        self._checkMerge(other)
+        self.chunks.extend(other.chunks)
+        self.n += other.n
+
+    def result(self):
+        if not self.chunks:
+            return numpy.zeros((0,0))
+
+        # keep the concatenation so later calls do not copy again
+        if len(self.chunks) > 1:
+            self.chunks = [numpy.vstack(self.chunks)]
+
+        return self.chunks[0]
+
+class histogramReducer(streamReducer):
+    """
+    Per good histogram counts of the price vectors.
+
+    Parameters
+    ----------
+    binEdges: array_like
+        Bin edges shared by all goods (see numpy.histogram; values outside
+        [binEdges[0], binEdges[-1]] are not counted).
+
+    retType, selfIdx: see streamReducer, retType defaults to 'firstPrice'
+        (winning bids).
+
+    result(density = False) -> list of (counts or density, binEdges) per good,
+        the format expected by margDistSCPP.
+    """
+    def __init__(self, binEdges, retType = 'firstPrice', selfIdx = None):
+        self.binEdges = numpy.asarray(binEdges, dtype = numpy.float)
+        super(histogramReducer, self).__init__(retType, selfIdx)
+
+    def reset(self):
+        self.counts = None
+        self.n = 0
+
+    def updateStat(self, x):
+        x = numpy.atleast_2d(x)
+
+        if self.counts is None:
+            self.counts = numpy.zeros((x.shape[1], self.binEdges.shape[0] - 1), dtype = numpy.int64)
+
+        for j in xrange(x.shape[1]):
+            self.counts[j] += numpy.histogram(x[:,j], self.binEdges)[0]
+
+        self.n += x.shape[0]
+
+    def merge(self, other):
+        self._checkMerge(other)
+        if not numpy.array_equal(self.binEdges, other.binEdges):
+            raise ValueError("histogramReducer.merge - bin edges differ.")
+
+        if other.counts is not None:
+            if self.counts is None:
+                self.counts = other.counts.copy()
+            else:
+                self.counts += other.counts
+
+        self.n += other.n
+
+    def result(self, density = False):
+        if self.counts is None:
+            return []
+
+        if density:
+            # as numpy.histogram(..., density = True)
+            widths = numpy.diff(self.binEdges)
+            return [(c/(widths*float(c.sum())), self.binEdges) for c in self.counts]
+
+        return [(c, self.binEdges) for c in self.counts]
+
+class momentReducer(streamReducer):
+    """
+    Running number of games, mean and covariance of the price vectors.
+    Chunks and worker results are combined with the pairwise update of
+    Chan, Golub and LeVeque, which is stable for many games.
+
+    result() -> (mean, cov), shapes (m,) and (m,m)
+    """
+    def reset(self):
+        self.n    = 0
+        self.mean = None
+        self.M2   = None
+
+    def _combine(self, n, mean, M2):
+        if n == 0:
+            return
+        if self.n == 0:
+            self.n, self.mean, self.M2 = n, mean, M2
+            return
+
+        total = self.n + n
+        delta = mean - self.mean
+
+        self.mean = self.mean + delta*(float(n)/total)
+        self.M2   = self.M2 + M2 + numpy.outer(delta,delta)*(float(self.n)*n/total)
+        self.n    = total
+
+    def updateStat(self, x):
+        x = numpy.atleast_2d(x)
+
+        mean = numpy.mean(x,0)
+        dx = x - mean
+
+        self._combine(x.shape[0], mean, numpy.dot(dx.T,dx))
+
+    def merge(self, other):
+        self._checkMerge(other)
+        self._combine(other.n, other.mean, other.M2)
+
+    def result(self):
+        if self.n < 2:
+            raise ValueError("momentReducer.result - need at least two games.")
+
+        return self.mean, self.M2/(self.n - 1)
+
+class reservoirReducer(streamReducer):
+    """
+    A uniform random sample without replacement of at most size of the
+    accumulated price vectors (reservoir sampling). Two reservoirs are merged
+    by drawing the number of vectors kept from each with the hypergeometric
+    distribution, so the merged reservoir is again a uniform sample of all
+    games.
+
+    Parameters
+    ----------
+    size: int
+        Reservoir size.
+
+    result() -> ndarray, shape (min(size, number of games), m), in random order
+    """
+    def __init__(self, size, retType = 'firstPrice', selfIdx = None):
+        self.size = int(size)
+        super(reservoirReducer, self).__init__(retType, selfIdx)
+
+    def reset(self):
+        self.n = 0
+        self.samples = None
+
+    def _combine(self, n, samples):
+        if n == 0:
+            return
+        if self.n == 0:
+            self.n, self.samples = n, samples
+            return
+
+        total = self.n + n
+        k = min(self.size, total)
+
+        k1 = numpy.random.hypergeometric(self.n, n, k)
+
+        keep1 = numpy.random.permutation(self.samples.shape[0])[:k1]
+        keep2 = numpy.random.permutation(samples.shape[0])[:k-k1]
+
+        self.samples = numpy.vstack((self.samples[keep1], samples[keep2]))
+        self.n = total
+
+    def updateStat(self, x):
+        x = numpy.atleast_2d(x)
+        n = x.shape[0]
+
+        # a uniform sample of the chunk is a reservoir of the chunk
+        if n > self.size:
+            x = x[numpy.random.permutation(n)[:self.size]]
+        else:
+            x = x.copy()
+
+        self._combine(n, x)
+
+    def merge(self, other):
+        self._checkMerge(other)
+        if other.size != self.size:
+            raise ValueError("reservoirReducer.merge - reservoir sizes differ.")
+
+        self._combine(other.n, other.samples)
+
+    def result(self):
+        return self.samples
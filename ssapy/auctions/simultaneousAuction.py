@@ -5,13 +5,63 @@ Date:      12/2/2011
 
 A class implementing a simultaneous auction.
 """
-from ssapy.agents.agentBase import agentBase
+from ssapy.agents import agentBase
 from ssapy.auctions.auctionBase import *
 
 
 import numpy
 import heapq
 
+def clearAuctions(bids, nPrice = 2, reserve = 0):
+    """
+    Clear a batch of independent simultaneous auctions at once.
+    
+    Parameters
+    ----------
+    bids: array_like, shape (nAuctions, nAgents, m)
+        bids[a,i,j] is the bid of agent i on good j in auction a.
+        
+    nPrice: int, optional - default = 2
+        Goods close at the nPrice-th highest bid.
+        
+    reserve: float, optional - default = 0
+        Goods are not sold below the reserve price.
+        
+    Returns
+    -------
+    winners: ndarray, shape (nAuctions, m)
+        Index of the winning agent (float) or numpy.nan if the good was not sold.
+        Ties for the highest bid are broken uniformly at random.
+        
+    finalPrices: ndarray, shape (nAuctions, m)
+        The nPrice-th highest bid, raised to the reserve if necessary.
+        
+    winningBids: ndarray, shape (nAuctions, m)
+        The highest bid on each good.
+    """
+    bids = numpy.asarray(bids, dtype = numpy.float)
+    
+    nAgents = bids.shape[1]
+    
+    winningBids = numpy.max(bids,1)
+    
+    # random keys restricted to the highest bidders; the argmax over
+    # agents picks one of the tied highest bidders uniformly at random
+    tieKeys = numpy.random.rand(*bids.shape)
+    tieKeys[bids != winningBids[:,numpy.newaxis,:]] = -1.0
+    winners = numpy.argmax(tieKeys,1).astype(numpy.float)
+    
+    #don't give away an item for free
+    winners[winningBids == 0] = numpy.nan
+    
+    winners[winningBids < reserve] = numpy.nan
+    
+    finalPrices = numpy.partition(bids, nAgents - nPrice, 1)[:,nAgents - nPrice,:]
+    
+    finalPrices[finalPrices < reserve] = reserve
+    
+    return winners, finalPrices, winningBids
+
 class simultaneousAuction(auctionBase):
     """
     A class for simulating simultaneous one shot auctions.
@@ -83,31 +133,12 @@ class simultaneousAuction(auctionBase):
         #collect the bids from the agents
         bids = numpy.atleast_2d([agent.bid(**kwargs) for agent in self.agentList])
         
-        # the highest bids
-        winningBids = numpy.max(bids,0)
-        
-        # if there is more than one agent bidding the highest price
-        # pick the winner at random.
-        winners = numpy.zeros(bids.shape[1],dtype=numpy.float)
-        for m in xrange(bids.shape[1]):
-            maxBids = numpy.nonzero(bids[:,m] == numpy.max(bids[:,m]))[0]
-            if maxBids.shape[0] > 1:
-                numpy.random.shuffle(maxBids)        
-            winners[m]=maxBids[0]
-                
-        
-        # numpy.argmax(2darray,0) returns the argmax over columns
-#        winners = numpy.argmax(bids,0).astype(numpy.float)
-        
-        #don't give away an item for free
-        winners[winningBids == 0] = numpy.nan
-        
-        winners[winningBids < self.reserve] = numpy.nan
-        
-        #if the winning bids are not greater than the reserve,
-        finalPrices = numpy.atleast_1d([sorted(bids[:,i],reverse=True)[nPrice-1] for i in xrange(bids.shape[1])])
-        
-        finalPrices[finalPrices < reserve] = reserve
+        winners, finalPrices, winningBids = \
+            clearAuctions(bids[numpy.newaxis,:,:], nPrice, reserve)
+            
+        winners     = winners[0]
+        finalPrices = finalPrices[0]
+        winningBids = winningBids[0]
         
         self.winners = winners
         
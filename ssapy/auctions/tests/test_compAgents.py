@@ -0,0 +1,21 @@
+import unittest
+import numpy
+
+from ssapy.auctions.compAgents import comp2Agents
+
+class test_compAgents(unittest.TestCase):
+    def test_comp2Agents(self):
+        pp = numpy.asarray([10.,5.,3.])
+        kwargs = {'pp1' : pp, 'pp2' : 2*pp, 'n1' : 2, 'n2' : 3, 
+                  'agentType1' : "msStraightMV", 'agentType2' : "msStraightMV",
+                  'm' : 3, 'nProc' : 2, 'verbose' : False}
+        
+        agentSurplus = comp2Agents(nGames = 20, **kwargs)
+        numpy.testing.assert_equal(agentSurplus.shape, (20,5))
+        
+        # no chunks are scheduled for zero games
+        agentSurplus = comp2Agents(nGames = 0, **kwargs)
+        numpy.testing.assert_equal(agentSurplus.shape, (0,5))
+        
+if __name__ == "__main__":
+    unittest.main()
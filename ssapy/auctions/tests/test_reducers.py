@@ -0,0 +1,90 @@
+import unittest
+import numpy
+
+from ssapy.auctions import simulateAuction, simulationExecutor, reduceBids
+from ssapy.auctions.reducers import hobReducer, histogramReducer, momentReducer, reservoirReducer
+
+class test_reducers(unittest.TestCase):
+    def setUp(self):
+        numpy.random.seed(23)
+        self.bids = numpy.round(numpy.random.uniform(0, 50, (300,4,3)))
+
+    def test_chunked(self):
+        hob = reduceBids(self.bids, 'hob', selfIdx = 1)
+        fp  = reduceBids(self.bids, 'firstPrice')
+
+        binEdges = numpy.arange(0,51,5)
+
+        reducers = [hobReducer(selfIdx = 1),
+                    histogramReducer(binEdges),
+                    momentReducer(retType = 'hob', selfIdx = 1)]
+
+        # two "workers", each fed in uneven chunks
+        workers = [[r.spawn() for r in reducers] for w in xrange(2)]
+        for start, stop in [(0,13), (13,100), (100,101)]:
+            [r.update(self.bids[start:stop]) for r in workers[0]]
+        for start, stop in [(101,250), (250,300)]:
+            [r.update(self.bids[start:stop]) for r in workers[1]]
+
+        for w in workers:
+            [r.merge(wr) for r, wr in zip(reducers, w)]
+
+        numpy.testing.assert_array_equal(reducers[0].result(), hob)
+
+        for j, (counts, edges) in enumerate(reducers[1].result()):
+            numpy.testing.assert_array_equal(counts, numpy.histogram(fp[:,j], binEdges)[0])
+
+        for j, (density, edges) in enumerate(reducers[1].result(density = True)):
+            numpy.testing.assert_array_almost_equal(density, numpy.histogram(fp[:,j], binEdges, density = True)[0])
+
+        mean, cov = reducers[2].result()
+        numpy.testing.assert_array_almost_equal(mean, numpy.mean(hob,0))
+        numpy.testing.assert_array_almost_equal(cov, numpy.cov(hob.T))
+
+        self.assertRaises(ValueError, reducers[1].merge, histogramReducer(binEdges[:-1]))
+        self.assertRaises(ValueError, reducers[2].merge, momentReducer())
+        self.assertRaises(ValueError, hobReducer)
+
+    def test_reservoir(self):
+        x = numpy.arange(100.)[:,numpy.newaxis]
+
+        counts = numpy.zeros(100)
+        for t in xrange(2000):
+            a = reservoirReducer(10)
+            b = a.spawn()
+            a.updateStat(x[:30])
+            a.updateStat(x[30:37])
+            b.updateStat(x[37:])
+            a.merge(b)
+
+            s = a.result()[:,0].astype(int)
+
+            numpy.testing.assert_equal(a.n, 100)
+            numpy.testing.assert_equal(numpy.unique(s).shape[0], 10)
+            counts[s] += 1
+
+        # every game is kept with probability 10/100
+        numpy.testing.assert_(numpy.all(numpy.abs(counts - 200.) < 70.))
+
+    def test_simulateAuction(self):
+        pricePrediction = numpy.asarray([10.,5.,2.])
+
+        with simulationExecutor(nProc = 2) as executor:
+            for kwargs in [{'parallel' : False}, {'executor' : executor}]:
+                reducers = [hobReducer(selfIdx = 0), momentReducer(retType = 'hob', selfIdx = 0),
+                            reservoirReducer(20, retType = 'hob', selfIdx = 0)]
+
+                ret = simulateAuction(agentType = "msStraightMV", nAgents = 3, nGames = 55, m = 3,
+                                      pricePrediction = pricePrediction, reducers = reducers,
+                                      chunkSize = 10, **kwargs)
+
+                numpy.testing.assert_(ret is reducers)
+
+                hob = reducers[0].result()
+                numpy.testing.assert_equal(hob.shape, (55,3))
+                numpy.testing.assert_array_almost_equal(reducers[1].result()[0], numpy.mean(hob,0))
+                numpy.testing.assert_equal(reducers[2].result().shape, (20,3))
+                numpy.testing.assert_equal(reducers[2].n, 55)
+
+if __name__ == "__main__":
+    unittest.main()
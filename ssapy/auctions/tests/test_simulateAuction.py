@@ -1,7 +1,8 @@
 import unittest
 import numpy
 
-from ssapy.auctions import simulateAuction,collectBids
+from ssapy.auctions import simulateAuction,collectBids,reduceBids,simulationExecutor
+from ssapy.auctions import simulateBidPool,resampleAuctions,bidPoolBootstrap
 from ssapy.pricePrediction.jointGMM import jointGMM
 
 from ssapy import agentFactory
@@ -18,6 +19,95 @@ class test_simulateAuction(unittest.TestCase):
         
 #        print bids
         
+    def test_simulationExecutor(self):
+        pricePrediction = numpy.asarray([10.,5.])
+        
+        with simulationExecutor(nProc = 2) as executor:
+            pool = executor.pool
+            for itr in xrange(3):
+                bids = simulateAuction(agentType = "msStraightMV", nAgents = 3, nGames = 9, m = 2, 
+                                       pricePrediction = pricePrediction, executor = executor)
+                
+                numpy.testing.assert_equal(bids.shape, (9,3,2))
+                
+                # the workers are reused
+                numpy.testing.assert_(executor.pool is pool)
+                
+        numpy.testing.assert_(executor.pool is None)
+
+    def test_sharedResultBuffer(self):
+        import os
+        from ssapy.util.sharedModel import sharedDir
+
+        pricePrediction = numpy.asarray([10.,5.,2.])
+
+        tmpDir = sharedDir()
+        if tmpDir == None:
+            import tempfile
+            tmpDir = tempfile.gettempdir()
+        before = set(os.listdir(tmpDir))
+
+        with simulationExecutor(nProc = 3) as executor:
+            bids = simulateAuction(agentType = ["msStraightMV"]*4, nGames = 11, m = 3,
+                                   pricePrediction = pricePrediction, executor = executor)
+
+            # every game is filled in, one row per game
+            numpy.testing.assert_equal(type(bids), numpy.ndarray)
+            numpy.testing.assert_equal(bids.shape, (11,4,3))
+            numpy.testing.assert_(numpy.all(bids.reshape(11,-1).max(1) > 0))
+
+            hob = simulateAuction(agentType = "msStraightMV", nAgents = 4, nGames = 11, m = 3,
+                                  pricePrediction = pricePrediction, executor = executor,
+                                  retType = 'hob', selfIdx = 0)
+
+            numpy.testing.assert_equal(hob.shape, (11,3))
+            
+            # no games, same shape as the serial path
+            bids = simulateAuction(agentType = "msStraightMV", nAgents = 4, nGames = 0, m = 3,
+                                   pricePrediction = pricePrediction, executor = executor)
+            
+            numpy.testing.assert_equal(bids.shape, (0,4,3))
+
+        # the result buffers have been removed
+        numpy.testing.assert_equal(set(os.listdir(tmpDir)) - before, set())
+
+    def test_resampleAuctions(self):
+        numpy.random.seed(25)
+        bidPool = numpy.arange(12.).reshape(6,2)
+        
+        bids = resampleAuctions(bidPool, 3000, 3, replace = False)
+        numpy.testing.assert_equal(bids.shape, (3000,3,2))
+        
+        # every game seats distinct pool bids, each one equally likely in every seat
+        seats = bids[:,:,0]/2
+        numpy.testing.assert_(numpy.all(numpy.sort(seats,1)[:,1:] > numpy.sort(seats,1)[:,:-1]))
+        for s in xrange(3):
+            freq = numpy.bincount(seats[:,s].astype(int), minlength = 6)/3000.
+            numpy.testing.assert_(numpy.all(numpy.abs(freq - 1./6) < 0.03))
+            
+        self.assertRaises(ValueError, resampleAuctions, bidPool, 10, 7, False)
+        
+        hob = resampleAuctions(bidPool, 25, 3, retType = 'hob', selfIdx = 0, chunkSize = 7)
+        numpy.testing.assert_equal(hob.shape, (25,2))
+        
+    def test_bidPool(self):
+        pricePrediction = numpy.asarray([10.,5.])
+        
+        bidPool = simulateBidPool(agentType = "msStraightMV", poolSize = 50, m = 2, 
+                                  pricePrediction = pricePrediction, parallel = False)
+        numpy.testing.assert_equal(bidPool.shape, (50,2))
+        
+        self.assertRaises(ValueError, simulateBidPool, agentType = ["msStraightMV"], poolSize = 50)
+        
+        # a pool of identical bids has no bootstrap variance
+        mean, var = bidPoolBootstrap(numpy.ones((20,2))*[3.,4.], 10, 3, nBoot = 5)
+        numpy.testing.assert_array_almost_equal(mean, [3.,4.])
+        numpy.testing.assert_array_almost_equal(var, [0.,0.])
+        
+        mean, var = bidPoolBootstrap(bidPool, 100, 3, nBoot = 10)
+        numpy.testing.assert_equal(var.shape, (2,))
+        numpy.testing.assert_(numpy.all(var >= 0))
+        
     def test_collectBids(self):
         agentType = "msStraightMUa"
         pricePrediction = jointGMM(n_components=2)
@@ -34,6 +124,24 @@ class test_simulateAuction(unittest.TestCase):
         
         numpy.testing.assert_equal(bids,true_bids)
         
+    def test_reduceBids(self):
+        bids = numpy.zeros((2,3,2))
+        bids[0] = [[10.,1.],[5.,7.],[3.,2.]]
+        bids[1] = [[0.,4.],[8.,4.],[9.,6.]]
+        
+        numpy.testing.assert_equal(reduceBids(bids,'firstPrice'),
+                                   numpy.asarray([[10.,7.],[9.,6.]]))
+        
+        numpy.testing.assert_equal(reduceBids(bids,'secondPrice'),
+                                   numpy.asarray([[5.,2.],[8.,4.]]))
+        
+        numpy.testing.assert_equal(reduceBids(bids,'hob',selfIdx = 0),
+                                   numpy.asarray([[5.,7.],[9.,6.]]))
+        
+        numpy.testing.assert_equal(reduceBids(bids,'bids'), bids)
+        
+        self.assertRaises(ValueError, reduceBids, bids, 'hob')
+        
         
         
         
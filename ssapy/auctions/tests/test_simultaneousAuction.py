@@ -0,0 +1,44 @@
+import unittest
+import numpy
+
+from ssapy.auctions.simultaneousAuction import clearAuctions
+
+class test_simultaneousAuction(unittest.TestCase):
+    def test_clearAuctions(self):
+        bids = numpy.zeros((2,3,2))
+        bids[0] = [[10.,1.],[5.,7.],[3.,2.]]
+        bids[1] = [[0.,4.],[8.,0.],[9.,3.]]
+        
+        winners, finalPrices, winningBids = clearAuctions(bids, nPrice = 2, reserve = 0)
+        
+        numpy.testing.assert_equal(winners, numpy.asarray([[0.,1.],[2.,0.]]))
+        numpy.testing.assert_equal(finalPrices, numpy.asarray([[5.,2.],[8.,3.]]))
+        numpy.testing.assert_equal(winningBids, numpy.asarray([[10.,7.],[9.,4.]]))
+        
+    def test_clearAuctionsReserve(self):
+        bids = numpy.asarray([[[10.,0.],[5.,0.],[3.,0.]]])
+        
+        winners, finalPrices, winningBids = clearAuctions(bids, nPrice = 2, reserve = 6)
+        
+        numpy.testing.assert_equal(winners[0,0], 0.)
+        numpy.testing.assert_(numpy.isnan(winners[0,1]))
+        numpy.testing.assert_equal(finalPrices, numpy.asarray([[6.,6.]]))
+        
+    def test_clearAuctionsTies(self):
+        """
+        Tied highest bidders should each win roughly half of the auctions.
+        """
+        nAuctions = 10000
+        bids = numpy.zeros((nAuctions,3,1))
+        bids[:,0,0] = 10.
+        bids[:,1,0] = 10.
+        bids[:,2,0] = 5.
+        
+        winners, finalPrices, winningBids = clearAuctions(bids)
+        
+        numpy.testing.assert_(numpy.all(winners != 2))
+        numpy.testing.assert_almost_equal(numpy.mean(winners == 0), 0.5, 1)
+        numpy.testing.assert_equal(finalPrices, 10.)
+        
+if __name__ == "__main__":
+    unittest.main()
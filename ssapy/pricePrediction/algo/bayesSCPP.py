@@ -1,6 +1,7 @@
 from ssapy.pricePrediction.util import ksStat, klDiv
 from ssapy.pricePrediction.hist import hist
 from ssapy.agents.agentFactory import agentFactory
+from ssapy.auctions import simulationExecutor
 
 import numpy
 import matplotlib.pyplot as plt
@@ -17,7 +18,7 @@ import pickle
 
 def bidHelper(**kwargs):
     agent = kwargs.get('agent')
-    dist  = kwargs.geto('bayesMargDist')
+    dist  = kwargs.get('bayesMargDist')
     
     return agent.bid(pricePrediction = dist)
 
@@ -135,81 +136,91 @@ def bayesSCPP(**kwargs):
                           'minPrice'  : minPrice,
                           'maxPrice'  : maxPrice}
 
-    for sim in xrange(maxSim):
-        oldHist = copy.deepcopy(currHist)
+    # reuse the same workers for every game
+    if parallel:
+        executor = simulationExecutor(nProc)
+    else:
+        executor = None
         
-        for i in xrange(nGames):
-            agentList = [agentFactory(**agentFactoryParams) for i in xrange(nAgents)]
+    try:
+        for sim in xrange(maxSim):
+            oldHist = copy.deepcopy(currHist)
+        
+            for i in xrange(nGames):
+                agentList = [agentFactory(**agentFactoryParams) for i in xrange(nAgents)]
             
-            if parallel:
-                pool = multiprocessing.Pool(nProc)
-                
-                bayesMarg = currHist.bayesMargDistSCPP()
-                
-                results = [pool.apply_async(bidHelper, kwds = {'agent': agent, 'bayesMargDist': bayesMarg} ) for agent in agentList]
+                if parallel:
+                    bayesMarg = currHist.bayesMargDistSCPP()
                 
-                pool.close()
+                    results = [executor.apply_async(bidHelper, kwds = {'agent': agent, 'bayesMargDist': bayesMarg} ) for agent in agentList]
                 
-                pool.join()
+                    bids = numpy.zeros((nAgents,m))
                 
-                bids = numpy.zeros((nAgents,m))
-                
-                for idx,r in enumerate(results):
-                    bids[idx,:] = r.get()
-                    r._value = []
+                    for idx,r in enumerate(results):
+                        bids[idx,:] = r.get()
+                        r._value = []
                     
-            else:
-                bids = numpy.atleast_2d([agent.bid(pricePrediction = currHist.bayesMargDistSCPP()) for agent in agentList])
+                else:
+                    bids = numpy.atleast_2d([agent.bid(pricePrediction = currHist.bayesMargDistSCPP()) for agent in agentList])
                 
-            winningBids = numpy.max(bids,0)
-            for idx, wb in enumerate(winningBids):
-                currHist.upcount(idx,wb,mag=1)
-#            [currHist.upcount(idx, wb, mag=1) for idx, wb in enumerate(winningBids)]
+                winningBids = numpy.max(bids,0)
+                for idx, wb in enumerate(winningBids):
+                    currHist.upcount(idx,wb,mag=1)
+    #            [currHist.upcount(idx, wb, mag=1) for idx, wb in enumerate(winningBids)]
 
-        currBayesMargDist = currHist.bayesMargDistSCPP()
-        oldBayesMargDist  = oldHist.bayesMargDistSCPP()
+            currBayesMargDist = currHist.bayesMargDistSCPP()
+            oldBayesMargDist  = oldHist.bayesMargDistSCPP()
         
-        klList.append(klDiv(currBayesMargDist, oldBayesMargDist))
+            klList.append(klDiv(currBayesMargDist, oldBayesMargDist))
         
-        ksList.append(ksStat(currBayesMargDist, oldBayesMargDist))
+            ksList.append(ksStat(currBayesMargDist, oldBayesMargDist))
         
-        if verbose:
-            print ''
-            print 'itr = {0}'.format(sim+1)
-            print '\tNumber of Games = {0}'.format((sim+1)*nGames)
-            print '\tkld             = {0}'.format(klList[-1])
-            print '\tks              = {0}'.format(ksList[-1])
+            if verbose:
+                print ''
+                print 'itr = {0}'.format(sim+1)
+                print '\tNumber of Games = {0}'.format((sim+1)*nGames)
+                print '\tkld             = {0}'.format(klList[-1])
+                print '\tks              = {0}'.format(ksList[-1])
             
         
-        if plot:
-            oPlot = os.path.join(pltDir,'bayesSCPP_{0}_{1}.png'.format(agentType,(sim+1)*nGames))
-            title='BayesSCPP {0}, klD = {1:.6}, ks = {2:.6} itr = {3}'.format(agentType,klList[-1],ksList[-1],(sim+1)*nGames)
-            currBayesMargDist.graphPdfToFile(fname = oPlot, title=title)
+            if plot:
+                oPlot = os.path.join(pltDir,'bayesSCPP_{0}_{1}.png'.format(agentType,(sim+1)*nGames))
+                title='BayesSCPP {0}, klD = {1:.6}, ks = {2:.6} itr = {3}'.format(agentType,klList[-1],ksList[-1],(sim+1)*nGames)
+                currBayesMargDist.graphPdfToFile(fname = oPlot, title=title)
             
             
-        if saveBayesPkl:
-            of = os.path.join(bayesPklDir,'bayesSCPP_bayesMargDist_{0}_{1}.pkl'\
-                              .format(agentType,int((sim+1)*nGames)))
-            with open(of, 'w') as f:
-                pickle.dump(currBayesMargDist,f)
+            if saveBayesPkl:
+                of = os.path.join(bayesPklDir,'bayesSCPP_bayesMargDist_{0}_{1}.pkl'\
+                                  .format(agentType,int((sim+1)*nGames)))
+                with open(of, 'w') as f:
+                    pickle.dump(currBayesMargDist,f)
                 
-        if saveBayesTxt:
-            of = os.path.join(bayesTxtDir,'bayesSCPP_bayesTxt_{0}_{1}.txt'\
-                              .format(agentType,int((sim+1)*nGames)))
+            if saveBayesTxt:
+                of = os.path.join(bayesTxtDir,'bayesSCPP_bayesTxt_{0}_{1}.txt'\
+                                  .format(agentType,int((sim+1)*nGames)))
             
-            currBayesMargDist.savetxt(of)
+                currBayesMargDist.savetxt(of)
             
          
-        if saveHistPkl:
-            of = os.path.join(bayesPklDir,'bayesSCPP_hist_{0}_{1}.pkl'\
-                              .format(agentType,(sim+1)*nGames))
-            with open(of, 'w') as f:
-                pickle.dump(currHist,f)
+            if saveHistPkl:
+                of = os.path.join(bayesPklDir,'bayesSCPP_hist_{0}_{1}.pkl'\
+                                  .format(agentType,(sim+1)*nGames))
+                with open(of, 'w') as f:
+                    pickle.dump(currHist,f)
                 
         
             
-        if klList[-1] < tol:
-            break
+            if klList[-1] < tol:
+                break
+        
+    except:
+        # stop the workers instead of leaving them behind
+        if executor is not None:
+            executor.terminate()
+        raise
+        
+    if executor is not None:
+        executor.close()
       
     if log:  
         with open(logFile,'a') as f:
@@ -14,7 +14,9 @@ import time
 import pickle
 
 from ssapy import timestamp_
-from ssapy.auctions import simulateAuction
+from ssapy.auctions import simulateAuction, simulationExecutor
+from ssapy.auctions import simulateBidPool, resampleAuctions, bidPoolBootstrap
+from ssapy.auctions.reducers import hobReducer
 from ssapy.pricePrediction import uniformpp
 from ssapy.pricePrediction.jointGMM import jointGMM
 from ssapy.util.padnums import pprint_table
@@ -57,6 +59,33 @@ def pltAic(compRange, aicValues, itr, filename):
     plt.ylim([0,numpy.max(aicValues) + 0.5])
     plt.savefig(filename)
 
+def simulateHob(executor = None, **kwargs):
+    """
+    Highest other bids of kwargs['nGames'] simulated auctions.
+    
+    If kwargs['bidPoolSize'] is set only that many bids are computed and the 
+    auctions are resampled from the pool (see ssapy.auctions.resampleAuctions).
+    With kwargs['nBoot'] > 0 the bootstrap variance of the mean highest other 
+    bid is returned as well (None otherwise).
+    """
+    if not kwargs.get('bidPoolSize'):
+        hob = simulateAuction(executor = executor, reducers = hobReducer(selfIdx = kwargs['selfIdx']), 
+                              **kwargs).result()
+        return hob, None
+    
+    bidPool = simulateBidPool(executor = executor, poolSize = kwargs['bidPoolSize'], **kwargs)
+    
+    hob = resampleAuctions(bidPool, kwargs['nGames'], kwargs['nAgents'], replace = kwargs.get('poolReplace', True),
+                           retType = 'hob', selfIdx = kwargs['selfIdx'])
+    
+    if kwargs.get('nBoot', 0) > 0:
+        mean, var = bidPoolBootstrap(bidPool, kwargs['nGames'], kwargs['nAgents'], nBoot = kwargs['nBoot'], 
+                                     replace = kwargs.get('poolReplace', True), retType = 'hob', 
+                                     selfIdx = kwargs['selfIdx'])
+        return hob, var
+    
+    return hob, None
+
 def jointGmmScpp(**kwargs):
     """
     NOTE: EXTRA MODEL IS FIT TO FULL COVAR GMM - regardless of
@@ -109,6 +138,14 @@ def jointGmmScpp(**kwargs):
     
     kwargs['l']            = kwargs.get('l')
     
+    # resample the auctions from a pool of bidPoolSize bids, None simulates 
+    # every game (see simulateHob)
+    kwargs['bidPoolSize']  = kwargs.get('bidPoolSize')
+    
+    kwargs['poolReplace']  = kwargs.get('poolReplace', True)
+    
+    kwargs['nBoot']        = kwargs.get('nBoot', 0)
+    
     kwargs['timeStamp']    = timestamp_()
 
     ps = paramString(**kwargs)
@@ -135,143 +172,148 @@ def jointGmmScpp(**kwargs):
         
     kwargs['pricePrediction'] = uniformpp(kwargs['m'],kwargs['minValuation'],kwargs['maxValuation'])
     
-    idx2keep = numpy.arange(kwargs['nAgents'])
-    idx2keep = numpy.delete(idx2keep, kwargs['selfIdx'])
-    if kwargs['verbose']:
-        print 'indicies to keep = {0}'.format(idx2keep)
-    
     filePostfix = fileNamePostfix(**kwargs)
     
+    # one set of worker processes for all iterations and the holdout simulation
+    if kwargs['parallel']:
+        executor = simulationExecutor(kwargs['nProc'])
+    else:
+        executor = None
     
-    for itr in xrange(kwargs['maxItr']):
-        itrStart = time.time()
-        if kwargs['verbose']:
-            print 'Iteration {0}'.format(itr+1)
+    try:
+        for itr in xrange(kwargs['maxItr']):
+            itrStart = time.time()
+            if kwargs['verbose']:
+                print 'Iteration {0}'.format(itr+1)
         
-        simStart = time.time()
-        bids = simulateAuction(**kwargs)
-        simEnd = time.time()
-#        simFile = os.path.realpath(os.path.join(kwargs['oDir'],"simulationTime_{0}.txt".format(ps)))
-        simFile = os.path.join(kwargs['oDir'],'simTime_0.01.txt')
-#        if not simFile:
-#            with open(os.path.realpath(simFile),'w+') as f:
-#                numpy.savetxt(f, numpy.atleast_1d(simEnd-simStart))
-#        else:
-#        with open(os.path.join(kwargs['oDir'],"simulationTime_{0}.txt".format(ps)),'a+') as f:
-        with open(simFile,'a+') as f:
-            numpy.savetxt(f, numpy.atleast_1d(simEnd-simStart)) 
+            simStart = time.time()
+            hob, hobVar = simulateHob(executor = executor, **kwargs)
+            simEnd = time.time()
+    #        simFile = os.path.realpath(os.path.join(kwargs['oDir'],"simulationTime_{0}.txt".format(ps)))
+            simFile = os.path.join(kwargs['oDir'],'simTime_0.01.txt')
+    #        if not simFile:
+    #            with open(os.path.realpath(simFile),'w+') as f:
+    #                numpy.savetxt(f, numpy.atleast_1d(simEnd-simStart))
+    #        else:
+    #        with open(os.path.join(kwargs['oDir'],"simulationTime_{0}.txt".format(ps)),'a+') as f:
+            with open(simFile,'a+') as f:
+                numpy.savetxt(f, numpy.atleast_1d(simEnd-simStart)) 
             
-        if kwargs['verbose']:
-            print 'Simulated {0} auctions in {1} seconds'.format(kwargs['nGames'],simEnd-simStart)
+            if kwargs['verbose']:
+                print 'Simulated {0} auctions in {1} seconds'.format(kwargs['nGames'],simEnd-simStart)
             
-        del simStart, simEnd
+            del simStart, simEnd
         
-        bidsFile = 'bids_{0:04}_{1}.npy'.format(itr,filePostfix)
-        with open(os.path.join(kwargs['oDir'], bidsFile),'w') as f:
-            numpy.save(f, bids)
+            hobFile = os.path.join(kwargs['oDir'],'hob_{0:04}_{1}.txt'.format(itr,filePostfix))
+            with open(hobFile,'w') as f:
+                numpy.savetxt(f,hob)
             
-        hob = numpy.max(bids[:,idx2keep,:],1)
-        hobFile = os.path.join(kwargs['oDir'],'hob_{0:04}_{1}.txt'.format(itr,filePostfix))
-        with open(hobFile,'w') as f:
-            numpy.savetxt(f,hob)
-        
-        del bids
+            if hobVar is not None:
+                if kwargs['verbose']:
+                    print 'Bootstrap variance of the mean hob = {0}'.format(hobVar)
+                with open(os.path.join(kwargs['oDir'],'hobBootVar_{0}.txt'.format(filePostfix)),'a') as f:
+                    numpy.savetxt(f, numpy.atleast_2d(hobVar))
                     
-        nextpp = jointGMM(covariance_type = kwargs.get('covariance_type'))
-        temppp, aicValues, compRange = nextpp.aicFit(X=hob, compRange = models, min_covar = kwargs['aicMinCovar'], verbose = kwargs['verbose'])
+            nextpp = jointGMM(covariance_type = kwargs.get('covariance_type'))
+            temppp, aicValues, compRange = nextpp.aicFit(X=hob, compRange = models, min_covar = kwargs['aicMinCovar'], verbose = kwargs['verbose'])
         
-        aicFile = os.path.join(kwargs['oDir'],'aic_{0:03}_{1}.pdf'.format(itr+1,filePostfix))
+            aicFile = os.path.join(kwargs['oDir'],'aic_{0:03}_{1}.pdf'.format(itr+1,filePostfix))
         
-        pltAic(compRange,aicValues,itr,aicFile)
+            pltAic(compRange,aicValues,itr,aicFile)
         
-        del hob,temppp,compRange
+            del hob,temppp,compRange
         
-        ppFile = os.path.join(kwargs['oDir'], 'gmmScpp_{0:04}_{1}.pkl'.format(itr,filePostfix))
-        with open(ppFile,'w') as f:
-            pickle.dump(nextpp,f)
+            ppFile = os.path.join(kwargs['oDir'], 'gmmScpp_{0:04}_{1}.pkl'.format(itr,filePostfix))
+            with open(ppFile,'w') as f:
+                pickle.dump(nextpp,f)
             
-        if kwargs['pltMarg']:
-            oFile = os.path.join(kwargs['oDir'],'marg_{0:04}_{1}.pdf'.format(itr,filePostfix))
-            nextpp.pltMarg(oFile = oFile)
+            if kwargs['pltMarg']:
+                oFile = os.path.join(kwargs['oDir'],'marg_{0:04}_{1}.pdf'.format(itr,filePostfix))
+                nextpp.pltMarg(oFile = oFile)
         
-        with open(os.path.join(kwargs['oDir'],'aic_{0:04}_{1}.txt'.format(itr,filePostfix)),'a') as f:
-            numpy.savetxt(f,numpy.atleast_1d(aicValues).T)
+            with open(os.path.join(kwargs['oDir'],'aic_{0:04}_{1}.txt'.format(itr,filePostfix)),'a') as f:
+                numpy.savetxt(f,numpy.atleast_1d(aicValues).T)
         
-        if kwargs['verbose']:
-            print 'AIC Fit: number of components = {0}'.format(nextpp.n_components)
+            if kwargs['verbose']:
+                print 'AIC Fit: number of components = {0}'.format(nextpp.n_components)
             
-        with open(os.path.join(kwargs['oDir'],'n_components_{0}.txt'.format(filePostfix)), 'a') as f:
-            numpy.savetxt(f,numpy.atleast_1d(nextpp.n_components))
+            with open(os.path.join(kwargs['oDir'],'n_components_{0}.txt'.format(filePostfix)), 'a') as f:
+                numpy.savetxt(f,numpy.atleast_1d(nextpp.n_components))
             
-        if itr > 0:
-            kld = numpy.abs(apprxJointGmmKL(kwargs['pricePrediction'], nextpp, 
-                            nSamples = kwargs['nklsamples'], verbose = kwargs['verbose']))
+            if itr > 0:
+                kld = numpy.abs(apprxJointGmmKL(kwargs['pricePrediction'], nextpp, 
+                                nSamples = kwargs['nklsamples'], verbose = kwargs['verbose']))
             
-            with open(os.path.join(kwargs['oDir'],'kld_{0}.txt'.format(filePostfix)),'a') as f:
-                numpy.savetxt(f,numpy.atleast_1d(kld))
+                with open(os.path.join(kwargs['oDir'],'kld_{0}.txt'.format(filePostfix)),'a') as f:
+                    numpy.savetxt(f,numpy.atleast_1d(kld))
                 
-            if kwargs['verbose']:
-                print 'Symmetric KL Distance = {0}'.format(kld)
+                if kwargs['verbose']:
+                    print 'Symmetric KL Distance = {0}'.format(kld)
         
-        itrEnd = time.time()
-        with open(os.path.join(kwargs['oDir'], "itrTime_{0}.txt".format(filePostfix)),'a') as f:
-            numpy.savetxt(f, numpy.atleast_1d(itrEnd-itrStart))
+            itrEnd = time.time()
+            with open(os.path.join(kwargs['oDir'], "itrTime_{0}.txt".format(filePostfix)),'a') as f:
+                numpy.savetxt(f, numpy.atleast_1d(itrEnd-itrStart))
             
-        kwargs['pricePrediction'] = nextpp
+            kwargs['pricePrediction'] = nextpp
         
-        if itr > 0:
-            if kld < kwargs['tol']:
-                if kwargs['verbose']:
-                    print 'kld = {0} < tol = {1}'.format(kld, kwargs['tol'])
-                    print 'CONVERGED!'
+            if itr > 0:
+                if kld < kwargs['tol']:
+                    if kwargs['verbose']:
+                        print 'kld = {0} < tol = {1}'.format(kld, kwargs['tol'])
+                        print 'CONVERGED!'
                     
-                break
-        else:
-            print ''
+                    break
+            else:
+                print ''
             
-    with open(os.path.join(kwargs['oDir'],'kld_{0}.txt'.format(filePostfix)),'r') as f:
-        kld = numpy.loadtxt(f, 'float')
+        with open(os.path.join(kwargs['oDir'],'kld_{0}.txt'.format(filePostfix)),'r') as f:
+            kld = numpy.loadtxt(f, 'float')
      
-    f, ax = plt.subplots()
-    plt.plot(kld,'r-',linewidth=3)
-    plt.title("Absolute Symmetric K-L Divergence")
-    plt.xlabel("Iteration")
-    plt.ylabel(r"|kld|")
-    plt.savefig(os.path.join(kwargs['oDir'],'kld_{0}.pdf'.format(ps)))
+        f, ax = plt.subplots()
+        plt.plot(kld,'r-',linewidth=3)
+        plt.title("Absolute Symmetric K-L Divergence")
+        plt.xlabel("Iteration")
+        plt.ylabel(r"|kld|")
+        plt.savefig(os.path.join(kwargs['oDir'],'kld_{0}.pdf'.format(ps)))
     
-    del kld
+        del kld
     
-    with open(os.path.join(kwargs['oDir'],'n_components_{0}.txt'.format(filePostfix)),'r') as f:
-        comp = numpy.loadtxt(f)
+        with open(os.path.join(kwargs['oDir'],'n_components_{0}.txt'.format(filePostfix)),'r') as f:
+            comp = numpy.loadtxt(f)
         
-    f,ax = plt.subplots()
-    colors = ['#0A0A2A']*len(aicValues)
-    ax.bar(range(len(comp)), comp, color=colors, align = 'center')
-    ax.set_ylabel('GMM Model (Number of Components)')
-    ax.set_xlabel('Iteration')
-    ax.set_title('Model Selection')
-    plt.ylim([0,numpy.max(comp) + 0.5])
-    plt.savefig(os.path.join(kwargs['oDir'],'n_components_{0}.pdf'.format(ps)))
+        f,ax = plt.subplots()
+        colors = ['#0A0A2A']*len(aicValues)
+        ax.bar(range(len(comp)), comp, color=colors, align = 'center')
+        ax.set_ylabel('GMM Model (Number of Components)')
+        ax.set_xlabel('Iteration')
+        ax.set_title('Model Selection')
+        plt.ylim([0,numpy.max(comp) + 0.5])
+        plt.savefig(os.path.join(kwargs['oDir'],'n_components_{0}.pdf'.format(ps)))
     
-    del comp
-    
-    if kwargs['verbose']:
-        print 'Simulating {0} auctions after scpp converged.'.format(kwargs['nGames'])
+        del comp
     
-    # To check if distribution is SCPP, after convergence simulate
-    # more bids then evaluate measures of similarity between the resulting 
-    # bids and the scpp candidate.
-    start = time.time()    
-    extraBids = simulateAuction(**kwargs)
-    end = time.time()
-    
-    with open(os.path.join(kwargs['oDir'],'extraBids_{0}.npy'.format(filePostfix)), 'w') as f:
-        numpy.save(f, extraBids)
+        if kwargs['verbose']:
+            print 'Simulating {0} auctions after scpp converged.'.format(kwargs['nGames'])
+    
+        # To check if distribution is SCPP, after convergence simulate
+        # more bids then evaluate measures of similarity between the resulting 
+        # bids and the scpp candidate.
+        start = time.time()    
+        extraHob, extraHobVar = simulateHob(executor = executor, **kwargs)
+        end = time.time()
+    
+    except:
+        # stop the workers instead of leaving them behind
+        if executor is not None:
+            executor.terminate()
+        raise
+        
+    if executor is not None:
+        executor.close()
     
     if kwargs['verbose']:
         print 'Simulated {0} holdout auctions in {1} seconds'.format(kwargs['nGames'],end-start)
         
-    extraHob = numpy.max(extraBids[:,idx2keep,:],1)
     with open(os.path.join(kwargs['oDir'],'extraHob_{0}.txt'.format(filePostfix)),'w') as f:
         numpy.savetxt(f, extraHob)
     
@@ -1,10 +1,12 @@
 import numpy
 from sklearn import mixture
-from ssapy.multiprocessingAdaptor import Consumer
 
-from ssapy.pricePrediction.margDistSCPP import margDistSCPP
+from ssapy.scpp.depreciated.margDistSCPP import margDistSCPP
 from ssapy.pricePrediction.util import aicFit, drawGMM, plotMargGMM, apprxMargKL
 from ssapy.pricePrediction.util import simulateAuctionMargGMM
+from ssapy.util.sharedModel import sharedModel
+from ssapy.auctions import simulationExecutor
+from ssapy.auctions.reducers import reservoirReducer
 
 import matplotlib.pyplot as plt
 from scipy.stats import norm
@@ -17,6 +19,10 @@ import random
 import itertools
 import argparse
                 
+def _simulateChunkMargGMM(start, stop, **kwargs):
+    kwargs['nGames'] = stop - start
+    return simulateAuctionMargGMM(**kwargs)
+
 def margGaussSCPP(**kwargs):
     oDir = kwargs.get('oDir')
     if not oDir:
@@ -37,6 +43,7 @@ def margGaussSCPP(**kwargs):
     pltDist   = kwargs.get('pltDist',True)
     nProc     = kwargs.get('nProc',multiprocessing.cpu_count()-1)
     minCovar  = kwargs.get('minCovar',9)
+    reservoirSize = kwargs.get('reservoirSize')
     verbose   = kwargs.get('verbose',True) 
     
     
@@ -54,84 +61,107 @@ def margGaussSCPP(**kwargs):
         print 'serial    = {0}'.format(serial)
         print 'nProc     = {0}'.format(nProc)
         print 'minCovar  = {0}'.format(minCovar)
+        print 'reservoirSize = {0}'.format(reservoirSize)
+    
+    if not serial:
+        executor = simulationExecutor(nProc)
+    else:
+        executor = None
     
-    clfList = None
-    clfPrev = None
-    klList = []
-    for itr in xrange(maxItr):
+    try:
+        clfList = None
+        clfPrev = None
+        klList = []
+        for itr in xrange(maxItr):
         
-        if serial:
-            winningBids = simulateAuctionMargGMM(agentType = agentType,
-                                             nAgents   = nAgents,
-                                             clfList   = clfList,
-                                             nSamples  = nSamples,
-                                             nGames    = nGames,
-                                             m         = m)
-        else:
-            pool = multiprocessing.Pool(nProc)
-            
-            winningBids = numpy.zeros((nGames,m))
-            nGameList = [nGames//nProc]*nProc
-            nGameList[-1] += (nGames % nProc)
-            
-            results = []
-            for p in xrange(nProc):
+            # optionally fit to a fixed size uniform sample of the winning bids
+            # instead of keeping all nGames of them
+            if reservoirSize is not None:
+                reservoir = reservoirReducer(reservoirSize)
+            else:
+                reservoir = None
+        
+            if serial:
+                winningBids = simulateAuctionMargGMM(agentType = agentType,
+                                                 nAgents   = nAgents,
+                                                 clfList   = clfList,
+                                                 nSamples  = nSamples,
+                                                 nGames    = nGames,
+                                                 m         = m,
+                                                 reducer   = reservoir)
+                if reservoir is not None:
+                    winningBids = reservoir.result()
+            else:
                 ka = {'agentType':agentType, 
                       'nAgents':nAgents,
-                      'clfList':clfList,
+                      'clfList':None,
                       'nSamples':nSamples,
-                      'nGames':nGameList[p],'m':m}
-                results.append(pool.apply_async(simulateAuctionMargGMM, kwds = ka))
-            
-            pool.close()
+                      'm':m}
+                if reservoir is not None:
+                    ka['reducer'] = reservoir.spawn()
             
-            pool.join()
+                # idle workers pull chunks of games, results come back in game order
+                if clfList is not None:
+                    # publish the marginals once instead of pickling them into every task
+                    with sharedModel(clfList) as sharedClf:
+                        ka['clfList'] = sharedClf
+                        results, bounds = executor.map(_simulateChunkMargGMM, nGames, ka)
+                else:
+                    results, bounds = executor.map(_simulateChunkMargGMM, nGames, ka)
             
-            start_row = 0
-            end_row = 0
-            for idx, r in enumerate(results):
-                end_row += nGameList[idx]
-                winningBids[start_row:end_row,:] = r.get()
-                results[idx]._value = []
-                start_row = end_row
+                if reservoir is not None:
+                    for r in results:
+                        reservoir.merge(r)
+                    winningBids = reservoir.result()
+                else:
+                    winningBids = numpy.concatenate(results)
         
         
-        clfList = []
-        for i in xrange(winningBids.shape[1]):
-            clf, aicList, compRange = aicFit(winningBids[:,i], minCovar = minCovar)
-            clfList.append(clf)
+            clfList = []
+            for i in xrange(winningBids.shape[1]):
+                clf, aicList, compRange = aicFit(winningBids[:,i], minCovar = minCovar)
+                clfList.append(clf)
             
         
-        if clfPrev:
-            kl = apprxMargKL(clfList, clfPrev, klSamples)
-            klList.append(kl)
+            if clfPrev:
+                kl = apprxMargKL(clfList, clfPrev, klSamples)
+                klList.append(kl)
             
-        if pltDist:
-            pltDir = os.path.join(oDir,'scppPlts')
-            if not os.path.exists(pltDir):
-                os.makedirs(pltDir)
-            oFile = os.path.join(oDir, 'scppPlts', 'gaussMargSCPP_{0}.png'.format(itr))
-            if klList: 
-                title = "margGaussSCPP itr = {0} kld = {1}".format(itr,klList[-1])
-            else:
-                title = "margGaussSCPP itr = {0}".format(itr)
-            plotMargGMM(clfList = clfList, 
-                        oFile = oFile, 
-                        minPrice = minPrice, 
-                        maxPrice = maxPrice,
-                        title = title)
+            if pltDist:
+                pltDir = os.path.join(oDir,'scppPlts')
+                if not os.path.exists(pltDir):
+                    os.makedirs(pltDir)
+                oFile = os.path.join(oDir, 'scppPlts', 'gaussMargSCPP_{0}.png'.format(itr))
+                if klList: 
+                    title = "margGaussSCPP itr = {0} kld = {1}".format(itr,klList[-1])
+                else:
+                    title = "margGaussSCPP itr = {0}".format(itr)
+                plotMargGMM(clfList = clfList, 
+                            oFile = oFile, 
+                            minPrice = minPrice, 
+                            maxPrice = maxPrice,
+                            title = title)
             
-        if klList:
-            if numpy.abs(klList[-1]) < tol:
-                klFile = os.path.join(oDir,'kld.json')
-                with open(klFile,'w') as f:
-                    json.dump(klList,f)
+            if klList:
+                if numpy.abs(klList[-1]) < tol:
+                    klFile = os.path.join(oDir,'kld.json')
+                    with open(klFile,'w') as f:
+                        json.dump(klList,f)
                     
-                print 'kld = {0} < tol = {1}'.format(klList[-1],tol)
-                print 'DONE'
-                break
+                    print 'kld = {0} < tol = {1}'.format(klList[-1],tol)
+                    print 'DONE'
+                    break
     
-        clfPrev = clfList
+            clfPrev = clfList
+        
+    except:
+        # stop the workers instead of leaving them behind
+        if executor is not None:
+            executor.terminate()
+        raise
+        
+    if executor is not None:
+        executor.close()
         
     
     
@@ -153,6 +183,7 @@ def main():
     parser.add_argument("--tol",               action = "store", type = int,   dest = "tol",       default = 0.01)
     parser.add_argument("--pltDist",           action = "store", type = bool,  dest = "pltDist",   default = True)
     parser.add_argument("--minCovar",          action = "store", type = float, dest = "minCovar",  default = 1.0)
+    parser.add_argument("--reservoirSize",     action = "store", type = int,   dest = "reservoirSize", default = None)
     
     opts = parser.parse_args()
     
@@ -170,6 +201,7 @@ def main():
     klSamples = opts.klSamples
     nProc     = opts.nProc
     minCovar  = opts.minCovar
+    reservoirSize = opts.reservoirSize
     
     margGaussSCPP(oDir      = oDir,
                   agentType = agentType,
@@ -184,6 +216,7 @@ def main():
                   klSamples = klSamples,
                   nProc     = nProc,
                   minCovar  = minCovar,
+                  reservoirSize = reservoirSize,
                   verbose   = verbose)
     
     
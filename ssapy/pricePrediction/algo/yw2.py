@@ -1,10 +1,12 @@
 import numpy
 
-from ssapy.multiprocessingAdaptor import Consumer
 from ssapy.agents.agentFactory import agentFactory
-from ssapy.pricePrediction.margDistSCPP import margDistSCPP
+from ssapy.scpp.depreciated.margDistSCPP import margDistSCPP
 
 from ssapy.pricePrediction.util import klDiv, ksStat, updateDist
+from ssapy.util.sharedModel import sharedModel, attachModel
+from ssapy.auctions import simulationExecutor
+from ssapy.auctions.reducers import histogramReducer
 
 import json
 import multiprocessing
@@ -12,43 +14,53 @@ import os
 import time
 
 def simulateAuction( **kwargs ):
+    """
+    Winning bids of nGames auctions, shape (nGames,m).
+    
+    If a streaming reducer is given (see ssapy.auctions.reducers), the winning
+    bids of every chunkSize games are passed to reducer.updateStat(...) instead
+    and the reducer is returned.
+    """
     agentType     = kwargs.get('agentType')
     nAgents       = kwargs.get('nAgents')
     margDist      = kwargs.get('margDist')
     nGames        = kwargs.get('nGames')
+    reducer       = kwargs.get('reducer')
+    chunkSize     = kwargs.get('chunkSize', 1000)
     m             = margDist.m
-
-    winningBids = numpy.zeros((nGames,m))
     
-    for g in xrange(nGames):
-        agentList = [agentFactory(agentType = agentType, m = m) for i in xrange(nAgents)]
+    if reducer is None:
+        chunkSize = nGames
+        
+    winningBids = numpy.zeros((min(chunkSize,nGames),m))
     
-        bids = numpy.atleast_2d([agent.bid(margDistPrediction = margDist) for agent in agentList])
+    for start in xrange(0, nGames, chunkSize):
+        n = min(chunkSize, nGames - start)
         
-        winningBids[g,:] = numpy.max(bids,0)
-#    return numpy.max(bids,0)
-    return winningBids
-
-class yw2Task(object):
-    def __init__(self, **kwargs):
-        self.agentType = kwargs.get('agentType')
-        self.nAgents   = kwargs.get('nAgents')
-        self.margDist  = kwargs.get('margDist')
-        self.nGames    = kwargs.get('nGames')
+        for g in xrange(n):
+            agentList = [agentFactory(agentType = agentType, m = m) for i in xrange(nAgents)]
+        
+            bids = numpy.atleast_2d([agent.bid(pricePrediction = margDist) for agent in agentList])
+            
+            winningBids[g,:] = numpy.max(bids,0)
+            
+        if reducer is None:
+            return winningBids
         
-    def __call__(self):
+        reducer.updateStat(winningBids[:n])
         
-#        winningBids = numpy.zeros((self.nGames,self.margDist.m))
-#        for i in xrange(self.nGames):
-#            winningBids[i,:] = simulateAuction(agentType = self.agentType, 
-#                                               nAgents = self.nAgents, 
-#                                               margDist = self.margDist)
-#            
-#        return winningBids
-        return simulateAuction(agentType = self.agentType,
-                               nAgents   = self.nAgents,
-                               margDist  = self.margDist,
-                               nGames    = self.nGames)
+    return reducer
+
+def yw2Chunk(start, stop, **kwargs):
+    """
+    Simulate games [start, stop) into kwargs['reducer'], margDist may be a
+    sharedModel handle.
+    """
+    return simulateAuction(agentType = kwargs.get('agentType'),
+                           nAgents   = kwargs.get('nAgents'),
+                           margDist  = attachModel(kwargs.get('margDist')),
+                           nGames    = stop - start,
+                           reducer   = kwargs.get('reducer'))
     
     
 def yw2SCPP(**kwargs):
@@ -93,148 +105,133 @@ def yw2SCPP(**kwargs):
     
     
     if not serial:
-        nGamesList = [g/nProc]*nProc
-        nGamesList[-1] += (g%nProc)
+        executor = simulationExecutor(nProc)
+    else:
+        executor = None
     
-    #initial uniform distribution
-    tempDist = []
-    p = float(1)/round(maxPrice - minPrice)
-    a = [p]*(maxPrice - minPrice)
-#    binEdges = [bin for bin in xrange( int(minPrice - maxPrice)+1 ) ]
-    binEdges = numpy.arange(minPrice,maxPrice+1,1)
-    for i in xrange(m):
-        tempDist.append((numpy.atleast_1d(a),numpy.atleast_1d(binEdges)))
+    try:
+        #initial uniform distribution
+        tempDist = []
+        p = float(1)/round(maxPrice - minPrice)
+        a = [p]*(maxPrice - minPrice)
+    #    binEdges = [bin for bin in xrange( int(minPrice - maxPrice)+1 ) ]
+        binEdges = numpy.arange(minPrice,maxPrice+1,1)
+        for i in xrange(m):
+            tempDist.append((numpy.atleast_1d(a),numpy.atleast_1d(binEdges)))
         
-    currentDist = margDistSCPP(tempDist)
+        currentDist = margDistSCPP(tempDist)
     
-    #clean up
-    # keep the binEdges for later histograms
-    del p,a,tempDist
+        #clean up
+        # keep the binEdges for later histograms
+        del p,a,tempDist
     
-    ksList = []
-    klList = []
-    for t in xrange(0,L):
+        ksList = []
+        klList = []
+        for t in xrange(0,L):
         
-        if pltItr:
-            cs = cs = ['y--p', 'm-*', 'r-o','y-^','y-*']
-            graphname = os.path.join(oDir,'ywSCPP_itr_{0}.png'.format(t))
-            if not ksList:
-                title = "yw2SCPP, {0}, \n itr = {1}".format(agentType,t)
-            else:
-                title = "ywSCPP, {0} \n kld = {1}, ks = {2} \nitr = {3}".format(agentType,klList[-1],ksList[-1],t)
-            currentDist.graphPdfToFile(fname = graphname,
-                                       colorStyles = cs,
-                                       title = title)
+            if pltItr:
+                cs = cs = ['y--p', 'm-*', 'r-o','y-^','y-*']
+                graphname = os.path.join(oDir,'ywSCPP_itr_{0}.png'.format(t))
+                if not ksList:
+                    title = "yw2SCPP, {0}, \n itr = {1}".format(agentType,t)
+                else:
+                    title = "ywSCPP, {0} \n kld = {1}, ks = {2} \nitr = {3}".format(agentType,klList[-1],ksList[-1],t)
+                currentDist.graphPdfToFile(fname = graphname,
+                                           colorStyles = cs,
+                                           title = title)
         
-        if verbose:
-            print ""
-            print 'Iteration = {0}'.format(t)
-            
-        if dampen:
-            kappa = float(L - t) / L
-        else:
-            kappa = 1
-            
-        if serial:
-            result = numpy.zeros(g,m)
-            for i in xrange(g):
-                result[i,:] = simulateAuction(agentType = agentType, nAgents = nAgents, margDist = currentDist) 
-                
-        else:
-            tasks = multiprocessing.JoinableQueue()
-            
-            results = multiprocessing.Queue()
-            
-            consumers = [Consumer(tasks,results) for i in xrange(nProc)]
-            
-            #start the consumers
-            [w.start() for w in consumers]
-                     
-            [tasks.put( yw2Task(agentType = agentType, nAgents = nAgents, margDist = currentDist, nGames = nGames) ) for nGames in nGamesList]
-            
-            [tasks.put(None) for i in xrange(nProc)]
-            
-            if verbose:
-                start = time.time()
-                print "Waiting for {0} game simulation Simulation...".format(g)
-                
-            tasks.join()
-            
-            if verbose:
-                print ""
-                print "Finished {0} simulations in {1} seconds.".format(g,time.time()-start)
-            
             if verbose:
                 print ""
-                print "Collecting Results"
-                start = time.time()
-             
+                print 'Iteration = {0}'.format(t)
             
+            if dampen:
+                kappa = float(L - t) / L
+            else:
+                kappa = 1
             
-               
-            rList = []
-            while not results.empty():
-                rList.append(results.get())
+            # only the per good histograms of the winning bids are needed
+            hist = histogramReducer(binEdges)
+        
+            if serial:
+                simulateAuction(agentType = agentType, nAgents = nAgents, margDist = currentDist, 
+                                nGames = g, reducer = hist)
+                
+            else:
+                if verbose:
+                    start = time.time()
+                    print "Waiting for {0} game simulation Simulation...".format(g)
                 
-            result = numpy.vstack(rList)
+                # publish the current distribution once for all chunks,
+                # idle workers pull chunks of games
+                with sharedModel(currentDist) as sharedDist:
+                    results, bounds = executor.map(yw2Chunk, g, {'agentType' : agentType,
+                                                                 'nAgents'   : nAgents,
+                                                                 'margDist'  : sharedDist,
+                                                                 'reducer'   : hist.spawn()})
             
-            if verbose:
-                print ""
-                print "Done collecting results in {0} seconds".format(time.time() - start)
+                for r in results:
+                    hist.merge(r)
+            
+                if verbose:
+                    print ""
+                    print "Finished {0} simulations in {1} seconds.".format(g,time.time()-start)
                 
-            [w.terminate() for w in consumers]
-            del results,tasks,consumers
+                del results
         
             
-        histData = [] 
-        histCount = []
-        for m in xrange(result.shape[1]):
-            histData.append(numpy.histogram(result[:,m],binEdges,density=True))
-#            histCount.append(numpy.histogram(result[:,m],binEdges,density=False))
+            histData = hist.result(density = True)
             
-        newDist = margDistSCPP(histData)  
-        ksList.append(ksStat(currentDist, newDist))
-        klList.append(klDiv(currentDist, newDist))
+            newDist = margDistSCPP(histData)  
+            ksList.append(ksStat(currentDist, newDist))
+            klList.append(klDiv(currentDist, newDist))
         
-        if ksList[-1] < d or t == (L-1):
+            if ksList[-1] < d or t == (L-1):
             
-            postfix = '{0}_{1}_{2}_{3}_{4}_{5}'.format(agentType, g, m, d,minPrice,maxPrice)
-            pklName = 'distPricePrediction_' + postfix + '.pkl'
-            txtName = 'distPricePrediction_' + postfix + '.txt'
+                postfix = '{0}_{1}_{2}_{3}_{4}_{5}'.format(agentType, g, m, d,minPrice,maxPrice)
+                pklName = 'distPricePrediction_' + postfix + '.pkl'
+                txtName = 'distPricePrediction_' + postfix + '.txt'
             
-            pricePredictionPklFilename = os.path.join(oDir, pklName) 
+                pricePredictionPklFilename = os.path.join(oDir, pklName) 
                                                       
-            currentDist.savePickle(pricePredictionPklFilename)
+                currentDist.savePickle(pricePredictionPklFilename)
             
-            pricePredictionTxtFilename = os.path.join(oDir, txtName)
+                pricePredictionTxtFilename = os.path.join(oDir, txtName)
             
-            #this section could be improved....
-            testdata = []
-            for m in xrange(currentDist.m):
-                if m == 0:
-                    textdata = numpy.vstack([currentDist.data[m][0],currentDist.data[m][1][:-1]])
-                else:
-                    textdata = numpy.vstack([textdata, numpy.vstack([currentDist.data[m][0],currentDist.data[m][1][:-1]])])
+                #this section could be improved....
+                testdata = []
+                for m in xrange(currentDist.m):
+                    if m == 0:
+                        textdata = numpy.vstack([currentDist.data[m][0],currentDist.data[m][1][:-1]])
+                    else:
+                        textdata = numpy.vstack([textdata, numpy.vstack([currentDist.data[m][0],currentDist.data[m][1][:-1]])])
                     
-            numpy.savetxt(pricePredictionTxtFilename,textdata)
+                numpy.savetxt(pricePredictionTxtFilename,textdata)
             
-            print ''
-            print'Terminated after {0} Iterations'.format(t)
-            print'Final Expected Price Vector = {0}'.format(currentDist.expectedPrices())
+                print ''
+                print'Terminated after {0} Iterations'.format(t)
+                print'Final Expected Price Vector = {0}'.format(currentDist.expectedPrices())
             
-            ksListName = os.path.join(oDir,'ksList.json')
-            with open(ksListName,'w') as f:
-                json.dump(ksList,f)
-            klListName = os.path.join(oDir,'klList.json')
-            with open(klListName,'w') as f:
-                json.dump(klList,f)
+                ksListName = os.path.join(oDir,'ksList.json')
+                with open(ksListName,'w') as f:
+                    json.dump(ksList,f)
+                klListName = os.path.join(oDir,'klList.json')
+                with open(klListName,'w') as f:
+                    json.dump(klList,f)
             
-            break
-        else:
+                break
+            else:
             
-            currentDist = updateDist(currentDist, newDist, kappa)
-            del result, newDist
+                currentDist = updateDist(currentDist, newDist, kappa)
+                del hist, newDist
             
+    except:
+        # stop the workers instead of leaving them behind
+        if executor is not None:
+            executor.terminate()
+        raise
+        
+    if executor is not None:
+        executor.close()
         
         
 if __name__ == "__main__":
@@ -256,9 +253,7 @@ if __name__ == "__main__":
     
     margDist = margDistSCPP(tempDist)
     
-    task = yw2Task(agentType = "straightMU8", nAgents = 8, margDist = margDist, nGames = 1)
-        
-    winningBids = task()
+    winningBids = yw2Chunk(0, 1, agentType = "msStraightMU8", nAgents = 8, margDist = margDist)
 
 #    yw2SCPP(oDir = oDir, agentType = agentType, minPrice = minPrice, maxPrice = maxPrice, m = m, L = L, d = d, g = g)
     
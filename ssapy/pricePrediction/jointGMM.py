@@ -1,7 +1,11 @@
 import numpy
 import sklearn.mixture
+from sklearn.utils import check_random_state
 from scipy.stats import norm
-from mvncdf import mvnormcdf
+from scipy.special import ndtr, ndtri
+from mvncdf import mvstdnormcdf, mvstdnormcdfBatch, mvstdnormcdfLattice, packCorrelation, unpackCorrelation
+from sklearn.utils.extmath import logsumexp
+from ssapy.util import revenueTable, bundle2idx, listBundles
 
 import matplotlib.pyplot as plt
 from matplotlib import cm
@@ -13,21 +17,119 @@ import os
 import multiprocessing
 
 def expectedSurplus_( bundleRevenueDict, bidVector, samples ):
-    es = numpy.float64(0.)
+    """
+    Monte Carlo estimate of expected surplus of a bid vector.
+    
+    bundleRevenueDict may be a dictionary mapping tuple(bundle) -> revenue
+    or a revenue table (see ssapy.util.revenueTable).
+    """
+    table = revenueTable(bundleRevenueDict)
+    
+    goodsWon = samples <= bidVector
+    
+    rev  = table[bundle2idx(goodsWon)]
+    cost = numpy.sum(goodsWon*samples,1)
+    
+    return numpy.sum(rev-cost)/samples.shape[0]
+        
+def expectedSurplusBatch_(bundleRevenueDict, bids, samples, blockSize = None, maxElements = 2**22):
+    """
+    Monte Carlo estimate of the expected surplus of many bid vectors 
+    against the same samples.
+    
+    Bids are processed in blocks of blockSize rows so that at most 
+    blockSize*nSamples win pattern indices are held in memory; blockSize 
+    defaults to maxElements//nSamples. The revenue of every (bid, sample) 
+    pair is looked up by bitmask. The cost of good j only depends on bid j, 
+    so it is read off the prefix sums of the sorted samples of good j.
+    
+    INPUTS
+    ------
+    bundleRevenueDict := a dictionary mapping tuple(bundle) -> revenue or a 
+                         revenue table (see ssapy.util.revenueTable)
+                         
+    bids              := (2d array-like) shape (nBids, m)
+    
+    samples           := (2d array-like) shape (nSamples, m)
+    
+    OUTPUTS
+    -------
+    es                := (1d array-like) shape (nBids,), es[i] == expectedSurplus_(bundleRevenueDict, bids[i], samples)
+    """
+    table = revenueTable(bundleRevenueDict)
+    
+    bids    = numpy.atleast_2d(numpy.asarray(bids, dtype = numpy.float))
+    samples = numpy.atleast_2d(numpy.asarray(samples, dtype = numpy.float))
+    
+    nBids, m = bids.shape
+    nSamples = samples.shape[0]
+    
+    if blockSize is None:
+        blockSize = max(maxElements//nSamples, 1)
+        
+    if m <= 8:
+        idxType = numpy.uint8
+    elif m <= 16:
+        idxType = numpy.uint16
+    else:
+        idxType = numpy.int64
+    
+    sortedSamples = numpy.sort(samples, 0)
+    cumCost = numpy.vstack((numpy.zeros(m), numpy.cumsum(sortedSamples, 0)))
     
-    for sample in samples:
-        goodsWon = sample <= bidVector
-        rev = bundleRevenueDict[(tuple(goodsWon))]
-        cost = numpy.dot(goodsWon,sample)
-        es += rev-cost
+    cost = numpy.zeros(nBids)
+    for j in xrange(m):
+        nWon = numpy.searchsorted(sortedSamples[:,j], bids[:,j], side = 'right')
+        cost += cumCost[nWon, j]
         
-    return es/samples.shape[0]
+    rev = numpy.zeros(nBids)
+    for start in xrange(0, nBids, blockSize):
+        block = bids[start:start + blockSize]
+        
+        # shift in one good at a time so that good 0 ends up in the msb
+        idx = numpy.zeros((block.shape[0], nSamples), dtype = idxType)
+        won = numpy.empty((block.shape[0], nSamples), dtype = bool)
+        for j in xrange(m):
+            numpy.greater_equal(block[:,j,numpy.newaxis], samples[numpy.newaxis,:,j], out = won)
+            idx <<= 1
+            idx |= won
+            
+        rev[start:start + blockSize] = numpy.sum(table.take(idx), 1)
+        
+    return (rev - cost)/nSamples
         
 def expectedSurplus(bundleRevenueDict, bidVector, jointGmmPricePrediction, n_samples = 10000):
     samples = jointGmmPricePrediction.sample(n_samples = n_samples)
     
     return expectedSurplus_(bundleRevenueDict, bidVector, samples)   
 
+def _stdRectProbabilities(lower, upper, packedCorr, independent, method = 'mvndst', **kwargs):
+    """
+    Standard normal mass of the rectangles lower[r] <= z <= upper[r].
+    
+    Uncorrelated normals are integrated in closed form, otherwise by mvndst
+    (method = 'mvndst', see mvncdf.mvstdnormcdfBatch; kwargs maxpts, abseps, 
+    releps) or by a deterministic lattice rule (method = 'lattice', see 
+    mvncdf.mvstdnormcdfLattice; kwargs nPoints, nShifts, seed). Returns (p, err).
+    """
+    lower = numpy.atleast_2d(lower)
+    upper = numpy.atleast_2d(upper)
+    
+    if independent:
+        return numpy.prod((ndtr(upper) - ndtr(lower)).clip(0), 1), numpy.zeros(lower.shape[0])
+    elif method == 'mvndst':
+        return mvstdnormcdfBatch(lower, upper, packedCorr, **kwargs)
+    elif method == 'lattice':
+        return mvstdnormcdfLattice(lower, upper, unpackCorrelation(packedCorr, lower.shape[1]), **kwargs)
+    else:
+        raise ValueError("Unknown integration method {0}".format(method))
+    
+def expectedSurplusExact(bundleRevenueDict, bidVector, jointGmmPricePrediction, **kwargs):
+    """
+    Sample free expected surplus of a bid vector (see jointGMM.expectedSurplus).
+    """
+    return jointGmmPricePrediction.expectedSurplus(bundleRevenueDict, bidVector, **kwargs)
+
 class jointGMM(sklearn.mixture.GMM):
     """
     A wrapper around sklearn.mixture.GMM to add some additional functionality
@@ -52,61 +154,227 @@ class jointGMM(sklearn.mixture.GMM):
     def m(self):
         return self.means_.shape[1]
         
+    def __setattr__(self, name, value):
+        # any change to the mixture parameters invalidates the cached factors
+        if name in ('weights_', 'means_', 'covars_', 'covariance_type'):
+            self.__dict__.pop('_gaussCache', None)
+        super(jointGMM, self).__setattr__(name, value)
+        
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_gaussCache', None)
+        return state
+    
+    def clearCache(self):
+        """
+        Drop all cached per-component factors. Only needed if the parameter 
+        arrays were modified in place.
+        """
+        self.__dict__.pop('_gaussCache', None)
+        
+    def _cache(self):
+        if '_gaussCache' not in self.__dict__:
+            self.__dict__['_gaussCache'] = {}
+        return self.__dict__['_gaussCache']
+    
+    def fullCovars(self):
+        """
+        Full (n_components, m, m) covariance matrices regardless of covariance_type.
+        """
+        c = self._cache()
+        if 'covars' not in c:
+            c['covars'] = numpy.asarray(self._get_covars(), dtype = numpy.float).\
+                            reshape(self.means_.shape[0], self.means_.shape[1], self.means_.shape[1])
+        return c['covars']
+    
+    def choleskyFactors(self):
+        """
+        Per-component (n_components, m, m) factors L with L L^T = covariance.
+        Lower triangular Cholesky factors; like sklearn's density, min_covar is 
+        added to the diagonal of covariances which are not positive definite
+        and the eigen decomposition is used as a last resort.
+        """
+        c = self._cache()
+        if 'chol' not in c:
+            covars = self.fullCovars()
+            eye    = numpy.eye(covars.shape[1])
+            chol   = numpy.zeros(covars.shape)
+            for k, cv in enumerate(covars):
+                try:
+                    chol[k] = numpy.linalg.cholesky(cv)
+                except numpy.linalg.LinAlgError:
+                    try:
+                        chol[k] = numpy.linalg.cholesky(cv + self.min_covar*eye)
+                    except numpy.linalg.LinAlgError:
+                        s, U = numpy.linalg.eigh(cv)
+                        chol[k] = U*numpy.sqrt(s.clip(0))
+            c['chol'] = chol
+        return c['chol']
+    
+    def logDets(self):
+        """
+        Per-component log determinants of the covariances (n_components,).
+        """
+        c = self._cache()
+        if 'logdet' not in c:
+            c['logdet'] = numpy.asarray([numpy.linalg.slogdet(numpy.dot(L,L.T))[1] 
+                                         for L in self.choleskyFactors()])
+        return c['logdet']
+    
+    def precisions(self):
+        """
+        Per-component inverse covariances (n_components, m, m).
+        """
+        c = self._cache()
+        if 'precision' not in c:
+            c['precision'] = numpy.asarray([numpy.linalg.pinv(numpy.dot(L,L.T)) 
+                                            for L in self.choleskyFactors()])
+        return c['precision']
+    
+    def margStd(self):
+        """
+        Per-component marginal standard deviations (n_components, m).
+        """
+        c = self._cache()
+        if 'std' not in c:
+            c['std'] = numpy.sqrt(numpy.diagonal(self.fullCovars(), axis1 = 1, axis2 = 2))
+        return c['std']
+    
+    def correlations(self):
+        """
+        Per-component correlation matrices (n_components, m, m).
+        """
+        c = self._cache()
+        if 'corr' not in c:
+            std = self.margStd()
+            c['corr'] = self.fullCovars()/std[:,:,numpy.newaxis]/std[:,numpy.newaxis,:]
+        return c['corr']
+    
+    def packedCorrelations(self):
+        """
+        Per-component correlations packed for mvndst (see mvncdf.packCorrelation)
+        and a flag per component marking uncorrelated (independent) components.
+        """
+        c = self._cache()
+        if 'packedCorr' not in c:
+            packed = numpy.asarray([packCorrelation(corr) for corr in self.correlations()])
+            c['packedCorr']  = packed
+            c['independent'] = numpy.all(numpy.abs(packed.reshape(packed.shape[0],-1)) < 1e-12, 1)
+        return c['packedCorr'], c['independent']
+    
+    def score_samples(self, X):
+        """
+        Log probability of each row of X and the component responsibilities 
+        (see sklearn.mixture.GMM.score_samples) from the cached precisions 
+        and log determinants.
+        """
+        X = numpy.asarray(X, dtype = numpy.float)
+        if X.ndim == 1:
+            X = X[:, numpy.newaxis]
+        if X.size == 0:
+            return numpy.array([]), numpy.empty((0, self.n_components))
+        if X.shape[1] != self.means_.shape[1]:
+            raise ValueError('The shape of X  is not compatible with self')
+        
+        precisions = self.precisions()
+        
+        lpr = numpy.zeros((X.shape[0], self.means_.shape[0]))
+        for k, (mu, P) in enumerate(zip(self.means_, precisions)):
+            d = X - mu
+            lpr[:,k] = numpy.sum(numpy.dot(d, P)*d, 1)
+            
+        lpr = -0.5*(lpr + X.shape[1]*numpy.log(2*numpy.pi) + self.logDets()) + numpy.log(self.weights_)
+        
+        logprob = logsumexp(lpr, axis = 1)
+        responsibilities = numpy.exp(lpr - logprob[:, numpy.newaxis])
+        
+        return logprob, responsibilities
+        
     def sample(self, **kwargs):
+        """
+        Draw samples from the mixture truncated to [minPrice, maxPrice] in every
+        dimension.
         
+        Component assignments and standard normal draws are generated in bulk 
+        and transformed with the cached Cholesky factors. Rejected rows are 
+        redrawn until n_samples are accepted. The fraction of accepted draws
+        of the last call is stored in self.acceptanceRate.
+        """
         minPrice  = kwargs.get('minPrice',self.minPrice)
         maxPrice  = kwargs.get('maxPrice',self.maxPrice)
         
         n_samples = kwargs.get('n_samples', 1)
         
-        random_state = kwargs.get('random_state',self.random_state)
+        random_state = check_random_state(kwargs.get('random_state',self.random_state))
         
-        sampleFncPtr = super(jointGMM,self).sample
+        chol    = self.choleskyFactors()
+        cumW    = numpy.cumsum(self.weights_)
+        m       = self.means_.shape[1]
         
-        samples = numpy.zeros((n_samples, self.means_.shape[1]))
-                
-        # inefficient way of restricting sample domain
-        # to valid prices but works for now...
-        idx = 0
-        while idx < n_samples:
-            s = sampleFncPtr(1,random_state)[0]
-            if ~numpy.any(s > maxPrice) and ~numpy.any(s < minPrice):
-                samples[idx,:] = s
-                idx += 1
+        samples = numpy.zeros((n_samples, m))
+        
+        remaining = numpy.arange(n_samples)
+        nDrawn    = 0
+        nAccepted = 0
+        while remaining.shape[0] > 0:
+            # over-draw by the observed acceptance rate so that
+            # heavy truncation does not require many passes
+            rate  = max(nAccepted/numpy.float(nDrawn), 1e-2) if nDrawn > 0 else 1.0
+            nDraw = int(numpy.ceil(remaining.shape[0]/rate))
+            
+            comps = numpy.searchsorted(cumW, random_state.rand(nDraw)*cumW[-1]).clip(0, cumW.shape[0]-1)
+            
+            s = self.means_[comps] + numpy.einsum('nij,nj->ni', chol[comps], random_state.randn(nDraw, m))
+            
+            accepted = s[numpy.all(s >= minPrice, 1) & numpy.all(s <= maxPrice, 1)]
+            
+            nDrawn    += nDraw
+            nAccepted += accepted.shape[0]
+            
+            nFill = min(accepted.shape[0], remaining.shape[0])
+            samples[remaining[:nFill]] = accepted[:nFill]
+            remaining = remaining[nFill:]
+            
+        self.acceptanceRate = nAccepted/numpy.float(nDrawn) if nDrawn > 0 else 1.0
                 
         return samples
     
+    def _sampleMarg(self, margIdx, n_samples):
+        """
+        Independent draws from the marginals of goods margIdx truncated to 
+        (minPrice, maxPrice), shape (n_samples, len(margIdx)).
+        
+        Each draw picks a mixture component and samples the truncated normal of
+        that component by inverse cdf so no draw is ever rejected.
+        """
+        margIdx = numpy.atleast_1d(margIdx)
+        
+        cumW  = numpy.cumsum(self.weights_)
+        comps = numpy.searchsorted(cumW, numpy.random.rand(n_samples, margIdx.shape[0])*cumW[-1]).\
+                    clip(0, cumW.shape[0]-1)
+        
+        mean = self.means_[:,margIdx][comps, numpy.arange(margIdx.shape[0])]
+        std  = self.margStd()[:,margIdx][comps, numpy.arange(margIdx.shape[0])]
+        
+        lower = ndtr((self.minPrice - mean)/std)
+        upper = ndtr((self.maxPrice - mean)/std)
+        
+        u = lower + numpy.random.rand(n_samples, margIdx.shape[0])*(upper - lower)
+        
+        eps = numpy.finfo(numpy.float).tiny
+        samples = mean + std*ndtri(u.clip(eps, 1.0 - numpy.finfo(numpy.float).eps))
+        
+        return samples.clip(self.minPrice, self.maxPrice)
+    
     def sampleMarg_(self, margIdx = None, n_samples = 1000):
         
         if margIdx == None:
             raise ValueError("Must specify marginal distribution to sample from - margIdx.")
         
-        w = numpy.atleast_1d(self.weights_)
-        samples = numpy.zeros(n_samples)
-        
-        components = numpy.random.multinomial(1,w,size=n_samples).argmax(axis=1)
-        for sIdx, component in enumerate(components):
-            done = False
-            
-            while not done:
-                sample = numpy.random.normal(loc = self.means_[component][margIdx],
-                                             scale = numpy.sqrt(self.covars_[component][margIdx][margIdx]))
-                if sample > self.minPrice and sample < self.maxPrice:
-                    samples[sIdx] = sample
-                    done = True
-                    break
-                
-            
-        return samples
-            
+        return self._sampleMarg(margIdx, n_samples)[:,0]
         
     def sampleMarg(self, n_samples = 1000):
-        m = self.means_.shape[1]
-        samples = numpy.zeros((n_samples,m))
-        for marginalIdx in xrange(m):
-            samples[:,marginalIdx] = self.sampleMarg_(marginalIdx, n_samples)
-            
-        return samples
+        return self._sampleMarg(numpy.arange(self.means_.shape[1]), n_samples)
     
     def expectedValue(self):
         
@@ -161,6 +429,7 @@ class jointGMM(sklearn.mixture.GMM):
         # set the data of this class associated with the 
         # derived class to match the fitted distribution
         self.__dict__.update(clfList[argMinAic].__dict__)
+        self.clearCache()
         
         #not all versions of scikit store this so explicitly set it
         self.covariance_type = covariance_type
@@ -319,13 +588,352 @@ class jointGMM(sklearn.mixture.GMM):
             
             
     def cdf(self, lower, upper,  **kwargs):
+        lower = numpy.asarray(lower, dtype = numpy.float)
+        upper = numpy.asarray(upper, dtype = numpy.float)
+        
         cdf = 0.0
-        for w, m, c in zip(self.weights_, self.means_, self.covars_):
-            cdf += w*mvnormcdf(lower, upper, m, c, **kwargs)
+        for w, m, std, corr in zip(self.weights_, self.means_, self.margStd(), self.correlations()):
+            cdf += w*mvstdnormcdf((lower - m)/std, (upper - m)/std, corr, **kwargs)
             
         return cdf
+    
+    def rectProbabilities(self, lower, upper, **kwargs):
+        """
+        Probability mass of many rectangles lower[i] <= price <= upper[i].
+        
+        Bounds are standardized once per component for the whole batch, the 
+        packed correlations are cached and uncorrelated components are 
+        integrated in closed form. kwargs (method and its accuracy controls,
+        see bundleProbabilities) are passed to the integration.
+        
+        INPUTS
+        ------
+        lower, upper := (2d array-like) shape (nRect, m), may contain -inf/inf
+        
+        OUTPUTS
+        -------
+        p            := (1d array-like) shape (nRect,) probabilities
+        
+        err          := (1d array-like) shape (nRect,) estimated absolute error
+        """
+        lower = numpy.atleast_2d(numpy.asarray(lower, dtype = numpy.float))
+        upper = numpy.atleast_2d(numpy.asarray(upper, dtype = numpy.float))
+        
+        p   = numpy.zeros(lower.shape[0])
+        err = numpy.zeros(lower.shape[0])
+        for k, w in enumerate(self.weights_):
+            pk, ek = self._componentRectProbabilities(k, lower, upper, **kwargs)
+            p   += w*pk
+            err += w*ek
+                
+        return p, err
+    
+    def _componentRectProbabilities(self, k, lower, upper, **kwargs):
+        """
+        rectProbabilities(...) of the k^th component alone.
+        """
+        packed, independent = self.packedCorrelations()
+        
+        mean = self.means_[k]
+        std  = self.margStd()[k]
+        
+        return _stdRectProbabilities((lower - mean)/std, (upper - mean)/std, 
+                                     packed[k], independent[k], **kwargs)
+    
+    def _conditionals(self, i):
+        """
+        Parameters of every component conditioned on the price of good i.
+        
+        Given price_i = x the remaining goods of component k are normal with
+        mean means_[k,others] + beta[k]*(x - means_[k,i]) and a covariance which
+        does not depend on x; its std devs and packed correlations are returned
+        (see packedCorrelations) together with the goods the rows refer to.
+        """
+        c = self._cache()
+        if ('cond', i) not in c:
+            covars = self.fullCovars()
+            others = numpy.delete(numpy.arange(covars.shape[1]), i)
             
-
+            beta, std, packed, independent = [], [], [], []
+            for cv in covars:
+                cross = cv[others, i]
+                
+                beta.append(cross/cv[i,i])
+                
+                condCov = cv[numpy.ix_(others, others)] - numpy.outer(cross, cross)/cv[i,i]
+                
+                s = numpy.sqrt(numpy.diagonal(condCov).clip(1e-12))
+                
+                pc = packCorrelation(condCov/numpy.outer(s,s))
+                
+                std.append(s)
+                packed.append(pc)
+                independent.append(numpy.all(numpy.abs(pc) < 1e-12))
+                
+            c[('cond', i)] = (others, numpy.asarray(beta), numpy.asarray(std), 
+                              packed, numpy.asarray(independent))
+            
+        return c[('cond', i)]
+    
+    def _conditionalRectProbabilities(self, k, i, x, lower, upper, **kwargs):
+        """
+        Probability that lower[r] <= price_{-i} <= upper[r] under component k 
+        given price_i = x[r] for each row r.
+        """
+        others, beta, std, packed, independent = self._conditionals(i)
+        
+        mean = self.means_[k, others] + \
+            numpy.outer(numpy.asarray(x, dtype = numpy.float) - self.means_[k,i], beta[k])
+        
+        return _stdRectProbabilities((lower - mean)/std[k], (upper - mean)/std[k], 
+                                     packed[k], independent[k], **kwargs)[0]
+    
+    def bundleProbabilities(self, bids, **kwargs):
+        """
+        Probability of winning exactly each bundle for one or many bid vectors.
+        
+        A good is won when its price is <= the bid, so bundle b is won with
+        probability of the orthant {price_j <= bid_j for j in b, price_j > bid_j 
+        otherwise}. All 2**m orthants of all bid vectors are integrated in one batch.
+        
+        INPUTS
+        ------
+        bids     := (array-like) shape (m,) or (nBids, m)
+        
+        truncate := (boolean) condition on minPrice <= price <= maxPrice like 
+                    sample(...) does (default True)
+                    
+        retErr   := (boolean) also return the estimated absolute errors (default False)
+        
+        method   := 'mvndst' (default) or 'lattice', a deterministic quasi Monte
+                    Carlo rule (see mvncdf.mvstdnormcdfLattice)
+        
+        maxpts, abseps, releps := accuracy controls passed to mvndst
+        
+        nPoints, nShifts, seed := accuracy controls of the lattice rule
+        
+        OUTPUTS
+        -------
+        p        := (array-like) shape (2**m,) or (nBids, 2**m); p[...,i] is the 
+                    probability of winning exactly the bundle listBundles(m)[i]
+        """
+        truncate = kwargs.pop('truncate', True)
+        retErr   = kwargs.pop('retErr', False)
+        
+        bids = numpy.asarray(bids, dtype = numpy.float)
+        single = bids.ndim == 1
+        bids = numpy.atleast_2d(bids)
+        
+        nBids, m = bids.shape
+        
+        if truncate:
+            lo, hi = numpy.float(self.minPrice), numpy.float(self.maxPrice)
+        else:
+            lo, hi = -numpy.inf, numpy.inf
+            
+        b = bids.clip(lo, hi)[:,numpy.newaxis,:]
+        
+        bundles = listBundles(m)[numpy.newaxis,:,:]
+        
+        lower = numpy.where(bundles, lo, b).reshape(-1, m)
+        upper = numpy.where(bundles, b, hi).reshape(-1, m)
+        
+        p, err = self.rectProbabilities(lower, upper, **kwargs)
+        
+        p   = p.reshape(nBids, 2**m)
+        err = err.reshape(nBids, 2**m)
+        
+        if lo > -numpy.inf or hi < numpy.inf:
+            pBox = self.rectProbabilities(lo*numpy.ones(m), hi*numpy.ones(m), **kwargs)[0]
+            p   /= pBox
+            err /= pBox
+            
+        if single:
+            p, err = p[0], err[0]
+            
+        if retErr:
+            return p, err
+        else:
+            return p
+            
+    def otherBundleProbabilities(self, bids, i, **kwargs):
+        """
+        Probability of winning exactly each bundle of the goods other than i,
+        whatever happens to good i.
+        
+        The price of good i is integrated out, so only the 2**(m-1) orthants 
+        of the other goods are integrated (each spanning the whole price range 
+        of good i). The result equals bundleProbabilities(...) with bids[i] = inf 
+        at the bundles which contain good i, at half the cost.
+        
+        INPUTS
+        ------
+        bids     := (1d array-like) shape (m,), bids[i] is ignored
+        
+        i        := (int) the good which is integrated out
+        
+        truncate, method and accuracy controls := see bundleProbabilities
+        
+        OUTPUTS
+        -------
+        p        := (1d array-like) shape (2**(m-1),); p[b] is the probability of
+                    winning exactly listBundles(m-1)[b] of the goods other than i
+        """
+        truncate = kwargs.pop('truncate', True)
+        
+        bids = numpy.asarray(bids, dtype = numpy.float)
+        m = bids.shape[0]
+        
+        if truncate:
+            lo, hi = numpy.float(self.minPrice), numpy.float(self.maxPrice)
+        else:
+            lo, hi = -numpy.inf, numpy.inf
+            
+        others = numpy.delete(numpy.arange(m), i)
+        
+        b = bids[others].clip(lo, hi)
+        
+        bundles = listBundles(m-1)
+        
+        lower = lo*numpy.ones((bundles.shape[0], m))
+        upper = hi*numpy.ones((bundles.shape[0], m))
+        
+        lower[:,others] = numpy.where(bundles, lo, b)
+        upper[:,others] = numpy.where(bundles, b, hi)
+        
+        p = self.rectProbabilities(lower, upper, **kwargs)[0]
+        
+        if lo > -numpy.inf or hi < numpy.inf:
+            # the mass of the truncation box does not depend on the bids
+            c = self._cache()
+            key = ('box', lo, hi, tuple(sorted(kwargs.items())))
+            if key not in c:
+                c[key] = self.rectProbabilities(lo*numpy.ones(m), hi*numpy.ones(m), **kwargs)[0]
+            p /= c[key]
+            
+        return p
+        
+    def expectedSurplus(self, bundleRevenueDict, bids, **kwargs):
+        """
+        Expected surplus of a bid vector integrated analytically.
+        
+        The expected revenue is the revenue table weighted by the bundle win
+        probabilities (see bundleProbabilities). The expected cost of good j, 
+        E[price_j ; price_j <= bid_j], is the first partial moment of each 
+        component over a rectangle (Tallis 1961) which only needs the mass of 
+        the rectangle and of its faces under the conditional distributions.
+        
+        The derivative w.r.t. bid_j is the density of price_j at bid_j times
+        the expected marginal revenue of good j minus bid_j, given price_j = bid_j.
+        
+        INPUTS
+        ------
+        bundleRevenueDict := a dictionary mapping tuple(bundle) -> revenue or a 
+                             revenue table (see ssapy.util.revenueTable)
+                             
+        bids              := (1d array-like) the bid vector
+        
+        truncate          := (boolean) condition on minPrice <= price <= maxPrice 
+                             like sample(...) does (default True)
+                             
+        retGrad           := (boolean) also return the gradient w.r.t. the bids 
+                             (default False)
+                             
+        maxpts, abseps, releps := accuracy controls passed to mvndst
+        
+        OUTPUTS
+        -------
+        es                := (float) expected surplus
+        
+        grad              := (1d array-like) d es / d bids, only if retGrad is True
+        """
+        truncate = kwargs.pop('truncate', True)
+        retGrad  = kwargs.pop('retGrad', False)
+        
+        table = revenueTable(bundleRevenueDict)
+        
+        bids = numpy.atleast_1d(numpy.asarray(bids, dtype = numpy.float))
+        m    = bids.shape[0]
+        
+        if truncate:
+            lo, hi = numpy.float(self.minPrice), numpy.float(self.maxPrice)
+        else:
+            lo, hi = -numpy.inf, numpy.inf
+            
+        b = bids.clip(lo, hi)
+        
+        rev = numpy.dot(self.bundleProbabilities(b, truncate = truncate, **kwargs), table)
+        
+        # rows j: the rectangle of prices for which good j is won and the 
+        # remaining goods are anywhere inside the box
+        A = lo*numpy.ones((m,m))
+        C = hi*numpy.ones((m,m))
+        C[numpy.diag_indices(m)] = b
+        
+        # win patterns of the other goods when good j is at its bid
+        if m > 1:
+            Q = listBundles(m-1).astype(bool)
+        else:
+            Q = numpy.zeros((1,0), dtype = bool)
+        
+        dTables = []
+        for j in xrange(m):
+            pos = bundle2idx(numpy.insert(Q, j, True, axis = 1))
+            neg = pos & ~(2**(m-1-j))
+            dTables.append(table[pos] - table[neg])
+            
+        cost = numpy.zeros(m)
+        grad = numpy.zeros(m)
+        for k, (w, mu, S, s) in enumerate(zip(self.weights_, self.means_, 
+                                              self.fullCovars(), self.margStd())):
+            g = numpy.zeros((m,m))
+            for i in xrange(m):
+                lowerI = numpy.delete(A, i, 1)
+                upperI = numpy.delete(C, i, 1)
+                
+                if numpy.isfinite(lo):
+                    phi = numpy.exp(-0.5*((lo - mu[i])/s[i])**2)/(numpy.sqrt(2*numpy.pi)*s[i])
+                    g[:,i] += phi*self._conditionalRectProbabilities(k, i, lo*numpy.ones(m), 
+                                                                     lowerI, upperI, **kwargs)
+                    
+                face = numpy.flatnonzero(numpy.isfinite(C[:,i]))
+                if face.shape[0] > 0:
+                    x   = C[face,i]
+                    phi = numpy.exp(-0.5*((x - mu[i])/s[i])**2)/(numpy.sqrt(2*numpy.pi)*s[i])
+                    g[face,i] -= phi*self._conditionalRectProbabilities(k, i, x, lowerI[face], 
+                                                                        upperI[face], **kwargs)
+                
+            pRect = self._componentRectProbabilities(k, A, C, **kwargs)[0]
+            
+            cost += w*(mu*pRect + numpy.sum(S*g, 1))
+            
+            if retGrad:
+                for j in numpy.flatnonzero((bids > lo) & (bids < hi)):
+                    bo = numpy.delete(b, j)
+                    
+                    pc = self._conditionalRectProbabilities(k, j, b[j]*numpy.ones(Q.shape[0]), 
+                                                            numpy.where(Q, lo, bo), 
+                                                            numpy.where(Q, bo, hi), **kwargs)
+                    
+                    phi = numpy.exp(-0.5*((b[j] - mu[j])/s[j])**2)/(numpy.sqrt(2*numpy.pi)*s[j])
+                    
+                    grad[j] += w*phi*(numpy.dot(pc, dTables[j]) - b[j]*numpy.sum(pc))
+                    
+        # a good bid at (or below) the lower bound is never won
+        cost[b <= lo] = 0.0
+        
+        if numpy.isfinite(lo) or numpy.isfinite(hi):
+            pBox  = self.rectProbabilities(lo*numpy.ones(m), hi*numpy.ones(m), **kwargs)[0][0]
+            cost /= pBox
+            grad /= pBox
+            
+        es = rev - numpy.sum(cost)
+        
+        if retGrad:
+            return es, grad
+        else:
+            return es
+        
     def margParams(self,**kwargs):
         margIdx = kwargs.get('margIdx')
         if margIdx == None:
@@ -337,66 +945,86 @@ class jointGMM(sklearn.mixture.GMM):
                              "margIdx = {0} > self.means_.shape[1] = {2}".format(margIdx,self.means_.shape[1]))
         
         w = self.weights_
-        m = [mean[margIdx] for mean in self.means_]
-        v = [var[margIdx,margIdx] for var in self.covars_]
+        m = self.means_[:,margIdx]
+        v = self.margStd()[:,margIdx]**2
         
         return w, m, v
     
-    def margCdf(self, x, margIdx):    
-                
+    def _margZ(self, x, margIdx = None):
+        """
+        Standardized prices (x - mean)/std broadcast over components.
+        
+        x[...,i] is evaluated under the marginal of good margIdx[i] 
+        (all goods if margIdx is None). Returns z with shape x.shape[:-1] + 
+        (n_components, len(margIdx)) and the matching std devs.
+        """
+        if margIdx is None:
+            margIdx = numpy.arange(self.means_.shape[1])
+        
+        x = numpy.asarray(x, dtype = numpy.float)
+        
+        mean = self.means_[:,margIdx]
+        std  = self.margStd()[:,margIdx]
+        
+        return (x[...,numpy.newaxis,:] - mean)/std, std
+    
+    def margCdfs(self, x):
+        """
+        Marginal cdf of every good at every point.
+        
+        INPUTS
+        ------
+        x        := (array-like) prices, shape (m,) or (n, m); 
+                    x[...,j] is evaluated under the marginal of good j.
+        
+        OUTPUTS
+        -------
+        cdf      := (array-like) same shape as x, cdf[...,j] = p(price_j <= x[...,j])
+        """
+        z, std = self._margZ(x)
+        return numpy.dot(numpy.swapaxes(ndtr(z),-1,-2), self.weights_)
+    
+    def margPdfs(self, x):
+        """
+        Marginal pdf of every good at every point. See margCdfs(...).
+        """
+        z, std = self._margZ(x)
+        return numpy.dot(numpy.swapaxes(numpy.exp(-0.5*z**2)/(numpy.sqrt(2*numpy.pi)*std),-1,-2), self.weights_)
+        
+    def margCdf(self, x, margIdx):
+        """
+        Marginal cdf of good(s) margIdx.
+        
+        If margIdx is an int, x may be a scalar or an array of points. If margIdx is
+        a list of goods, x is broadcast against it and the result has one entry 
+        per listed good.
+        """
         if isinstance(margIdx,list) or isinstance(margIdx, numpy.ndarray):
+            margIdx = numpy.asarray(margIdx)
+            x = numpy.asarray(x, dtype = numpy.float)*numpy.ones(margIdx.shape[0])
             
-            cdf = numpy.zeros(len(margIdx))
+            z, std = self._margZ(x, margIdx)
             
-            for (w,mean,cov) in zip(self.weights_, self.means_, self.covars_):
-                for idx in margIdx:
-                    cdf[idx] += w*norm.cdf(x, loc = mean[margIdx], scale = numpy.sqrt(cov[margIdx,margIdx]))
-                
-            
-            if numpy.any(cdf > 1.0):
-                raise ValueError("In jointGmm.margCdf(...)\n" +\
-                                 "cdf = {0} > 1.0".format(cdf))
-                
-            elif numpy.any(cdf < 0.0):
-                raise ValueError("In jointGmm.margCdf(...)\n" +\
-                                 "cdf ={0} < 0.0".format(cdf))
-                
+            return numpy.dot(numpy.swapaxes(ndtr(z),-1,-2), self.weights_)
+        
         else:
-            if margIdx > self.means_.shape[1]:
-                raise ValueError("In jointGmm.margParams(...)\n" +\
-                                 "margIdx = {0} > self.means_.shape[1] = {1}".format(margIdx,self.means_.shape[1]))
-            cdf = numpy.float(0.0)
-            for (w,mean,cov) in zip(self.weights_, self.means_, self.covars_):
-                cdf += w*norm.cdf(x, loc = mean[margIdx], scale = numpy.sqrt(cov[margIdx, margIdx]))
-            
-            if cdf > 1.001:
-                raise ValueError("In jointGmm.margCdf(...)\n" +\
-                                 "cdf = {0} > 1.0".format(cdf))
-            elif cdf < 0.0:
+            if margIdx >= self.means_.shape[1]:
                 raise ValueError("In jointGmm.margCdf(...)\n" +\
-                                 "cdf ={0} < 0.0".format(cdf))    
+                                 "margIdx = {0} >= self.means_.shape[1] = {1}".format(margIdx,self.means_.shape[1]))
                 
-        return cdf
+            z, std = self._margZ(numpy.asarray(x)[...,numpy.newaxis], [margIdx])
+            
+            return numpy.dot(ndtr(z)[...,0], self.weights_)
     
     def margPdf(self, x, margIdx = None):
             
-        if margIdx > self.means_.shape[1]:
+        if margIdx >= self.means_.shape[1]:
                 raise ValueError("In jointGmm.margPdf(...)\n" +\
-                                 "margIdx = {0} > self.means_.shape[1] = {1}".format(margIdx,self.means_.shape[1]))
+                                 "margIdx = {0} >= self.means_.shape[1] = {1}".format(margIdx,self.means_.shape[1]))
                 
-        p = 0.0
-        for (w,mean,cov) in zip(self.weights_, self.means_, self.covars_):
-            p += w*norm.pdf(x, loc = mean[margIdx], scale = numpy.sqrt(cov[margIdx,margIdx]))
-            
-#            if p > 1 + 1.003:
-#                raise ValueError("In jointGmm.margCdf(...)\n" +\
-#                                 "p = {0} > 1.0".format(p))
-            
-            if p < 0.0:
-                raise ValueError("In jointGmm.margCdf(...)\n" +\
-                                 "p = {0} < 0.0".format(p))
-                
-        return p
+        z, std = self._margZ(numpy.asarray(x)[...,numpy.newaxis], [margIdx])
+        
+        return numpy.dot((numpy.exp(-0.5*z**2)/(numpy.sqrt(2*numpy.pi)*std))[...,0], self.weights_)
         
     def totalCorrelationMC(self, nsamples=10000, ntrials = 20, verbose = True):
         
@@ -79,6 +79,7 @@ a wrapper for scipy.stats.kde.mvndst
 import numpy as np
 import scipy
 import scipy.stats
+from scipy.special import ndtr, ndtri
 #from scipy.stats import kde
 
 informcode = {0: 'normal completion with ERROR < EPS',
@@ -86,6 +87,180 @@ informcode = {0: 'normal completion with ERROR < EPS',
                     increase MAXPTS to decrease ERROR;''',
               2: 'N > 500 or N < 1'}
 
+def packCorrelation(corrcoef):
+    '''pack a square correlation matrix into the vector expected by mvndst
+
+    The coefficient in row I column J (J < I, one based) is stored in
+    CORREL( J + ((I-2)*(I-1))/2 ), i.e. the strictly lower triangle
+    stacked by rows.
+
+    Parameters
+    ----------
+    corrcoef : array_like, 2d
+       square correlation matrix
+
+    Returns
+    -------
+    correl : ndarray, 1d
+       packed correlation coefficients, length n*(n-1)/2
+    '''
+    corrcoef = np.asarray(corrcoef, dtype = float)
+    return corrcoef[np.tril_indices(corrcoef.shape[0], -1)]
+
+
+def unpackCorrelation(correl, n):
+    '''square correlation matrix of size n from its packed form (see packCorrelation)'''
+    corrcoef = np.eye(n)
+    corrcoef[np.tril_indices(n, -1)] = correl
+    return corrcoef + np.tril(corrcoef, -1).T
+
+
+def infinFlags(lower, upper):
+    '''integration limit flags of mvndst for (arrays of) bounds
+
+    -1 : (-inf, inf), 0 : (-inf, upper], 1 : [lower, inf), 2 : [lower, upper]
+    '''
+    lowinf = np.isneginf(lower)
+    uppinf = np.isposinf(upper)
+    infin = 2.0*np.ones(np.shape(lower))
+    infin[lowinf] = 0
+    infin[uppinf] = 1
+    infin[lowinf & uppinf] = -1
+    return infin
+
+
+def mvstdnormcdfBatch(lower, upper, correl, **kwds):
+    '''standardized multivariate normal probabilities of many rectangles
+
+    Like mvstdnormcdf but for a stack of rectangles sharing one correlation
+    matrix which is given already packed (see packCorrelation) so that it
+    is only packed once.
+
+    Parameters
+    ----------
+    lower, upper : array_like, 2d
+       lower[i] and upper[i] are the limits of the i-th rectangle.
+       Rectangles with an empty side (lower >= upper) have probability 0.
+    correl : array_like, 1d
+       packed correlation coefficients
+    optional keyword parameters to influence integration
+        * maxpts, abseps, releps : see mvstdnormcdf
+
+    Returns
+    -------
+    cdfvalue : ndarray, 1d
+        value of each integral
+    error : ndarray, 1d
+        estimated absolute error of each integral
+    '''
+    lower = np.atleast_2d(np.asarray(lower, dtype = float))
+    upper = np.atleast_2d(np.asarray(upper, dtype = float))
+    correl = np.atleast_1d(np.asarray(correl, dtype = float))
+
+    n = lower.shape[1]
+
+    if not 'maxpts' in kwds:
+        if n >2:
+            kwds['maxpts'] = 10000*n
+
+    infin = infinFlags(lower, upper)
+
+    cdfvalue = np.zeros(lower.shape[0])
+    error    = np.zeros(lower.shape[0])
+
+    nonEmpty = np.flatnonzero(np.all(lower < upper, 1))
+
+    for i in nonEmpty:
+        error[i], cdfvalue[i], inform = \
+            scipy.stats.kde.mvn.mvndst(lower[i],upper[i],infin[i],correl,**kwds)
+
+    return cdfvalue, error
+
+
+def latticePoints(nPoints, n, nShifts = 4, seed = 0):
+    '''randomly shifted Kronecker lattice in [0,1)^n with fixed shifts
+
+    Point i of shift s is frac(i*sqrt(p_k) + shift_s) for the first n primes
+    p_k (the Richtmyer rule also used by mvndst), followed by the baker's
+    transform |2x - 1| which makes the rule exact to higher order for smooth
+    integrands. The shifts are drawn from RandomState(seed), so the same
+    arguments always give the same points.
+
+    Returns
+    -------
+    points : ndarray, shape (nShifts, nPoints, n)
+    '''
+    primes = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71]
+    if n > len(primes):
+        raise ValueError('latticePoints - at most {0} dimensions'.format(len(primes)))
+
+    q = np.sqrt(np.asarray(primes[:n], dtype = float))
+    shifts = np.random.RandomState(seed).rand(nShifts, 1, n)
+
+    x = np.mod(np.outer(np.arange(1, nPoints + 1), q)[np.newaxis,:,:] + shifts, 1.0)
+
+    return np.abs(2.0*x - 1.0)
+
+
+def mvstdnormcdfLattice(lower, upper, corrcoef, nPoints = 250, nShifts = 4, seed = 0):
+    '''standardized multivariate normal probabilities of many rectangles
+    by a deterministic quasi Monte Carlo rule
+
+    Uses the separation of variables of Genz (1992), the transformation
+    behind mvndst, on the fixed points of latticePoints(...). Unlike mvndst,
+    whose random shifts change from call to call, the result is a smooth
+    deterministic function of the bounds, so iterations built on it can
+    converge to a tight tolerance.
+
+    Parameters
+    ----------
+    lower, upper : array_like, 2d
+       lower[i] and upper[i] are the limits of the i-th rectangle, may
+       contain -np.inf or np.inf
+    corrcoef : array_like, 2d
+       square correlation matrix shared by all rectangles
+    nPoints, nShifts, seed : see latticePoints
+
+    Returns
+    -------
+    cdfvalue : ndarray, 1d
+        value of each integral
+    error : ndarray, 1d
+        estimated absolute error of each integral (3 standard errors over
+        the shifts)
+    '''
+    lower = np.atleast_2d(np.asarray(lower, dtype = float))
+    upper = np.atleast_2d(np.asarray(upper, dtype = float))
+
+    nRect, n = lower.shape
+
+    c = np.linalg.cholesky(np.asarray(corrcoef, dtype = float) + 1e-12*np.eye(n))
+
+    w = latticePoints(nPoints, max(n - 1, 1), nShifts, seed).reshape(-1, max(n - 1, 1))
+
+    # variable i is integrated over [d, e] given the previous ones
+    tiny = 1e-16
+    y = np.zeros((nRect, w.shape[0], n))
+    f = np.ones((nRect, w.shape[0]))
+    for i in xrange(n):
+        s = np.dot(y[:,:,:i], c[i,:i])
+        d = ndtr((lower[:,i:i+1] - s)/c[i,i])
+        e = ndtr((upper[:,i:i+1] - s)/c[i,i])
+        f *= (e - d).clip(0)
+        if i < n - 1:
+            y[:,:,i] = ndtri((d + w[:,i]*(e - d)).clip(tiny, 1.0 - tiny))
+
+    f = f.reshape(nRect, nShifts, nPoints).mean(2)
+
+    cdfvalue = f.mean(1)
+    if nShifts > 1:
+        error = 3.0*f.std(1, ddof = 1)/np.sqrt(nShifts)
+    else:
+        error = np.zeros(nRect)
+
+    return cdfvalue, error
+
+
 def mvstdnormcdf(lower, upper, corrcoef, **kwds):
     '''standardized multivariate normal cumulative distribution function
 
@@ -170,9 +345,7 @@ def mvstdnormcdf(lower, upper, corrcoef, **kwds):
         correl = corrcoef
     elif corrcoef.shape == (n,n):
         #print 'case square corr',  correl.shape
-        for ii in range(n):
-            for jj in range(ii):
-                correl[ jj + ((ii-2)*(ii-1))/2] = corrcoef[ii,jj]
+        correl = packCorrelation(corrcoef)
     else:
         raise ValueError, 'corrcoef has incorrect dimension'
 
@@ -180,14 +353,7 @@ def mvstdnormcdf(lower, upper, corrcoef, **kwds):
         if n >2:
             kwds['maxpts'] = 10000*n
 
-    lowinf = np.isneginf(lower)
-    uppinf = np.isposinf(upper)
-    infin = 2.0*np.ones(n)
-    
-    np.putmask(infin,lowinf,0)# infin.putmask(0,lowinf)
-    np.putmask(infin,uppinf,1) #infin.putmask(1,uppinf)
-    #this has to be last
-    np.putmask(infin,lowinf*uppinf,-1)
+    infin = infinFlags(lower, upper)
 
 ##    #remove infs
 ##    np.putmask(lower,lowinf,-100)# infin.putmask(0,lowinf)
@@ -1,8 +1,12 @@
 import unittest
 import numpy
+import sklearn.mixture
 
-from ssapy.pricePrediction.jointGMM import jointGMM, expectedSurplus_
+from scipy.stats import norm
+
+from ssapy.pricePrediction.jointGMM import jointGMM, expectedSurplus_, expectedSurplusBatch_
 from ssapy import listBundles, msListRevenue
+from ssapy.util import revenueTable
 
 class test_jointGMM(unittest.TestCase):
     def test_expectedSurplus(self):
@@ -33,6 +37,177 @@ class test_jointGMM(unittest.TestCase):
         numpy.testing.assert_equal(expectedSurplus_(bundleRevenueDict, bids, samples), 
                                    3.5,'test_expetedSurplus failed.',True)
         
+    def test_expectedSurplusBatch(self):
+        numpy.random.seed(18)
+        m = 4
+        bundles = listBundles(m)
+        table   = revenueTable(bundles, msListRevenue(bundles, [30., 25., 12., 6.], 2))
+        
+        samples = numpy.round(numpy.random.uniform(0, 20, (300,m)))
+        bids    = numpy.round(numpy.random.uniform(0, 20, (25,m)))
+        
+        es = numpy.asarray([expectedSurplus_(table, bid, samples) for bid in bids])
+        
+        numpy.testing.assert_array_almost_equal(expectedSurplusBatch_(table, bids, samples), es, 10)
+        
+        # blocks which do not divide the number of bids
+        numpy.testing.assert_array_almost_equal(expectedSurplusBatch_(table, bids, samples, blockSize = 7), es, 10)
+        
+    def test_truncatedSample(self):
+        jgmm = jointGMM(n_components = 2, minPrice = 0, maxPrice = 30)
+        jgmm.weights_ = numpy.array([0.5,0.5])
+        jgmm.means_   = numpy.atleast_2d([[2.,10.],[25.,20.]])
+        jgmm.covars_  = numpy.array([numpy.eye(2)*9, [[16.,4.],[4.,9.]]])
+        
+        samples = jgmm.sample(n_samples = 5000)
+        
+        numpy.testing.assert_equal(samples.shape, (5000,2))
+        numpy.testing.assert_(numpy.all(samples >= 0) and numpy.all(samples <= 30))
+        numpy.testing.assert_(0.0 < jgmm.acceptanceRate < 1.0)
+        
+        numpy.testing.assert_array_almost_equal(numpy.dot(jgmm.choleskyFactors()[1], jgmm.choleskyFactors()[1].T),
+                                                jgmm.covars_[1])
+        
+        # changing the parameters must invalidate the cached factors
+        jgmm.covars_ = numpy.array([numpy.eye(2), numpy.eye(2)*4])
+        numpy.testing.assert_array_almost_equal(jgmm.choleskyFactors()[1], numpy.eye(2)*2)
+        
+        # no truncation
+        jgmm.minPrice = -numpy.inf
+        jgmm.maxPrice = numpy.inf
+        samples = jgmm.sample(n_samples = 20000)
+        numpy.testing.assert_equal(jgmm.acceptanceRate, 1.0)
+        numpy.testing.assert_array_almost_equal(numpy.mean(samples,0), jgmm.expectedValue(), 0)
+        
+    def test_cachedDensity(self):
+        jgmm = jointGMM(n_components = 2)
+        jgmm.weights_ = numpy.array([0.3,0.7])
+        jgmm.means_   = numpy.atleast_2d([[3.,5.],[18.,10.]])
+        jgmm.covars_  = numpy.array([[[2.,0.5],[0.5,1.]], numpy.eye(2)*4])
+        
+        gmm = sklearn.mixture.GMM(n_components = 2, covariance_type = 'full')
+        gmm.weights_ = jgmm.weights_
+        gmm.means_   = jgmm.means_
+        gmm.covars_  = jgmm.covars_
+        
+        X = numpy.random.uniform(0, 25, (100,2))
+        
+        numpy.testing.assert_array_almost_equal(jgmm.score(X), gmm.score(X))
+        numpy.testing.assert_array_almost_equal(jgmm.margStd(), [[numpy.sqrt(2.),1.],[2.,2.]])
+        numpy.testing.assert_array_almost_equal(jgmm.logDets(), numpy.log([1.75,16.]))
+        numpy.testing.assert_almost_equal(jgmm.margCdf(3., 0), 0.3*0.5 + 0.7*numpy.float(norm.cdf(-7.5)))
+        
+        # the cache must follow parameter changes
+        jgmm.means_ = gmm.means_ = numpy.atleast_2d([[5.,5.],[10.,10.]])
+        numpy.testing.assert_array_almost_equal(jgmm.score(X), gmm.score(X))
+        numpy.testing.assert_almost_equal(jgmm.margCdf(5., 0), 0.3*0.5 + 0.7*numpy.float(norm.cdf(-2.5)))
+        
+    def test_margCdfs(self):
+        jgmm = jointGMM(n_components = 2)
+        jgmm.weights_ = numpy.array([0.3,0.7])
+        jgmm.means_   = numpy.atleast_2d([[3.,5.,20.],[18.,10.,25.]])
+        jgmm.covars_  = numpy.array([numpy.eye(3), numpy.eye(3)*4])
+        
+        x = numpy.random.uniform(0, 30, (50,3))
+        
+        cdf = jgmm.margCdfs(x)
+        pdf = jgmm.margPdfs(x)
+        
+        numpy.testing.assert_equal(cdf.shape, x.shape)
+        
+        for j in xrange(3):
+            numpy.testing.assert_array_almost_equal(cdf[:,j], 
+                0.3*norm.cdf(x[:,j], [3.,5.,20.][j], 1.) + 0.7*norm.cdf(x[:,j], [18.,10.,25.][j], 2.))
+            numpy.testing.assert_array_almost_equal(pdf[:,j], [jgmm.margPdf(xx, j) for xx in x[:,j]])
+            numpy.testing.assert_array_almost_equal(cdf[:,j], jgmm.margCdf(x[:,j], j))
+            
+        numpy.testing.assert_array_almost_equal(jgmm.margCdf(x[0], [0,1,2]), cdf[0])
+        
+    def test_sampleMarg(self):
+        jgmm = jointGMM(n_components = 2, minPrice = 0, maxPrice = 30)
+        jgmm.weights_ = numpy.array([0.4,0.6])
+        jgmm.means_   = numpy.atleast_2d([[2.,28.],[20.,40.]])
+        jgmm.covars_  = numpy.array([numpy.eye(2)*9, numpy.eye(2)*16])
+        
+        samples = jgmm.sampleMarg(n_samples = 5000)
+        
+        numpy.testing.assert_equal(samples.shape, (5000,2))
+        numpy.testing.assert_(numpy.all(samples >= 0) and numpy.all(samples <= 30))
+        numpy.testing.assert_equal(jgmm.sampleMarg_(1, 10).shape, (10,))
+        
+        # without truncation the marginal means are the mixture means
+        jgmm.minPrice = -numpy.inf
+        jgmm.maxPrice = numpy.inf
+        samples = jgmm.sampleMarg(n_samples = 20000)
+        numpy.testing.assert_array_almost_equal(numpy.mean(samples,0), jgmm.expectedValue(), 0)
+        
+    def test_bundleProbabilities(self):
+        jgmm = jointGMM(n_components = 2, minPrice = -numpy.inf, maxPrice = numpy.inf)
+        jgmm.weights_ = numpy.array([0.3,0.7])
+        jgmm.means_   = numpy.atleast_2d([[3.,5.,20.],[18.,10.,25.]])
+        jgmm.covars_  = numpy.array([numpy.eye(3), [[4.,1.,0.5],[1.,4.,1.],[0.5,1.,4.]]])
+        
+        bids = numpy.asarray([[10.,8.,22.],[20.,12.,24.]])
+        
+        p = jgmm.bundleProbabilities(bids)
+        
+        numpy.testing.assert_equal(p.shape, (2,8))
+        numpy.testing.assert_array_almost_equal(numpy.sum(p,1), [1.,1.], 4)
+        
+        # the mass of winning good 0 must be its marginal cdf
+        numpy.testing.assert_array_almost_equal(numpy.sum(p[:,4:],1), jgmm.margCdf(bids[:,0],0), 4)
+        
+        # single bid vector 
+        numpy.testing.assert_array_almost_equal(jgmm.bundleProbabilities(bids[0]), p[0], 4)
+        
+    def test_otherBundleProbabilities(self):
+        jgmm = jointGMM(n_components = 2, minPrice = 0)
+        jgmm.weights_ = numpy.array([0.3,0.7])
+        jgmm.means_   = numpy.atleast_2d([[3.,5.,20.],[18.,10.,25.]])
+        jgmm.covars_  = numpy.array([numpy.eye(3), [[4.,1.,0.5],[1.,4.,1.],[0.5,1.,4.]]])
+        
+        bids = numpy.asarray([10.,8.,22.])
+        
+        for i in xrange(3):
+            b = bids.copy()
+            b[i] = numpy.inf
+            
+            # the bundles which contain good i when good i is won surely
+            full = jgmm.bundleProbabilities(b)[(numpy.arange(8) & 2**(2-i)) > 0]
+            
+            numpy.testing.assert_array_almost_equal(jgmm.otherBundleProbabilities(bids, i), full, 4)
+            
+            p = jgmm.otherBundleProbabilities(bids, i, method = 'lattice')
+            numpy.testing.assert_array_almost_equal(p, full, 3)
+            
+            # the lattice rule is deterministic
+            numpy.testing.assert_array_equal(jgmm.otherBundleProbabilities(bids, i, method = 'lattice'), p)
+        
+    def test_expectedSurplusExact(self):
+        jgmm = jointGMM(n_components = 2, minPrice = 0)
+        jgmm.weights_ = numpy.array([0.4,0.6])
+        jgmm.means_   = numpy.atleast_2d([[8.,20.],[25.,6.]])
+        jgmm.covars_  = numpy.array([[[9.,3.],[3.,16.]], [[25.,-5.],[-5.,9.]]])
+        
+        bundles = listBundles(2)
+        revenue = msListRevenue(bundles, [40., 25.], 1)
+        bids    = numpy.asarray([18., 9.])
+        
+        es, grad = jgmm.expectedSurplus(revenueTable(bundles, revenue), bids, retGrad = True)
+        
+        numpy.random.seed(15)
+        esMc = expectedSurplus_(revenueTable(bundles, revenue), bids, jgmm.sample(n_samples = 400000))
+        
+        numpy.testing.assert_almost_equal(es, esMc, 1)
+        
+        h = 1e-4
+        for j in xrange(2):
+            d = numpy.zeros(2)
+            d[j] = h
+            fd = (jgmm.expectedSurplus(revenueTable(bundles, revenue), bids + d) - \
+                  jgmm.expectedSurplus(revenueTable(bundles, revenue), bids - d))/(2*h)
+            numpy.testing.assert_almost_equal(grad[j], fd, 5)
+        
 #    def test_sample(self):
 #        gmm = jointGMM()
 #        gmm.means_ = [[ 48.41402471,  30.5908699 ],
@@ -0,0 +1,54 @@
+import unittest
+import numpy
+
+from ssapy.pricePrediction.mvncdf import packCorrelation, unpackCorrelation, mvstdnormcdf, mvstdnormcdfBatch, \
+    mvstdnormcdfLattice
+
+class test_mvncdf(unittest.TestCase):
+    def test_packCorrelation(self):
+        corr = numpy.asarray([[1.0, 0.1, 0.2, 0.3],
+                              [0.1, 1.0, 0.4, 0.5],
+                              [0.2, 0.4, 1.0, 0.6],
+                              [0.3, 0.5, 0.6, 1.0]])
+        
+        numpy.testing.assert_array_equal(packCorrelation(corr), [0.1, 0.2, 0.4, 0.3, 0.5, 0.6])
+        
+    def test_mvstdnormcdf3d(self):
+        """
+        For three equicorrelated variables with correlation 1/2 
+        p(x_1 <= 0, x_2 <= 0, x_3 <= 0) = 1/4
+        """
+        corr = numpy.ones((3,3))*0.5 + numpy.eye(3)*0.5
+        
+        numpy.testing.assert_almost_equal(mvstdnormcdf([-numpy.inf]*3, [0.,0.,0.], corr), 0.25, 4)
+        
+        # a correlation that differs between pairs must be packed correctly
+        corr = numpy.asarray([[1.0, 0.0, 0.5],[0.0, 1.0, 0.0],[0.5, 0.0, 1.0]])
+        numpy.testing.assert_almost_equal(mvstdnormcdf([-numpy.inf]*3, [0.,0.,0.], corr), 1./6, 4)
+        
+    def test_mvstdnormcdfBatch(self):
+        corr  = numpy.asarray([[1.0, 0.0, 0.5],[0.0, 1.0, 0.0],[0.5, 0.0, 1.0]])
+        lower = numpy.asarray([[-numpy.inf]*3, [0.,0.,0.], [1.,0.,0.]])
+        upper = numpy.asarray([[0.,0.,0.], [numpy.inf]*3, [0.,1.,1.]])
+        
+        p, err = mvstdnormcdfBatch(lower, upper, packCorrelation(corr))
+        
+        numpy.testing.assert_array_almost_equal(p, [1./6, 1./6, 0.], 4)
+        
+    def test_mvstdnormcdfLattice(self):
+        corr  = numpy.asarray([[1.0, 0.0, 0.5],[0.0, 1.0, 0.0],[0.5, 0.0, 1.0]])
+        lower = numpy.asarray([[-numpy.inf]*3, [0.,0.,0.], [1.,0.,0.], [-1.,-2.,0.]])
+        upper = numpy.asarray([[0.,0.,0.], [numpy.inf]*3, [0.,1.,1.], [1.,numpy.inf,2.]])
+        
+        numpy.testing.assert_array_equal(unpackCorrelation(packCorrelation(corr), 3), corr)
+        
+        p, err = mvstdnormcdfLattice(lower, upper, corr)
+        
+        numpy.testing.assert_array_almost_equal(p, mvstdnormcdfBatch(lower, upper, packCorrelation(corr), abseps = 1e-7)[0], 3)
+        numpy.testing.assert_equal(p[2], 0.)
+        
+        # fixed points, the same bounds give the same values
+        numpy.testing.assert_array_equal(mvstdnormcdfLattice(lower, upper, corr)[0], p)
+        
+if __name__ == "__main__":
+    unittest.main()
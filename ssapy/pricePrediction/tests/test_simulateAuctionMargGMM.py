@@ -0,0 +1,30 @@
+import unittest
+import numpy
+from sklearn import mixture
+
+from ssapy.pricePrediction.util import simulateAuctionMargGMM
+from ssapy.auctions.reducers import reservoirReducer
+
+class test_simulateAuctionMargGMM(unittest.TestCase):
+    def test_uniform(self):
+        winningBids = simulateAuctionMargGMM(agentType = "msStraightMV", nGames = 5, m = 3)
+        numpy.testing.assert_equal(winningBids.shape, (5,3))
+        
+    def test_reducer(self):
+        numpy.random.seed(11)
+        clfList = []
+        for j in xrange(3):
+            clf = mixture.GMM(n_components = 1)
+            clf.fit(numpy.random.normal(10. + j, 2., (100,1)))
+            clfList.append(clf)
+            
+        # 25 games in chunks of 7, the last chunk is partial
+        reducer = simulateAuctionMargGMM(agentType = "msStraightMV", nGames = 25, m = 3, clfList = clfList,
+                                         reducer = reservoirReducer(10), chunkSize = 7)
+        
+        numpy.testing.assert_equal(reducer.n, 25)
+        numpy.testing.assert_equal(reducer.result().shape, (10,3))
+        numpy.testing.assert_(numpy.all(reducer.result() >= 0))
+        
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import numpy
+
+from ssapy.pricePrediction.algo.yw2 import simulateAuction, yw2Chunk
+from ssapy.scpp.depreciated.margDistSCPP import margDistSCPP
+from ssapy.auctions import simulationExecutor
+from ssapy.auctions.reducers import histogramReducer
+from ssapy.util.sharedModel import sharedModel
+
+class test_yw2(unittest.TestCase):
+    def setUp(self):
+        self.binEdges = numpy.arange(0,51,1.)
+        self.margDist = margDistSCPP([(numpy.ones(50)/50., self.binEdges)]*3)
+        
+    def test_simulateAuction(self):
+        winningBids = simulateAuction(agentType = "msStraightMU8", nAgents = 4, 
+                                      margDist = self.margDist, nGames = 5)
+        numpy.testing.assert_equal(winningBids.shape, (5,3))
+        
+        reducer = simulateAuction(agentType = "msStraightMU8", nAgents = 4, margDist = self.margDist,
+                                  nGames = 25, reducer = histogramReducer(self.binEdges), chunkSize = 7)
+        
+        numpy.testing.assert_equal(reducer.n, 25)
+        for counts, edges in reducer.result():
+            numpy.testing.assert_equal(counts.sum(), 25)
+            
+    def test_yw2Chunk(self):
+        reducer = histogramReducer(self.binEdges)
+        
+        with simulationExecutor(nProc = 2) as executor:
+            with sharedModel(self.margDist) as sharedDist:
+                results, bounds = executor.map(yw2Chunk, 25, {'agentType' : "msStraightMU8",
+                                                              'nAgents'   : 4,
+                                                              'margDist'  : sharedDist,
+                                                              'reducer'   : reducer.spawn()})
+        
+        [reducer.merge(r) for r in results]
+        
+        numpy.testing.assert_equal(reducer.n, 25)
+        numpy.testing.assert_equal(bounds[-1][1], 25)
+        
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,8 @@ import matplotlib.pyplot as plt
 import numpy
 from scipy.stats import norm
 from ssapy.pricePrediction.jointGMM import jointGMM
+from ssapy.util.sharedModel import attachModel
+from ssapy.agents.agentFactory import agentFactory
 
 import time
 import os
@@ -161,26 +163,37 @@ def drawJointGMM(clf, nSamples = 8, minPrice = 0, maxPrice = 50):
     return samples
 
 def simulateAuctionMargGMM( **kwargs ):
+    """
+    Winning bids of nGames auctions, shape (nGames,m). If a streaming reducer 
+    is given (see ssapy.auctions.reducers), the winning bids of every chunkSize 
+    games are passed to reducer.updateStat(...) instead and the reducer is returned.
+    """
     agentType  = kwargs.get('agentType')
     nAgents    = kwargs.get('nAgents',8)
-    clfList    = kwargs.get('clfList')
+    clfList    = attachModel(kwargs.get('clfList'))
     nSamples   = kwargs.get('nSampeles',8)
     nGames     = kwargs.get('nGames')
     minPrice   = kwargs.get('minPrice',0)
     maxPrice   = kwargs.get('maxPrice',50)
     m          = kwargs.get('m',5)
+    reducer    = kwargs.get('reducer')
+    chunkSize  = kwargs.get('chunkSize',1000)
     
+    if reducer is None:
+        chunkSize = nGames
         
-    winningBids = numpy.zeros((nGames,m))
+    winningBids = numpy.zeros((min(chunkSize,nGames),m))
     
     for g in xrange(nGames):
-        
+        if reducer is not None and g > 0 and g % chunkSize == 0:
+            reducer.updateStat(winningBids)
+            
         agentList = [agentFactory(agentType = agentType, m = m) for i in xrange(nAgents)]
         
         if clfList == None:
             samples = ((maxPrice - minPrice) *numpy.random.rand(nAgents,nSamples,m)) + minPrice
             expectedPrices = numpy.mean(samples,1)
-            bids = numpy.atleast_2d([agent.bid(pointPricePrediction = expectedPrices[i,:]) for idx, agent in enumerate(agentList)])
+            bids = numpy.atleast_2d([agent.bid(pricePrediction = expectedPrices[idx,:]) for idx, agent in enumerate(agentList)])
                     
         elif isinstance(clfList, list):
             
@@ -191,12 +204,17 @@ def simulateAuctionMargGMM( **kwargs ):
                 for clfIdx, clf in enumerate(clfList):
                     samples = drawGMM(clf, nSamples)
                     expectedPrices[clfIdx] = numpy.mean(samples)
-                bids[agentIdx,:] = agent.bid(pointPricePrediction = expectedPrices)
+                bids[agentIdx,:] = agent.bid(pricePrediction = expectedPrices)
             
         else:
             raise ValueError("Unknown price dist type.") 
         
-        winningBids[g,:] = numpy.max(bids,0)
+        winningBids[g % chunkSize,:] = numpy.max(bids,0)
+        
+    if reducer is not None:
+        if nGames > 0:
+            reducer.updateStat(winningBids[:(nGames - 1) % chunkSize + 1])
+        return reducer
         
     return winningBids
 
@@ -0,0 +1,6 @@
+"""
+this is /ssapy/scpp/depreciated
+
+Price prediction classes kept for the older SCPP algorithms
+(e.g. margDistSCPP used by pricePrediction/algo/yw2.py).
+"""
@@ -9,23 +9,16 @@ Modified:
     Brandon A. Mayer - 1/1/2012 Adapted from agent
 """
 import numpy
-from ssapy.strategies.straightMV import straightMV
+from ssapy.util import marginalUtilities
 
 def averageMU(bundles, revenue, pricePrediction, nSamples, verbose = False):
     if verbose:
         print "averageMU - Drawing {0} samples.".format(nSamples)
         
-    bundleView = numpy.atleast_2d(bundles)
-    
     samples = pricePrediction.sample(n_samples = nSamples)
-    accum = numpy.zeros(bundleView.shape[1], dtype = 'float')
     
-    #accumulate sum of marginal utility
-    for sample in samples:
-        accum += straightMV(bundles, revenue, sample, verbose)
-        
-    #divide by number of samples for average
-    accum /= nSamples
+    #marginal utility of every good under every sample, averaged over samples
+    accum = numpy.mean(marginalUtilities(bundles, revenue, numpy.atleast_2d(samples)), 0)
     
     if verbose:
         print "bid = {0}".format(accum)
@@ -0,0 +1,112 @@
+"""
+this is /ssapy/strategies/bestResponseLocal.py
+
+Coordinate ascent on the sample estimate of expected surplus where every
+update is the exact best response of one bid given the others.
+
+With the other bids fixed, changing b_j only changes which samples win good j.
+Sorting the samples of good j, winning the k cheapest adds
+
+    sum_{s <= k} table[pattern_s | j] - table[pattern_s without j] - price_sj
+
+to the surplus, so the best bid follows from the maximum of a cumulative sum.
+Bids only change on a strict improvement which makes the ascent monotone and
+guarantees termination.
+"""
+import numpy
+
+from ssapy.util import revenueTable
+from ssapy.strategies.localSearchState import localSearchState
+
+def bestResponseUpdateState(state, targetBid, order, sortedPrices, verbose = False):
+    """
+    Exact best response of bid targetBid given the other bids in state.
+
+    INPUTS
+    ------
+    state        := (localSearchState) samples and win patterns at the current bids
+                    (strict = False, a good is won when sample <= bid)
+
+    targetBid    := (int) the (zero-indexed) bid to be updated
+
+    order        := (1d array-like) argsort of state.samples[:,targetBid]
+
+    sortedPrices := (1d array-like) state.samples[order,targetBid]
+
+    OUTPUTS
+    -------
+    newBid       := (float) a bid maximizing the sample expected surplus; the
+                    current bid is kept unless it can be strictly improved.
+    """
+    bit = state.bits[targetBid]
+    idx = state.idx[order]
+
+    gain = state.table[idx | bit] - state.table[idx & ~bit] - sortedPrices
+
+    # value of winning the k cheapest samples, k = 0,...,nSamples
+    value = numpy.concatenate(([0.0], numpy.cumsum(gain)))
+
+    # samples with equal prices are won or lost together
+    valid = numpy.ones(value.shape[0], dtype = bool)
+    valid[1:-1] = sortedPrices[:-1] < sortedPrices[1:]
+
+    k = numpy.argmax(numpy.where(valid, value, -numpy.inf))
+
+    current = numpy.searchsorted(sortedPrices, state.bids[targetBid], side = 'right')
+
+    if value[k] <= value[current]:
+        newBid = state.bids[targetBid]
+    elif k == 0:
+        newBid = 0.0 if sortedPrices[0] > 0 else numpy.nextafter(sortedPrices[0], -numpy.inf)
+    else:
+        newBid = sortedPrices[k-1]
+
+    if verbose:
+        print newBid
+
+    return newBid
+
+def bestResponseLocal(bundles, revenue, initialBids, samples, maxItr = 100, tol = 1e-5, verbose = False, ret = 'bids'):
+    """
+    Starting from an initial bid, replace each bid in turn by its exact best
+    response against the samples until a full iteration changes no bid.
+
+    The samples of each good are sorted once; an update costs O(nSamples).
+
+    INPUTS
+    ------
+    bundles, revenue, initialBids, samples, maxItr, tol, verbose, ret
+        see jointLocal(...)
+
+    OUTPUTS
+    -------
+    see jointLocal(...)
+    """
+    m         = bundles.shape[1]
+    newBids   = numpy.atleast_1d(initialBids).astype(numpy.float)
+    converged = False
+
+    state = localSearchState(revenueTable(bundles, revenue), newBids, samples)
+
+    order        = numpy.argsort(state.samples, axis = 0, kind = 'mergesort')
+    sortedPrices = state.samples[order, numpy.arange(m)]
+
+    for itr in xrange(maxItr):
+        oldBids = newBids.copy()
+
+        for gIdx in xrange(m):
+            newBids[gIdx] = bestResponseUpdateState(state, gIdx, order[:,gIdx],
+                                                    sortedPrices[:,gIdx], verbose)
+            state.setBid(gIdx, newBids[gIdx])
+
+        d = numpy.linalg.norm(oldBids - newBids)
+        if d <= tol:
+            converged = True
+            break
+
+    if ret == 'bids':
+        return newBids
+    elif ret == 'all':
+        return newBids, converged, itr + 1, d
+    else:
+        raise ValueError("Unknown Return String {0}".format(ret))
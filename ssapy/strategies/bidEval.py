@@ -4,25 +4,31 @@ This is /ssapy/strategies/evaluators.py
 Author: Brandon A. Mayer
 Date: 1/9/2013
 """
-from ssapy.pricePrediction.jointGMM import expectedSurplus_
+from ssapy.pricePrediction.jointGMM import expectedSurplusBatch_
 import numpy
 
-def bidEvalS(bundleRevenueDict, candidateSamples, evalSamples, ret='bid'):
+def bidEvalS(bundleRevenueDict, candidateSamples, evalSamples, ret='bid', blockSize = None):
+    """
+    Choose the candidate sample with the highest expected surplus against 
+    the evaluation samples (a zero bid if no candidate has positive surplus).
+    
+    All candidates are scored at once by expectedSurplusBatch_(...) in blocks 
+    of blockSize candidates.
+    """
+    candidateSamples = numpy.atleast_2d(candidateSamples)
+    
+    es = expectedSurplusBatch_(bundleRevenueDict, candidateSamples, evalSamples, blockSize)
     
     maxSurplus = 0.0
     bid = numpy.zeros(candidateSamples.shape[1])
     
-    for candidateSample in candidateSamples:
-        es = expectedSurplus_(bundleRevenueDict, 
-                              numpy.atleast_1d(candidateSample), 
-                              evalSamples)
-        
-        if es > maxSurplus:
-            bid = numpy.atleast_1d(candidateSample)
-            maxSurplus = es
+    best = numpy.argmax(es)
+    if es[best] > maxSurplus:
+        bid = numpy.atleast_1d(candidateSamples[best]).copy()
+        maxSurplus = es[best]
             
     if ret == 'bid':
         return bid
     
     elif ret == 'all':
-        return bid, maxSurplus
\ No newline at end of file
+        return bid, maxSurplus
@@ -1,23 +1,154 @@
-from ssapy.pricePrediction.jointGMM import expectedSurplus_
+from ssapy.pricePrediction.jointGMM import expectedSurplusBatch_
+from ssapy.util import revenueTable
 import numpy
 import itertools
+import multiprocessing
+
+def marginalRevenueBound(bundleRevenueDict):
+    """
+    For each good the largest revenue it can add to any bundle. Winning a
+    good at a higher price never increases surplus.
+    """
+    table = revenueTable(bundleRevenueDict)
+    m = int(numpy.log2(table.shape[0]))
+
+    idx  = numpy.arange(table.shape[0])[:,numpy.newaxis]
+    bits = 2**numpy.arange(m-1,-1,-1)
+
+    return numpy.max(table[idx | bits] - table[idx & ~bits], 0)
+
+def pruneGrid(grid, evalSamples, bound):
+    """
+    Remove the grid values of one good which cannot change the search result.
+
+    All bids between two consecutive sample prices win the same samples, so
+    only the smallest grid value of each such interval is kept. Beyond the
+    first value >= bound (see marginalRevenueBound) a larger bid only wins
+    goods at a loss. The removed values are dominated by smaller values which
+    come first in the search order, hence the selected bid is unchanged.
+    """
+    interval = numpy.searchsorted(numpy.sort(evalSamples), grid, side = 'right')
+
+    keep = numpy.ones(grid.shape[0], dtype = bool)
+    keep[1:] = interval[1:] != interval[:-1]
+
+    grid = grid[keep]
+
+    return grid[:numpy.searchsorted(grid, bound, side = 'left') + 1]
+
+_blockArgs = {}
+
+def _initBlockWorker(table, grids, evalSamples):
+    _blockArgs['table']       = table
+    _blockArgs['grids']       = grids
+    _blockArgs['evalSamples'] = evalSamples
+
+def _gridBids(grids, start, stop):
+    shape = tuple(g.shape[0] for g in grids)
+    sub = numpy.unravel_index(numpy.arange(start, stop), shape)
+    return numpy.column_stack([g[s] for g, s in zip(grids, sub)])
+
+def _bestInBlock(block):
+    """
+    Best (first) bid and its expected surplus among grid points [start, stop).
+    """
+    start, stop = block
+
+    bids = _gridBids(_blockArgs['grids'], start, stop)
+    es   = expectedSurplusBatch_(_blockArgs['table'], bids, _blockArgs['evalSamples'])
+
+    best = numpy.argmax(es)
+    return bids[best], es[best]
+
+def _searchGrid(table, grids, evalSamples, blockSize, nProc, verbose):
+    nPoints = int(numpy.prod([g.shape[0] for g in grids]))
+    blocks  = [(start, min(start + blockSize, nPoints)) for start in xrange(0, nPoints, blockSize)]
+
+    if nProc > 1 and len(blocks) > 1:
+        pool = multiprocessing.Pool(processes = nProc, initializer = _initBlockWorker,
+                                    initargs = (table, grids, evalSamples))
+        results = pool.imap(_bestInBlock, blocks)
+    else:
+        pool = None
+        _initBlockWorker(table, grids, evalSamples)
+        results = itertools.imap(_bestInBlock, blocks)
 
-def bruteForceS( bundleRevenueDict,  evalSamples = None, min=0.0, max=50.0, step=1.0, ret='bid'):
-    m = evalSamples.shape[1]
-    
-    xx = numpy.arange(min,max+1.0,step)
-    
     maxSurplus = -numpy.float('inf')
     bid = None
-    for c in itertools.product(xx,repeat=m):
-        es = expectedSurplus_(bundleRevenueDict, numpy.atleast_1d(c), evalSamples)
-        if es > maxSurplus:
-            bid = numpy.atleast_1d(c)
-            maxSurplus = es
-            print bid
-            print maxSurplus
-            
+    try:
+        for blockBid, es in results:
+            if es > maxSurplus:
+                bid = blockBid
+                maxSurplus = es
+                if verbose:
+                    print bid
+                    print maxSurplus
+    except:
+        # stop the workers instead of leaving them behind
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        raise
+    finally:
+        _blockArgs.clear()
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    return bid, maxSurplus
+
+def bruteForceS( bundleRevenueDict,  evalSamples = None, min=0.0, max=50.0, step=1.0, ret='bid',
+                 blockSize = 2**14, nProc = 1, prune = True, refine = 0, refineFactor = 4, verbose = False):
+    """
+    Exhaustive search for the bid maximizing the sample expected surplus over
+    the grid min, min + step, ... in every good.
+
+    The grid is enumerated in the order of itertools.product in blocks of
+    blockSize points which are scored with expectedSurplusBatch_(...),
+    optionally by a pool of nProc processes. Ties are resolved in favour
+    of the first grid point. If prune is True dominated grid values are
+    removed first (see pruneGrid), which does not change the result.
+
+    If refine > 0 the search starts on a grid refineFactor**refine times
+    coarser and each of the refine following searches only covers one coarse
+    step around the previous best bid with a refineFactor times finer grid.
+    This is much cheaper but no longer guaranteed to find the grid optimum.
+
+    ret == 'bid' returns the bid, ret == 'all' (bid, maxSurplus).
+    """
+    table = revenueTable(bundleRevenueDict)
+
+    evalSamples = numpy.atleast_2d(evalSamples)
+    m = evalSamples.shape[1]
+
+    xx = numpy.arange(min,max+1.0,step)
+
+    bound = marginalRevenueBound(table)
+
+    lower = min*numpy.ones(m)
+    upper = xx[-1]*numpy.ones(m)
+
+    for level in xrange(refine, -1, -1):
+        levelStep = step*refineFactor**level
+
+        grids = []
+        for j in xrange(m):
+            # grid points of the original grid spaced levelStep apart
+            g = xx[(numpy.arange(xx.shape[0]) % (refineFactor**level)) == 0]
+            g = g[(g >= lower[j] - 1e-9) & (g <= upper[j] + 1e-9)]
+
+            if prune:
+                g = pruneGrid(g, evalSamples[:,j], bound[j])
+
+            grids.append(g)
+
+        bid, maxSurplus = _searchGrid(table, grids, evalSamples, blockSize, nProc, verbose)
+
+        lower = bid - levelStep
+        upper = bid + levelStep
+
     if ret == 'bid':
         return bid
     elif ret == 'all':
-        return bid, maxSurplus
\ No newline at end of file
+        return bid, maxSurplus
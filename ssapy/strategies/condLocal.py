@@ -6,6 +6,8 @@ Date: 1/2/2013 (adapted from ssapy.agents.condLocalBid)
 """
 
 import numpy
+from ssapy.util import revenueTable
+from ssapy.strategies.localSearchState import localSearchState
 
 def condLocalLimitUpdate(bundles, revenue, bids, 
                          targetBid, samples, eps = 1e-5, 
@@ -34,75 +36,9 @@ def condLocalLimitUpdate(bundles, revenue, bids,
     -------
         newBid     := (float) the new bid for the target good
     """
+    state = localSearchState(revenueTable(bundles, revenue), bids, samples)
     
-    newBid = 0.0
-        
-    goodsWon = samples <= bids
-    
-    normWon = numpy.float(numpy.count_nonzero(goodsWon[:,targetBid] == True))
-    normLost = numpy.float(numpy.count_nonzero(goodsWon[:,targetBid] == False))
-    
-    posIdxList = numpy.flatnonzero(bundles[:,targetBid] == True)
-    
-    for posIdx in posIdxList:
-        posBundle = bundles[posIdx,:]
-        negBundle = posBundle.copy()
-        negBundle[targetBid] = False
-        negIdx = numpy.where((bundles == negBundle).all(axis=1))[0][0]
-        
-#        p1 = numpy.count_nonzero( numpy.all(goodsWon == posBundle, 1) ) + eps
-#        p1 = numpy.float(p1) / (normWon + 2*eps)
-        if normWon == 0:
-            p1 = 0.5
-        else:
-            p1 = numpy.float(numpy.count_nonzero( numpy.all(goodsWon == posBundle, 1) ) )
-            if verbose:
-                print '\t#({0}) = {1}'.format(posBundle, p1)
-                print '\t#({0} = True) = {1}'.format(targetBid, normWon)
-                 
-            p1 /= normWon
-            
-        if verbose:
-            print 'p({0} | {1} = True ) = {2}'.format(posBundle,targetBid,p1)
-             
-#        p1 = numpy.count_nonzero( numpy.all(goodsWon == posBundle, 1) )
-#        p1 = numpy.float(p1) / (normWon + 1)
-        if p1 > 1.0:
-            raise ValueError ("p1 = {0} > 1.0".format(p1))
-        
-        if p1 < 0.0:
-            raise ValueError("p1 = {0} < 0.0".format(p1))
-        
-#        p0 = numpy.count_nonzero( numpy.all(goodsWon == negBundle, 1) ) + eps
-#        p0 = numpy.float(p0) / ( normLost +  2*eps )
-
-        if normLost == 0:
-            p0 = 0.5
-        else:
-#            p0 = numpy.float(numpy.count_nonzero( numpy.all(goodsWon == negBundle, 1) )) / normLost
-            p0 = numpy.float(numpy.count_nonzero( numpy.all(goodsWon == negBundle, 1) ))
-            if verbose:
-                print '\t#({0}) = {1}'.format(negBundle, p0)
-                print '\t#({0} = True) = {1}'.format(targetBid, normLost)
-            
-            p0 /= normLost
-        
-        if verbose:
-            print 'p({0} | {1} = False) = {2}'.format(posBundle,targetBid,p0)
-        
-        if p0 > 1.0:
-            raise ValueError ("p0 = {0} > 1.0".format(p0))
-        
-        if p0 < 0.0:
-            raise ValueError("p0 = {0} < 0.0".format(p0))
-        
-    
-        newBid += ((revenue[posIdx]*p1) - (revenue[negIdx]*p0))
-        
-    if verbose:
-        print newBid
-        
-    return newBid
+    return condLocalUpdateState(state, targetBid, eps = 0.0, empty = 0.5, verbose = verbose)
 
 def condLocalLimit(bundles, revenue, initialBids, 
                    samples, maxItr = 100, tol = 1e-5, 
@@ -155,11 +91,14 @@ def condLocalLimit(bundles, revenue, initialBids,
     newBids = numpy.atleast_1d(initialBids).copy()
     converged = False
     
+    state = localSearchState(revenueTable(bundles, revenue), newBids, samples)
+    
     for itr in xrange(maxItr):
         oldBid = newBids.copy()
         
         for gIdx in xrange(m):
-            newBids[gIdx] = condLocalLimitUpdate(bundles, revenue, newBids, gIdx, samples, verbose)
+            newBids[gIdx] = condLocalUpdateState(state, gIdx, eps = 0.0, empty = 0.5, verbose = verbose)
+            state.setBid(gIdx, newBids[gIdx])
             
         d = numpy.linalg.norm(oldBid-newBids)
         
@@ -202,64 +141,43 @@ def condLocalUpdate(bundles, revenue, bids,
     -------
         newBid     := (float) the new bid for the target good
     """
+    state = localSearchState(revenueTable(bundles, revenue), bids, samples)
     
-    newBid = 0.0
-        
-    goodsWon = samples <= bids
+    return condLocalUpdateState(state, targetBid, eps = eps, verbose = verbose)
+
+def condLocalUpdateState(state, targetBid, eps = 1.0, empty = 0.5, verbose = False):
+    """
+    Conditional local update of the bid for good targetBid given a localSearchState.
     
-    normWon = numpy.float(numpy.count_nonzero(goodsWon[:,targetBid] == True))
-    normLost = numpy.float(numpy.count_nonzero(goodsWon[:,targetBid] == False))
+    For every bundle containing the target good:
+        p1 = (#samples winning bundle + eps)/(#samples winning targetBid + 2*eps)
+        p0 = (#samples winning bundle - targetBid + eps)/(#samples losing targetBid + 2*eps)
+    If a denominator is zero the corresponding probabilities are set to empty.
     
-    posIdxList = numpy.flatnonzero(bundles[:,targetBid] == True)
+    condLocal uses eps = 1.0, condLocalLimit eps = 0.0, empty = 0.5 and 
+    condLocalZero eps = 0.0, empty = 0.0
+    """
+    pos, neg = state.withGood(targetBid)
     
-    for posIdx in posIdxList:
-        posBundle = bundles[posIdx,:]
-        negBundle = posBundle.copy()
-        negBundle[targetBid] = False
-        negIdx = numpy.where((bundles == negBundle).all(axis=1))[0][0]
-        
-        p1 = numpy.count_nonzero( numpy.all(goodsWon == posBundle, 1) ) + eps
-        
-        if verbose:
-            print '\t#({0}) = {1}'.format(posBundle, p1)
-            print '\t#({0} = True) = {1}'.format(targetBid, normWon)
-            
-        p1 = numpy.float(p1) / (normWon + 2*eps)
-        
-           
-        if verbose:
-            print 'p({0} | {1} = True ) = {2}'.format(posBundle,targetBid,p1)
-             
-
-        if p1 > 1.0:
-            raise ValueError ("p1 = {0} > 1.0".format(p1))
-        
-        if p1 < 0.0:
-            raise ValueError("p1 = {0} < 0.0".format(p1))
-        
-        p0 = numpy.float(numpy.count_nonzero( numpy.all(goodsWon == negBundle, 1) )) + eps
-        
-        if verbose:
-            print '\t#({0}) = {1}'.format(negBundle, p0)
-            print '\t#({0} = True) = {1}'.format(targetBid, normLost)
-            
-        p0 = numpy.float(p0) / ( normLost +  2*eps )
-
-#        p0 = numpy.float(numpy.count_nonzero( numpy.all(goodsWon == negBundle, 1) ))
-        
-                
-        if verbose:
-            print 'p({0} | {1} = False) = {2}'.format(posBundle,targetBid,p0)
-        
-        if p0 > 1.0:
-            raise ValueError ("p0 = {0} > 1.0".format(p0))
+    normWon  = numpy.float(state.nWon[targetBid])
+    normLost = state.nSamples - normWon
+    
+    if normWon + 2*eps > 0:
+        p1 = (state.counts[pos] + eps)/(normWon + 2*eps)
+    else:
+        p1 = empty
+    
+    if normLost + 2*eps > 0:
+        p0 = (state.counts[neg] + eps)/(normLost + 2*eps)
+    else:
+        p0 = empty
         
-        if p0 < 0.0:
-            raise ValueError("p0 = {0} < 0.0".format(p0))
+    if verbose:
+        print 'p( bundle | {0} = True ) = {1}'.format(targetBid, p1)
+        print 'p( bundle | {0} = False) = {1}'.format(targetBid, p0)
         
+    newBid = numpy.sum(state.table[pos]*p1 - state.table[neg]*p0)
     
-        newBid += ((revenue[posIdx]*p1) - (revenue[negIdx]*p0))
-        
     if verbose:
         print newBid
         
@@ -316,13 +234,14 @@ def condLocal(bundles, revenue, initialBids,
     newBids = numpy.atleast_1d(initialBids).copy()
     converged = False
     
+    state = localSearchState(revenueTable(bundles, revenue), newBids, samples)
+    
     for itr in xrange(maxItr):
         oldBid = newBids.copy()
         
         for gIdx in xrange(m):
-            newBids[gIdx] = condLocalUpdate(bundles, revenue, 
-                                            newBids, gIdx, samples, 
-                                            eps=eps, verbose = verbose)
+            newBids[gIdx] = condLocalUpdateState(state, gIdx, eps = eps, verbose = verbose)
+            state.setBid(gIdx, newBids[gIdx])
             
         d = numpy.linalg.norm(oldBid-newBids)
         
@@ -364,76 +283,10 @@ def condLocalZeroUpdate(bundles, revenue, bids,
     -------
         newBid     := (float) the new bid for the target good
     """
+    state = localSearchState(revenueTable(bundles, revenue), bids, samples)
     
-    newBid = 0.0
-        
-    goodsWon = samples <= bids
-    
-    normWon = numpy.float(numpy.count_nonzero(goodsWon[:,targetBid] == True))
-    normLost = numpy.float(numpy.count_nonzero(goodsWon[:,targetBid] == False))
-    
-    posIdxList = numpy.flatnonzero(bundles[:,targetBid] == True)
-    
-    for posIdx in posIdxList:
-        posBundle = bundles[posIdx,:]
-        negBundle = posBundle.copy()
-        negBundle[targetBid] = False
-        negIdx = numpy.where((bundles == negBundle).all(axis=1))[0][0]
-        
-#        p1 = numpy.count_nonzero( numpy.all(goodsWon == posBundle, 1) ) + eps
-#        p1 = numpy.float(p1) / (normWon + 2*eps)
-        if normWon == 0:
-            p1 = 0.
-        else:
-            p1 = numpy.float(numpy.count_nonzero( numpy.all(goodsWon == posBundle, 1) ) )
-            if verbose:
-                print '\t#({0}) = {1}'.format(posBundle, p1)
-                print '\t#({0} = True) = {1}'.format(targetBid, normWon)
-                 
-            p1 /= normWon
-            
-        if verbose:
-            print 'p({0} | {1} = True ) = {2}'.format(posBundle,targetBid,p1)
-             
-#        p1 = numpy.count_nonzero( numpy.all(goodsWon == posBundle, 1) )
-#        p1 = numpy.float(p1) / (normWon + 1)
-        if p1 > 1.0:
-            raise ValueError ("p1 = {0} > 1.0".format(p1))
-        
-        if p1 < 0.0:
-            raise ValueError("p1 = {0} < 0.0".format(p1))
-        
-#        p0 = numpy.count_nonzero( numpy.all(goodsWon == negBundle, 1) ) + eps
-#        p0 = numpy.float(p0) / ( normLost +  2*eps )
+    return condLocalUpdateState(state, targetBid, eps = 0.0, empty = 0.0, verbose = verbose)
 
-        if normLost == 0:
-            p0 = 0.
-        else:
-#            p0 = numpy.float(numpy.count_nonzero( numpy.all(goodsWon == negBundle, 1) )) / normLost
-            p0 = numpy.float(numpy.count_nonzero( numpy.all(goodsWon == negBundle, 1) ))
-            if verbose:
-                print '\t#({0}) = {1}'.format(negBundle, p0)
-                print '\t#({0} = True) = {1}'.format(targetBid, normLost)
-            
-            p0 /= normLost
-        
-        if verbose:
-            print 'p({0} | {1} = False) = {2}'.format(posBundle,targetBid,p0)
-        
-        if p0 > 1.0:
-            raise ValueError ("p0 = {0} > 1.0".format(p0))
-        
-        if p0 < 0.0:
-            raise ValueError("p0 = {0} < 0.0".format(p0))
-        
-    
-        newBid += ((revenue[posIdx]*p1) - (revenue[negIdx]*p0))
-        
-    if verbose:
-        print newBid
-        
-    return newBid
-    
 def condLocalZero(bundles, revenue, initialBids, 
                   samples, maxItr = 100, tol = 1e-5, 
                   verbose = False, ret = 'bids'):
@@ -485,11 +338,14 @@ def condLocalZero(bundles, revenue, initialBids,
     newBids = numpy.atleast_1d(initialBids).copy()
     converged = False
     
+    state = localSearchState(revenueTable(bundles, revenue), newBids, samples)
+    
     for itr in xrange(maxItr):
         oldBid = newBids.copy()
         
         for gIdx in xrange(m):
-            newBids[gIdx] = condLocalZeroUpdate(bundles, revenue, newBids, gIdx, samples, verbose)
+            newBids[gIdx] = condLocalUpdateState(state, gIdx, eps = 0.0, empty = 0.0, verbose = verbose)
+            state.setBid(gIdx, newBids[gIdx])
             
         d = numpy.linalg.norm(oldBid-newBids)
         
@@ -582,24 +438,22 @@ def condLocalMc(bundles, revenue, initBids, samples,
     
 def condMVLocalUpdate(bundleRevenueDict, bids, j, samples, verbose = False):
     
-    newBid = 0.0
-    
-    samplesjwon = samples[samples[:,j] < bids[j]]
+    state = localSearchState(revenueTable(bundleRevenueDict), bids, samples, strict = True)
     
-    if samplesjwon.shape[0] == 0:
+    return condMVLocalUpdateState(state, j, verbose)
+
+def condMVLocalUpdateState(state, j, verbose = False):
+    """
+    Average marginal revenue of good j over the samples in which good j is won.
+    """
+    if state.nWon[j] == 0:
         return 0.0
+    
+    pos, neg = state.withGood(j)
+    
+    newBid = numpy.dot(state.counts[pos], state.table[pos] - state.table[neg])
         
-    for samplejwon in samplesjwon:
-        bundleWon = samplejwon < bids
-        bundleLost = bundleWon.copy()
-        bundleLost[j] = False
-#        jwonrev = revenue[numpy.where((bundles == bundleWon).all(axis=1))[0][0]]
-#        jlostrev = revenue[numpy.where((bundles == bundleLost).all(axis=1))[0][0]]
-        jwonrev  = bundleRevenueDict[tuple(bundleWon)]
-        jlostrev = bundleRevenueDict[tuple(bundleLost)]
-        newBid += jwonrev - jlostrev
-        
-    newBid /= samplesjwon.shape[0]
+    newBid /= numpy.float(state.nWon[j])
     
     if verbose:
         print '\tNew bid = {0}'.format(newBid)
@@ -613,16 +467,16 @@ def condMVLocal(bundles, revenue, initBids, samples,
     newBids   = numpy.atleast_1d(initBids).copy()
     converged = False
     
-    brd = {}
-    for b,r in zip(bundles,revenue):
-        brd[tuple(b)] = r
+    state = localSearchState(revenueTable(bundles, revenue), newBids, samples, strict = True)
     
     for itr in xrange(maxItr):
         oldBids = newBids.copy()
         
         for gIdx in xrange(m):
-            newBids[gIdx] = condMVLocalUpdate(brd, 
-                               oldBids, gIdx, samples, verbose)
+            newBids[gIdx] = condMVLocalUpdateState(state, gIdx, verbose)
+            
+        for gIdx in xrange(m):
+            state.setBid(gIdx, newBids[gIdx])
             
         d = numpy.linalg.norm(oldBids - newBids)
         
@@ -1,16 +1,16 @@
 from scipy.optimize import fmin
 import numpy
+from ssapy.util import revenueTable, bundle2idx
 
 def NegExpectedSurplusSamples(bid, bundleRevenueDict, evalSamples):
-    es = numpy.float64(0.)
+    table = revenueTable(bundleRevenueDict)
     
-    for sample in evalSamples:
-        goodsWon = sample <= bid
-        rev = bundleRevenueDict[(tuple(goodsWon))]
-        cost = numpy.dot(goodsWon,sample)
-        es += rev-cost
+    goodsWon = evalSamples <= bid
+    
+    rev  = table[bundle2idx(goodsWon)]
+    cost = numpy.sum(goodsWon*evalSamples,1)
         
-    return -(es/evalSamples.shape[0])
+    return -(numpy.sum(rev-cost)/evalSamples.shape[0])
 
 def downHillSS(bundleRevenueDict, initBid, evalSamples, 
                     maxiter = 100, disp = True,
@@ -18,7 +18,7 @@ def downHillSS(bundleRevenueDict, initBid, evalSamples,
     
     bid, expectedSurplus, nItr, nFncCalls, warnFlag = \
         fmin(NegExpectedSurplusSamples, x0 = initBid, 
-             args = (bundleRevenueDict,evalSamples), 
+             args = (revenueTable(bundleRevenueDict),evalSamples), 
              maxiter = maxiter, disp = disp,
              full_output = True, retall = False )
         
@@ -1,50 +1,34 @@
 import numpy
+from ssapy.util import revenueTable, bundle2idx, bundlePowers
+from ssapy.strategies.localSearchState import localSearchState
 
 def marginalUtilityDict_(bundleRevenueDict, bids, targetBid, sample):
-    bundleWon = sample <= bids
+    table = revenueTable(bundleRevenueDict)
     
-    posBundle = bundleWon.copy()
-    negBundle = bundleWon.copy()
-    posBundle[targetBid] = True
-    negBundle[targetBid] = False
+    idx = bundle2idx(sample <= bids)
+    bit = bundlePowers(sample.shape[0])[targetBid]
     
-    return bundleRevenueDict[tuple(posBundle)] - bundleRevenueDict[tuple(negBundle)]
+    return table[idx | bit] - table[idx & ~bit]
     
 def jointLocalUpdateMc(bundles, revenue, bids, targetBid, samples, verbose = False):
     """
     Compute jointLocalUpdate via monte carlo estimate of marginal revenue for good {j}
     """
-#    bundleRevenueDict = {}
-#    for bundle, r in zip(bundles,revenue):
-#        bundleRevenueDict[tuple(bundle)] = r
-    muj = numpy.float64(0.0)
-    goodsWon = samples <= bids
-    for w in goodsWon:
-#        w = sample <= bids
-        w[targetBid] = True
-        posIdx = numpy.where((bundles == w).all(axis=1))[0][0]
-        w[targetBid] = False
-        negIdx = numpy.where((bundles == w).all(axis=1))[0][0]
-        muj += revenue[posIdx]-revenue[negIdx]
-    
-    if verbose:
-        print muj / samples.shape[0]
-        
-    return muj/samples.shape[0]
+    return jointLocalUpdateMcDict(revenueTable(bundles, revenue), bids, targetBid, samples, verbose)
 
 def jointLocalUpdateMcDict(bundleRevenueDict, bids, targetBid, samples, verbose = False):
-    muj = numpy.float64(0.0)
+    """
+    Monte carlo estimate of the marginal revenue of good targetBid.
     
-    for sample in samples:
-#        muj += marginalUtilityDict_(bundleRevenueDict, bids, targetBid, sample)
-        bundleWon = sample <= bids
+    bundleRevenueDict may be a dictionary mapping tuple(bundle) -> revenue
+    or a revenue table (see ssapy.util.revenueTable).
+    """
+    table = revenueTable(bundleRevenueDict)
     
-        posBundle = bundleWon.copy()
-        negBundle = bundleWon.copy()
-        posBundle[targetBid] = True
-        negBundle[targetBid] = False
-        
-        muj += (bundleRevenueDict[tuple(posBundle)] - bundleRevenueDict[tuple(negBundle)])
+    idx = bundle2idx(samples <= bids)
+    bit = bundlePowers(samples.shape[1])[targetBid]
+    
+    muj = numpy.sum(table[idx | bit] - table[idx & ~bit])
         
     if verbose:
         print muj / samples.shape[0]
@@ -56,16 +40,15 @@ def jointLocalMc(bundles, revenue, initialBids, samples, maxItr = 100, tol = 1e-
     newBids   = numpy.atleast_1d(initialBids)
     converged = False
     
-    bundleRevenueDict = {}
-    for bundle, r in zip(bundles,revenue):
-        bundleRevenueDict[tuple(bundle)] = r
+    state = localSearchState(revenueTable(bundles, revenue), newBids, samples)
     
     for itr in xrange(maxItr):
         oldBids = newBids.copy()
         
         for gIdx in xrange(m):
 #            newBids[gIdx] = jointLocalUpdateMc(bundles, revenue, newBids, gIdx, samples, verbose)
-            newBids[gIdx] = jointLocalUpdateMcDict(bundleRevenueDict, newBids, gIdx, samples, verbose)
+            newBids[gIdx] = jointLocalUpdateState(state, gIdx, verbose)
+            state.setBid(gIdx, newBids[gIdx])
             
         if verbose:
             print 'newBids = {0}'.format(newBids)
@@ -118,36 +101,27 @@ def jointLocalUpdate( bundles, revenue, bids, targetBid, samples, verbose = Fals
         newBid     := (float) the new bid for the target good
     """
     
-    newBid = 0.0
-    
-    goodsWon = samples <= bids
-    
-    posIdxList = numpy.flatnonzero(bundles[:,targetBid] == True)
+    return jointLocalUpdateTable(revenueTable(bundles, revenue), bids, targetBid, samples, verbose)
+
+def jointLocalUpdateTable( table, bids, targetBid, samples, verbose = False ):
+    """
+    jointLocalUpdate given a revenue table (see ssapy.util.revenueTable).
+    """
+    return jointLocalUpdateState(localSearchState(table, bids, samples), targetBid, verbose)
+
+def jointLocalUpdateState( state, targetBid, verbose = False ):
+    """
+    jointLocalUpdate given a localSearchState.
     
-    nSamples = samples.shape[0]
+    The histogram of win patterns over the other goods is the sum of the 
+    pattern counts with and without the target good. The new bid is the dot 
+    product of that histogram with the revenue difference of each pattern 
+    with and without the target good.
+    """
+    pos, neg = state.withGood(targetBid)
     
-    for posIdx in posIdxList:
-        posBundle = bundles[posIdx,:]
-        negBundle = posBundle.copy()
-        negBundle[targetBid] = False
-        
-        negIdx = numpy.where( (bundles == negBundle).all(axis=1))[0][0]
-        
-        posRev = revenue[posIdx]
-        negRev = revenue[negIdx]
-        
-        p = numpy.float( numpy.count_nonzero( 
-                numpy.all(numpy.delete(goodsWon,targetBid,1) 
-                    == numpy.delete(posBundle,targetBid),1) ) )
-        
-        p/=nSamples
-        
-        if p > 1.0:
-            raise ValueError("p > 1.0")
-        elif p < 0.0:
-            raise ValueError("p < 0.0")
-        
-        newBid += (posRev - negRev)*p
+    newBid = numpy.dot(state.counts[pos] + state.counts[neg], 
+                       state.table[pos] - state.table[neg])/numpy.float(state.nSamples)
         
     if verbose:
         print newBid
@@ -212,11 +186,109 @@ def jointLocal(bundles, revenue, initialBids, samples, maxItr = 100, tol = 1e-5,
     newBids   = numpy.atleast_1d(initialBids).copy()
     converged = False
     
+    state = localSearchState(revenueTable(bundles, revenue), newBids, samples)
+    
+    for itr in xrange(maxItr):
+        oldBids = newBids.copy()
+        
+        for gIdx in xrange(m):
+            newBids[gIdx] = jointLocalUpdateState(state, gIdx, verbose)
+            state.setBid(gIdx, newBids[gIdx])
+                
+        d = numpy.linalg.norm(oldBids - newBids)
+        if d <= tol:
+            converged = True
+            break
+        
+    if ret == 'bids':
+        return newBids
+    elif ret == 'all':
+        return newBids, converged, itr + 1, d
+    else:
+        raise ValueError("Unknown Return String {0}".format(ret))
+
+def jointLocalExactUpdate(table, bids, targetBid, pricePrediction, verbose = False, **kwargs):
+    """
+    jointLocal update of good targetBid with the probability of every win pattern
+    of the other goods integrated analytically instead of counted from samples.
+    
+    INPUTS
+    ------
+    table           := (1d array-like) revenue table (see ssapy.util.revenueTable)
+    
+    bids            := (1d array-like) List of bids.
+    
+    targetBid       := (int) the (zero-indexed) bid to be updated.
+    
+    pricePrediction := a price distribution implementing otherBundleProbabilities(...),
+                       e.g. ssapy.pricePrediction.jointGMM
+    
+    kwargs          := integration method and accuracy controls passed to 
+                       otherBundleProbabilities (method, nPoints, nShifts, seed, 
+                       maxpts, abseps, releps, truncate)
+    
+    OUTPUTS
+    -------
+    newBid          := (float) the new bid for the target good
+    """
+    bids = numpy.atleast_1d(bids).astype(numpy.float)
+    
+    m   = bids.shape[0]
+    bit = bundlePowers(m)[targetBid]
+    
+    # p(winning exactly each pattern of the other goods), in the order of 
+    # the patterns of all goods which contain the target good
+    pOther = pricePrediction.otherBundleProbabilities(bids, targetBid, **kwargs)
+            
+    pos = numpy.arange(2**m)
+    pos = pos[(pos & bit) > 0]
+    
+    newBid = numpy.dot(pOther, table[pos] - table[pos & ~bit])
+    
+    if verbose:
+        print newBid
+        
+    return newBid
+
+def jointLocalExact(bundles, revenue, initialBids, pricePrediction, maxItr = 100, tol = 1e-5, 
+                    verbose = False, ret = 'bids', **kwargs):
+    """
+    jointLocal without samples; the win pattern probabilities are computed
+    from the price prediction (see jointLocalExactUpdate).
+    
+    By default (method = 'lattice') the probabilities are integrated with a
+    deterministic quasi Monte Carlo rule, so every update is a smooth function
+    of the other bids and the iteration converges to tol like jointLocal
+    does on a fixed set of samples.
+    
+    INPUTS
+    ------
+    bundles, revenue, initialBids, maxItr, tol, verbose, ret := see jointLocal(...)
+    
+    pricePrediction := a price distribution implementing otherBundleProbabilities(...)
+    
+    kwargs          := integration method and accuracy controls passed to 
+                       otherBundleProbabilities (method, nPoints, nShifts, seed, 
+                       maxpts, abseps, releps, truncate)
+                       
+    OUTPUTS
+    -------
+    see jointLocal(...)
+    """
+    kwargs.setdefault('method', 'lattice')
+    
+    m         = bundles.shape[1]
+    newBids   = numpy.atleast_1d(initialBids).astype(numpy.float)
+    converged = False
+    
+    table = revenueTable(bundles, revenue)
+    
     for itr in xrange(maxItr):
         oldBids = newBids.copy()
         
         for gIdx in xrange(m):
-            newBids[gIdx] = jointLocalUpdate(bundles, revenue, newBids, gIdx, samples, verbose)
+            newBids[gIdx] = jointLocalExactUpdate(table, newBids, gIdx, pricePrediction, 
+                                                  verbose, **kwargs)
                 
         d = numpy.linalg.norm(oldBids - newBids)
         if d <= tol:
@@ -228,4 +300,4 @@ def jointLocal(bundles, revenue, initialBids, samples, maxItr = 100, tol = 1e-5,
     elif ret == 'all':
         return newBids, converged, itr + 1, d
     else:
-        raise ValueError("Unknown Return String {0}".format(ret))
\ No newline at end of file
+        raise ValueError("Unknown Return String {0}".format(ret))
@@ -0,0 +1,107 @@
+"""
+this is /ssapy/strategies/localSearchState.py
+
+Shared state for the sample based coordinate ascent (local search) strategies
+(jointLocal, condLocal, condLocalLimit, condLocalZero, margLocal, ...).
+
+Every coordinate update of these strategies only depends on which goods each
+sample would win at the current bids. Between two updates only one bid, and
+therefore only one column of the win matrix, changes. localSearchState keeps
+the win matrix, the bitmask of each sample's win pattern and the histogram of
+win patterns and refreshes them one column at a time.
+"""
+
+import numpy
+from ssapy.util import bundlePowers
+
+class localSearchState(object):
+    """
+    Win matrix, win patterns and pattern counts of a set of price samples
+    at the current bid vector.
+
+    INPUTS
+    ------
+    table      := (1d array-like) revenue table, table[bundle2idx(b)] = revenue
+                  of bundle b (see ssapy.util.revenueTable)
+
+    bids       := (1d array-like) the current bids, one per good
+
+    samples    := (2d array-like) samples.shape = (nSamples, m)
+
+    strict     := (boolean) if True a good is won when sample < bid,
+                  otherwise when sample <= bid.
+    """
+    def __init__(self, table, bids, samples, strict = False):
+        self.table   = numpy.asarray(table, dtype = numpy.float)
+        self.samples = numpy.atleast_2d(samples)
+        self.strict  = strict
+
+        self.nSamples, self.m = self.samples.shape
+
+        if self.table.shape[0] != 2**self.m:
+            raise ValueError("localSearchState - table.shape[0] = {0} != 2**m = {1}".\
+                             format(self.table.shape[0], 2**self.m))
+
+        self.bits     = bundlePowers(self.m)
+        self.patterns = numpy.arange(2**self.m)
+
+        self.setBids(bids)
+
+    def _win(self, sampleCol, bid):
+        if self.strict:
+            return sampleCol < bid
+        else:
+            return sampleCol <= bid
+
+    def setBids(self, bids):
+        """
+        Recompute the complete state for a new bid vector.
+        """
+        self.bids = numpy.atleast_1d(bids).astype(numpy.float)
+
+        self.won = self._win(self.samples, self.bids)
+
+        self.idx = numpy.dot(self.won, self.bits)
+
+        self.counts = numpy.bincount(self.idx, minlength = 2**self.m)
+
+        self.nWon = numpy.sum(self.won, 0)
+
+    def setBid(self, j, bid):
+        """
+        Change the bid for good j refreshing only column j of the win matrix
+        and the counts of the patterns whose samples flipped.
+        """
+        self.bids[j] = bid
+
+        col = self._win(self.samples[:,j], bid)
+
+        flipped = numpy.flatnonzero(col != self.won[:,j])
+
+        if flipped.shape[0] == 0:
+            return
+
+        self.counts -= numpy.bincount(self.idx[flipped], minlength = 2**self.m)
+
+        self.idx[flipped] ^= self.bits[j]
+
+        self.counts += numpy.bincount(self.idx[flipped], minlength = 2**self.m)
+
+        self.won[:,j] = col
+
+        self.nWon[j] = numpy.count_nonzero(col)
+
+    def withGood(self, j):
+        """
+        Indices of the 2**(m-1) patterns containing good j and of
+        the same patterns with good j removed.
+        """
+        pos = self.patterns[(self.patterns & self.bits[j]) > 0]
+        return pos, pos & ~self.bits[j]
+
+    def pwin(self):
+        """
+        Fraction of samples for which each good is won.
+        """
+        return self.nWon/numpy.float(self.nSamples)
+
@@ -1,10 +1,6 @@
-#from ssapy.pricePrediction.margDistSCPP import margDistSCPP
-from ssapy.pricePrediction.jointGMM import jointGMM
-
-from scipy.stats import norm
-from scipy.interpolate import interp1d
-
 import numpy
+from ssapy.util import revenueTable
+from ssapy.strategies.localSearchState import localSearchState
 import matplotlib.pyplot as plt
 
 from straightMU import straightMU8, straightMU64, straightMU256
@@ -15,18 +11,19 @@ initStrategies = {'straightMU8': straightMU8,
 
 def margLocalMcUpdate(bundleRevenueDict, bids, j, 
                       samples, verbose = False):
-    newBid = 0.0
     
-    for sample in samples:
-        bundleWon = sample < bids
-        bundleWon[j] = True
-        
-        bundleLost = bundleWon.copy()
-        bundleLost[j] = False
-        
-        newBid += bundleRevenueDict[tuple(bundleWon)] - bundleRevenueDict[tuple(bundleLost)] 
-        
-    newBid /= samples.shape[0]
+    state = localSearchState(revenueTable(bundleRevenueDict), bids, samples, strict = True)
+    
+    return margLocalMcUpdateState(state, j, verbose)
+
+def margLocalMcUpdateState(state, j, verbose = False):
+    
+    pos, neg = state.withGood(j)
+    
+    newBid = numpy.dot(state.counts[pos] + state.counts[neg], 
+                       state.table[pos] - state.table[neg])
+    
+    newBid /= numpy.float(state.nSamples)
     
     if verbose:
         print '\tNew bid = {0}'.format(newBid)
@@ -39,13 +36,17 @@ def margLocalMc(bundleRevenueDict, initialBids, samples, maxItr = 100,
     m         = samples.shape[1]
     newBids   = numpy.atleast_1d(initialBids).copy()
     converged = False
+    
+    state = localSearchState(revenueTable(bundleRevenueDict), newBids, samples, strict = True)
         
     for itr in xrange(maxItr):
         oldBids = newBids.copy()
         
         for gIdx in xrange(m):
-            newBids[gIdx] = margLocalMcUpdate(bundleRevenueDict, 
-                               oldBids, gIdx, samples, verbose)
+            newBids[gIdx] = margLocalMcUpdateState(state, gIdx, verbose)
+            
+        for gIdx in xrange(m):
+            state.setBid(gIdx, newBids[gIdx])
             
         d = numpy.linalg.norm(oldBids - newBids)
         
@@ -85,40 +86,59 @@ def margLocalUpdate(bundles, revenue, bids, targetBidIdx, samples, verbose = Fal
     -------
         newBid     := (float) the new bid for the target good
     """
-    newBid = 0.0
-    
-    pwin = numpy.sum(samples <= bids, 0, dtype = float)/samples.shape[0]
+    state = localSearchState(revenueTable(bundles, revenue), bids, samples)
     
-    posIdxList = numpy.flatnonzero(bundles[:,targetBidIdx == True])
+    return margLocalUpdateState(state, targetBidIdx, verbose)
+
+def margLocalUpdateState(state, targetBidIdx, verbose = False):
+    """
+    margLocalUpdate given a localSearchState. The probability of winning each
+    pattern of the other goods is the product of the marginal probabilities
+    of winning (or losing) each good.
+    """
+    newBid = margLocalUpdatePwin(state.table, state.pwin(), targetBidIdx)
     
-    for posIdx in posIdxList:
-        posBundle = bundles[posIdx,:]
-        negBundle = posBundle.copy()
-        negBundle[targetBidIdx] = False
-        
-        negIdx = numpy.where( (bundles == negBundle).all(axis=1) )[0][0]
-        
-        posRev = revenue[posIdx]
-        negRev = revenue[negIdx]
-        
-        p = 1.0
-        for goodIdx, good in enumerate(posBundle):
-            if goodIdx == targetBidIdx:
-                pass
-            else:
-                if good:
-                    p*=pwin[goodIdx]
-                else:
-                    p*=(1-pwin[goodIdx])
-                    
-        if p > 1.0:
-            raise ValueError("p > 1.0")
-        elif p < 0.0:
-            raise ValueError(" p < 0.0")
-        
-        newBid += (posRev - negRev)*p
+    if verbose:
+        print newBid
         
     return newBid
+
+def margPatternProbability(pwin, targetBidIdx):
+    """
+    Probability of every win pattern of the goods other than targetBidIdx 
+    assuming independent prices.
+    
+    INPUTS
+    ------
+    pwin         := (1d array-like) pwin[k] is the probability of winning good k
+    
+    targetBidIdx := (int) the good left out of the patterns
+    
+    OUTPUTS
+    -------
+    p            := (1d array-like) shape = (2**(m-1),), p[i] is the probability
+                    of the pattern with bitmask i over the other goods (first good
+                    is the most significant bit). Patterns are ordered like the
+                    bundles containing targetBidIdx in listBundles(m).
+    """
+    p = numpy.ones(1)
+    for goodIdx, pw in enumerate(pwin):
+        if goodIdx != targetBidIdx:
+            p = numpy.outer(p, [1.0 - pw, pw]).ravel()
+    return p
+
+def margLocalUpdatePwin(table, pwin, targetBidIdx):
+    """
+    margLocal update of good targetBidIdx given a revenue table and 
+    the marginal probability of winning each good.
+    """
+    m   = pwin.shape[0]
+    bit = 2**(m - 1 - targetBidIdx)
+    
+    patterns = numpy.arange(2**m)
+    pos = patterns[(patterns & bit) > 0]
+    
+    return numpy.dot(margPatternProbability(pwin, targetBidIdx), table[pos] - table[pos & ~bit])
         
 def margLocal(bundles, revenue, initialBids, samples, maxItr = 100, tol= 1e-5, verbose = True, ret = 'bids'):
     """
@@ -168,10 +188,13 @@ def margLocal(bundles, revenue, initialBids, samples, maxItr = 100, tol= 1e-5, v
     newBids = numpy.atleast_1d(initialBids).copy()
     converged = False
     
+    state = localSearchState(revenueTable(bundles, revenue), newBids, samples)
+    
     for itr in xrange(maxItr):
         oldBid = newBids.copy()
         for gIdx in xrange(m):
-            newBids[gIdx] = margLocalUpdate(bundles,revenue, newBids, gIdx, samples, verbose)
+            newBids[gIdx] = margLocalUpdateState(state, gIdx, verbose)
+            state.setBid(gIdx, newBids[gIdx])
             
         d = numpy.linalg.norm(oldBid-newBids)
         
@@ -185,6 +208,70 @@ def margLocal(bundles, revenue, initialBids, samples, maxItr = 100, tol= 1e-5, v
         return newBids, converged, itr + 1, d
     
     
+def margLocalCdf(bundles, revenue, initialBids, margCdf, maxItr = 100, 
+                 tol = 1e-5, verbose = False, ret = 'bids', bidList = None):
+    """
+    margLocal with the probability of winning each good computed analytically 
+    from marginal cdfs instead of samples.
+    
+    The marginal cdfs are evaluated once at the initial bids and cached. After an 
+    update only the cdf of the updated good is re-evaluated, and only if its 
+    bid changed.
+    
+    INPUTS
+    ------
+    bundles     := (2d array-like) List of bundles
+        
+    revenue     := (1d array-like) List of revenue (1:1 correspondence with bundles)
+    
+    initialBids := (1d array-like) List of initial bids, 1 per good at auction.
+    
+    margCdf     := (callable) margCdf(x, margIdx) = p(price[margIdx] <= x), 
+                    e.g. jointGMM.margCdf
+    
+    maxItr, tol, verbose, ret := see margLocal(...)
+    
+    bidList     := (list) if not None, a copy of the bid vector is appended 
+                    after every update.
+    
+    OUTPUTS
+    -------
+    see margLocal(...)
+    """
+    m       = bundles.shape[1]
+    table   = revenueTable(bundles, revenue)
+    newBids = numpy.atleast_1d(initialBids).astype(numpy.float)
+    
+    pwin = numpy.asarray([margCdf(newBids[k], k) for k in xrange(m)], dtype = numpy.float)
+    
+    converged = False
+    for itr in xrange(maxItr):
+        oldBid = newBids.copy()
+        
+        for gIdx in xrange(m):
+            newBid = margLocalUpdatePwin(table, pwin, gIdx)
+            
+            if newBid != newBids[gIdx]:
+                newBids[gIdx] = newBid
+                pwin[gIdx] = margCdf(newBid, gIdx)
+                
+            if verbose:
+                print '\tbid[{0}] = {1}, p(win) = {2}'.format(gIdx, newBid, pwin[gIdx])
+                
+            if bidList is not None:
+                bidList.append(newBids.copy())
+                
+        d = numpy.linalg.norm(oldBid-newBids)
+        
+        if d <= tol:
+            converged = True
+            break
+        
+    if ret == 'bids':
+        return newBids
+    else:
+        return newBids, converged, itr + 1, d
+    
 def margLocalA(**kwargs):
     """
     Marg Local Analytic - computes probabilities analytically.
@@ -226,114 +313,23 @@ def margLocalA(**kwargs):
     if verbose:
         print 'initial bid = {0}'.format(bids)
     
-    if isinstance(pricePrediction,margDistSCPP):
-        cdf = []
-        for hist,binEdges in pricePrediction.data:
-            p = hist / numpy.float(numpy.dot(hist, numpy.diff(binEdges)))
-            c = numpy.hstack((0,numpy.cumsum(p*numpy.diff(binEdges),dtype=numpy.float)))
-            f = interp1d(binEdges,c,'linear')
-            cdf.append(f)
+    if not hasattr(pricePrediction, 'margCdf'):
+        raise ValueError("margLocalA - pricePrediction must provide margCdf(x, margIdx)")
             
     if vis or verboseOut:
-        bidList = [bids]
+        bidList = [numpy.atleast_1d(bids).copy()]
+    else:
+        bidList = None
     
-    converged = False
-    for itr in xrange(n_itr):
-        if verbose:
-            print 'itr = {0}, bid = {0}'.format(itr, bids)
-            
-        prevBid = bids.copy()
-        
-        for bidIdx in xrange(bids.shape[0]):
-            if verbose:
-                print '\tbidIdx = {0}'.format(bidIdx)
-            newBid = 0.0
-            
-            otherGoods = numpy.delete(numpy.arange(bids.shape[0]),bidIdx)
-            
-            for bundleIdx, bundle in enumerate(bundles):
-                val = valuation[bundleIdx]
-                
-                if verbose:
-                    print '\t\tbundle = {0}'.format(bundle)
-                    print '\t\tval = {0}'.format(val)
-                
-                
-                p = 1.0
-                
-                if isinstance(pricePrediction, jointGMM):
-                    for og in otherGoods:
-                        if bundle[og] == True:
-                            
-                            p *= pricePrediction.margCdf(x = bids[og], margIdx = og)
-                            if verbose:
-                                print '\t\t\t p*=cdf({0})'.format(bids[og])
-                                print '\t\t\tp = {0}'.format(p)
-                        else:
-                            p *= (1- pricePrediction.margCdf(x = bids[og], margIdx = og))
-                            if verbose:
-                                print '\t\t\tp*=(1-cdf({0}))'.format(bids[og])
-                                print '\t\t\tp = {0}'.format(p)
-                            
-                elif isinstance(pricePrediction, margDistSCPP):
-                    for og in otherGoods:
-                        if verbose:
-                            print '\t\t\tother good = {0}'.format(og)
-                            
-                        if bids[og] > pricePrediction.data[og][1][-1]:
-                            if verbose:
-                                print '\t\t\tbids[og] > pricePredicton.data[og][1][-1]'
-                            pass
-                            
-                        elif bids[og] < pricePrediction.data[og][1][0]:
-                            if verbose:
-                                print '\t\t\tbids[og] < pricePrediction.data[og][1][0]'
-                            p *= 1e-8
-                        elif bundle[og] == True:
-                            if verbose:
-                                print '\t\t\tbundle[og] == {0}'.format(bundle[og])
-                                print '\t\t\tcdf = {0}'.format(cdf[og](bids[og]))
-                            p*=cdf[og](bids[og])
-                        else:    
-                            if verbose:
-                                print '\t\t\tbundle[og] == {0}'.format(bundle[og])
-                                print '\t\t\t(1-cdf) = {0}'.format((1-cdf[og](bids[og])))
-                            p*=(1-cdf[og](bids[og]))
-                            
-                        if verbose:
-                            print '\t\t\tp = {0}'.format(p)
-                            
-                if bundle[bidIdx] == True:
-                    newBid += (val*p)
-                else:
-                    newBid -= (val*p)
-                    
-                if verbose:
-                    print '\t\tnewBid = {0}'.format(newBid)
-                    
-            bids[bidIdx] = newBid
-            
-            if verboseOut or vis:
-                bidList.append(bids)
-            
-        sse = numpy.dot(prevBid - bids, prevBid - bids)
-        
-        if verbose:
-            print ''
-            print 'Iteration = {0}'.format(itr)
-            print 'prevBid   = {0}'.format(prevBid)
-            print 'newBid    = {0}'.format(bids)
-            print 'sse       = {0}'.format(sse)
-            
-        if sse <= tol:
-            converged = True
-            if verbose:
-                print 'sse = {0} < tol = {1}'.format(sse,tol)
-                print 'converged = True'
-                
-            break
+    # margLocalA converges on the squared distance between iterations
+    bids, converged, itr, d = margLocalCdf(bundles, valuation, bids, 
+                                           lambda x, margIdx: pricePrediction.margCdf(x = x, margIdx = margIdx), 
+                                           maxItr = n_itr, tol = numpy.sqrt(tol), 
+                                           verbose = verbose, ret = 'all', bidList = bidList)
+    
+    if verbose:
+        print 'Iterations = {0}, converged = {1}, sse = {2}'.format(itr, converged, d**2)
                 
-            
     if vis:
         bidList = numpy.atleast_2d(bidList)
         plt.plot(bidList[:-1,0],bidList[:-1,1],'bo-',markerfacecolor=None)
@@ -0,0 +1,175 @@
+"""
+this is /ssapy/strategies/quasiNewton.py
+
+Bound constrained quasi-Newton (L-BFGS-B) bid optimization.
+
+The expected surplus over a fixed set of price samples is piecewise constant
+in the bids, so the indicator 1{price_j <= bid_j} is replaced by a normal cdf
+with a small bandwidth which makes the objective smooth and gives a gradient.
+The same samples are used for every evaluation (common random numbers).
+With a jointGMM price prediction the surplus and its gradient can also be
+integrated analytically (see jointGMM.expectedSurplus).
+"""
+import numpy
+from scipy.optimize import fmin_l_bfgs_b
+from scipy.special import ndtr
+
+from ssapy.util import revenueTable
+from ssapy.pricePrediction.jointGMM import expectedSurplus_
+
+def smoothedSurplusSamples(bid, bundleRevenueDict, evalSamples, bandwidth):
+    """
+    Smoothed expected surplus of a bid vector and its gradient.
+
+    Good j is won with probability ndtr((bid_j - price_j)/bandwidth_j)
+    independently given each sample, hence bundle b with the product of
+    the probabilities of winning the goods in b and losing the others.
+
+    INPUTS
+    ------
+    bid               := (1d array-like) the bid vector
+
+    bundleRevenueDict := a dictionary mapping tuple(bundle) -> revenue or a
+                         revenue table (see ssapy.util.revenueTable)
+
+    evalSamples       := (2d array-like) price samples, shape (nSamples, m)
+
+    bandwidth         := (float or 1d array-like) smoothing per good
+
+    OUTPUTS
+    -------
+    es                := (float) smoothed expected surplus
+
+    grad              := (1d array-like) d es / d bid
+    """
+    table = revenueTable(bundleRevenueDict)
+
+    evalSamples = numpy.atleast_2d(evalSamples)
+    n, m = evalSamples.shape
+
+    z = (numpy.asarray(bid, dtype = numpy.float) - evalSamples)/bandwidth
+
+    pwin = ndtr(z)
+    dpwin = numpy.exp(-0.5*z**2)/(numpy.sqrt(2*numpy.pi)*bandwidth)
+
+    # pattern[s,b] = p(sample s wins exactly bundle b), built one good at a
+    # time so that good 0 ends up as the most significant bit
+    pattern = numpy.ones((n,1))
+    for j in xrange(m):
+        pattern = numpy.dstack((pattern*(1.0 - pwin[:,j:j+1]),
+                                pattern*pwin[:,j:j+1])).reshape(n,-1)
+
+    rev  = numpy.dot(pattern, table)
+    cost = numpy.sum(pwin*evalSamples, 1)
+
+    # the probability of a pattern of the other goods is the sum of the
+    # probabilities of that pattern with and without good j
+    grad = numpy.mean(dpwin*(numpy.dot(pattern, marginalRevenueTable(table)) - evalSamples), 0)
+
+    return numpy.mean(rev - cost), grad
+
+def marginalRevenueTable(table):
+    """
+    (2**m, m) table with entry [b,j] the revenue gained by adding good j to
+    bundle b without good j, i.e. table[b | bit_j] - table[b & ~bit_j].
+    """
+    table = numpy.asarray(table, dtype = numpy.float)
+    m = int(numpy.log2(table.shape[0]))
+
+    idx  = numpy.arange(table.shape[0])
+    bits = 2**numpy.arange(m-1,-1,-1)
+
+    return table[idx[:,numpy.newaxis] | bits] - table[idx[:,numpy.newaxis] & ~bits]
+
+def NegSmoothedSurplusSamples(bid, bundleRevenueDict, evalSamples, bandwidth):
+    es, grad = smoothedSurplusSamples(bid, bundleRevenueDict, evalSamples, bandwidth)
+    return -es, -grad
+
+def NegExpectedSurplusGMM(bid, bundleRevenueDict, pricePrediction, kwargs):
+    es, grad = pricePrediction.expectedSurplus(bundleRevenueDict, bid, retGrad = True, **kwargs)
+    return -es, -grad
+
+def silvermanBandwidth(samples):
+    """
+    Rule of thumb (Silverman) normal kernel bandwidth of each column.
+    """
+    samples = numpy.atleast_2d(samples)
+    return (1.06*numpy.std(samples, 0)*samples.shape[0]**(-0.2)).clip(1e-6)
+
+def _minimize(negSurplus, args, table, initBid, bounds, maxiter, disp):
+    m = numpy.atleast_1d(initBid).shape[0]
+
+    if bounds is None:
+        # bidding more than the highest revenue never pays
+        bounds = [(0.0, max(numpy.max(table), 0.0))]*m
+
+    lower = numpy.asarray([b[0] for b in bounds], dtype = numpy.float)
+    upper = numpy.asarray([b[1] for b in bounds], dtype = numpy.float)
+
+    x0 = numpy.atleast_1d(initBid).astype(numpy.float).clip(lower, upper)
+
+    return fmin_l_bfgs_b(negSurplus, x0 = x0, args = args, bounds = bounds,
+                         maxiter = maxiter, iprint = 0 if disp else -1)
+
+def _ret(bid, negSurplus, info, clip, ret):
+    if clip:
+        bid = bid.clip(0)
+
+    if ret == 1:
+        return bid
+    elif ret == 2:
+        return bid, negSurplus
+    elif ret == 3:
+        return bid, negSurplus, info['nit']
+    elif ret == 4:
+        return bid, negSurplus, info['nit'], info['funcalls']
+    elif ret == 5:
+        return bid, negSurplus, info['nit'], info['funcalls'], info['warnflag']
+    else:
+        raise ValueError('Unknonw Return Code {0}'.format(ret))
+
+def quasiNewtonSS(bundleRevenueDict, initBid, evalSamples,
+                  bandwidth = None, bounds = None, maxiter = 100,
+                  disp = False, clip = True, ret = 1):
+    """
+    Maximize the smoothed expected surplus over evalSamples with L-BFGS-B.
+
+    ret takes the same codes as downHillSS(...):
+        1 - bid
+        2 - bid, negative expected surplus
+        3 - bid, negative expected surplus, number of iterations
+        4 - bid, negative expected surplus, number of iterations, number of function calls
+        5 - bid, negative expected surplus, number of iterations, number of function calls, warning flag
+    As with downHillSS(...) the minimized objective is returned, i.e. the
+    negative of the (unsmoothed) sample estimate of the expected surplus at
+    the returned bid.
+
+    bandwidth defaults to silvermanBandwidth(evalSamples) and bounds
+    (a list of (min, max) pairs, one per good) to [0, max revenue].
+    """
+    table = revenueTable(bundleRevenueDict)
+
+    evalSamples = numpy.atleast_2d(evalSamples)
+
+    if bandwidth is None:
+        bandwidth = silvermanBandwidth(evalSamples)
+
+    bid, negEs, info = _minimize(NegSmoothedSurplusSamples, (table, evalSamples, bandwidth),
+                                 table, initBid, bounds, maxiter, disp)
+
+    return _ret(bid, -expectedSurplus_(table, bid, evalSamples), info, clip, ret)
+
+def quasiNewtonGMM(bundleRevenueDict, initBid, pricePrediction,
+                   bounds = None, maxiter = 100, disp = False,
+                   clip = True, ret = 1, **kwargs):
+    """
+    Maximize the analytic expected surplus under a jointGMM price prediction
+    with L-BFGS-B. kwargs (truncate, maxpts, abseps, releps) are passed to
+    jointGMM.expectedSurplus(...). See quasiNewtonSS(...) for the return codes.
+    """
+    table = revenueTable(bundleRevenueDict)
+
+    bid, negEs, info = _minimize(NegExpectedSurplusGMM, (table, pricePrediction, kwargs),
+                                 table, initBid, bounds, maxiter, disp)
+
+    return _ret(bid, negEs, info, clip, ret)
@@ -12,18 +12,14 @@ Yoon and Wellman (2011)
 """
 
 import numpy
-from ssapy.util import marginalUtility
+from ssapy.util import marginalUtilities
 
 def straightMV(bundles, revenue, pricePrediction, verbose = False):
     b = numpy.atleast_2d(bundles)
     rev = numpy.atleast_1d(revenue)
     pp = numpy.atleast_1d(pricePrediction)
     
-    n_goods = bundles.shape[1]
-    marginalValueBid = numpy.zeros(n_goods,dtype=numpy.float64)
-    for goodIdx in xrange(n_goods):
-        marginalValueBid[goodIdx] = \
-                marginalUtility(b,rev,pp,goodIdx)
+    marginalValueBid = marginalUtilities(b,rev,pp)
                                  
     if verbose:
         print marginalValueBid
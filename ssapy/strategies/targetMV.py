@@ -1,6 +1,6 @@
 import numpy
 
-from ssapy.util import acq, marginalUtility, listBundles
+from ssapy.util import acq, marginalUtilities, listBundles
 
 def targetMV(bundles, revenue, pricePrediction, verbose = False):
     """
@@ -23,13 +23,7 @@ def targetMV(bundles, revenue, pricePrediction, verbose = False):
         print "optBundle  = {0}".format(optBundle)
         print "optSurplus = {0}".format(optSurplus)
         
-    n_goods = bundles.shape[1]
-    bid = numpy.zeros(n_goods, dtype = numpy.float)
-    
-    for goodIdx, good in enumerate(optBundle):
-        if good:
-            bid[goodIdx] = marginalUtility(bundles, valuation, 
-                                           pricePrediction, goodIdx)
+    bid = numpy.where(optBundle, marginalUtilities(b, rev, pp), 0.0)
             
     if verbose:
         print "bid = {0}".format(bid)
@@ -11,7 +11,7 @@ Modifications:
     Brandon A. Mayer - adapted strategy interface 1/1/2013
 """
 import numpy
-from ssapy.util import acq, marginalUtility
+from ssapy.util import acq, marginalUtilities
 def targetMVS(bundles, revenue, pricePrediction, verbose = False):
 
     ppView      = numpy.atleast_1d(pricePrediction).astype('float')
@@ -26,10 +26,7 @@ def targetMVS(bundles, revenue, pricePrediction, verbose = False):
         print "Optimal Bundle = {0}".format(optBundle.astype('int'))
         print "Price Prediction Copy = {0}".format(ppCopy)
     
-    bids = numpy.zeros(ppView.shape[0])
-    
-    for goodIdx in numpy.flatnonzero(optBundle == True):
-        bids[goodIdx] = marginalUtility(bundles, revenue, ppCopy, goodIdx)
+    bids = numpy.where(optBundle, marginalUtilities(bundles, revenue, ppCopy), 0.0)
     
     if verbose:
         print "bids = {0}".format(bids)    
@@ -0,0 +1,69 @@
+import unittest
+import numpy
+
+from ssapy.strategies.bestResponseLocal import bestResponseLocal
+from ssapy.pricePrediction.jointGMM import expectedSurplus_
+from ssapy import listBundles, msListRevenue
+from ssapy.util import revenueTable
+
+class test_bestResponseLocal(unittest.TestCase):
+    def test_bestResponseLocal1(self):
+        """
+        Same samples as test_jointLocal1:
+        v = [45,20], l = 1,
+        p(q = [20,15]) = 0.1, p(q = [20,20]) = 0.4,
+        p(q = [30,15]) = 0.1, p(q = [30,20]) = 0.4
+
+        Starting at [25,25] (good 2 always won):
+        1.1) winning good 1 at 20 gains 45-20-20 = 5, at 30 loses 5 -> b1 <- 20
+        1.2) good 2 only adds surplus when good 1 is lost (20 - q2 <= 5) and
+             costs q2 otherwise -> b2 <- 0
+        2.1) good 2 is lost, winning good 1 gains 45 - q1 > 0 -> b1 <- 30
+        2.2) b2 <- 0
+        3)   no bid changes, converged at [30,0] after 3 iterations
+        """
+        samples = numpy.zeros((1000,2))
+        samples[:100,:] = numpy.asarray([20,15])
+        samples[100:500,:] = numpy.asarray([20,20])
+        samples[500:600,:] = numpy.asarray([30,15])
+        samples[600:,:] = numpy.asarray([30,20])
+
+        bundles = listBundles(2)
+        revenue = msListRevenue(bundles, [45,20], 1)
+
+        bids, converged, itr, d = bestResponseLocal(bundles, revenue, [25.,25.], samples, ret = 'all')
+
+        numpy.testing.assert_array_equal(bids, [30.,0.])
+        numpy.testing.assert_(converged)
+        numpy.testing.assert_equal(itr, 3)
+
+    def test_coordinateOptimal(self):
+        numpy.random.seed(17)
+        m = 4
+        bundles = listBundles(m)
+        revenue = msListRevenue(bundles, [30., 25., 12., 6.], 2)
+        table   = revenueTable(bundles, revenue)
+
+        samples = numpy.round(numpy.random.uniform(0, 15, (500,m)))
+
+        initBids = numpy.ones(m)*10.
+
+        surplus = [expectedSurplus_(table, initBids, samples)]
+        for maxItr in xrange(1,4):
+            surplus.append(expectedSurplus_(table, bestResponseLocal(bundles, revenue, initBids, samples, maxItr), samples))
+
+        # monotone coordinate ascent
+        numpy.testing.assert_(numpy.all(numpy.diff(surplus) >= 0))
+
+        bids = bestResponseLocal(bundles, revenue, initBids, samples)
+        es   = expectedSurplus_(table, bids, samples)
+
+        # no single bid can be improved
+        for j in xrange(m):
+            for price in numpy.concatenate(([-1.], numpy.unique(samples[:,j]))):
+                b = bids.copy()
+                b[j] = price
+                numpy.testing.assert_(expectedSurplus_(table, b, samples) <= es + 1e-9)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+import numpy
+
+from ssapy.strategies.bidEval import bidEvalS
+from ssapy.pricePrediction.jointGMM import expectedSurplus_
+from ssapy import msDictRevenue
+
+class test_bidEval(unittest.TestCase):
+    def test_bidEvalS(self):
+        numpy.random.seed(18)
+        bundleRevenueDict = msDictRevenue([30., 25., 12.], 2)
+        
+        candidates = numpy.random.uniform(0, 20, (50,3))
+        evalSamples = numpy.random.uniform(0, 20, (400,3))
+        
+        es = [expectedSurplus_(bundleRevenueDict, c, evalSamples) for c in candidates]
+        
+        bid, maxSurplus = bidEvalS(bundleRevenueDict, candidates, evalSamples, ret = 'all', blockSize = 16)
+        
+        numpy.testing.assert_array_equal(bid, candidates[numpy.argmax(es)])
+        numpy.testing.assert_almost_equal(maxSurplus, numpy.max(es), 10)
+        
+        # no candidate with positive surplus -> zero bid
+        bid, maxSurplus = bidEvalS(bundleRevenueDict, candidates, evalSamples + 100., ret = 'all')
+        
+        numpy.testing.assert_array_equal(bid, numpy.zeros(3))
+        numpy.testing.assert_equal(maxSurplus, 0.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import numpy
+import itertools
+import multiprocessing
+
+from ssapy.strategies.bruteForce import bruteForceS, marginalRevenueBound, _searchGrid, _blockArgs
+from ssapy.pricePrediction.jointGMM import expectedSurplus_
+from ssapy import msDictRevenue
+
+class test_bruteForce(unittest.TestCase):
+    def setUp(self):
+        numpy.random.seed(19)
+        self.bundleRevenueDict = {(0,0): 0., (0,1): 7.5, (1,0): 12.3, (1,1): 14.}
+        self.samples = numpy.round(numpy.random.uniform(0, 20, (400,2)), 1)
+
+    def test_marginalRevenueBound(self):
+        numpy.testing.assert_array_almost_equal(marginalRevenueBound(self.bundleRevenueDict), [12.3, 7.5])
+
+    def test_bruteForceS(self):
+        xx = numpy.arange(0., 21., 2.)
+
+        maxSurplus = -numpy.inf
+        for c in itertools.product(xx, repeat = 2):
+            es = expectedSurplus_(self.bundleRevenueDict, numpy.atleast_1d(c), self.samples)
+            if es > maxSurplus:
+                bid, maxSurplus = numpy.atleast_1d(c), es
+
+        for kwargs in [{}, {'prune' : False}, {'blockSize' : 7}, {'blockSize' : 7, 'nProc' : 2}]:
+            b, es = bruteForceS(self.bundleRevenueDict, self.samples, max = 20., step = 2., ret = 'all', **kwargs)
+
+            numpy.testing.assert_array_equal(b, bid)
+            numpy.testing.assert_almost_equal(es, maxSurplus, 10)
+
+    def test_refine(self):
+        bundleRevenueDict = msDictRevenue([40., 25., 12.], 2)
+        samples = numpy.round(numpy.random.uniform(0, 25, (300,3)))
+
+        bid, es = bruteForceS(bundleRevenueDict, samples, max = 32., step = 1., ret = 'all')
+
+        coarseBid, coarseEs = bruteForceS(bundleRevenueDict, samples, max = 32., step = 1., ret = 'all', refine = 1)
+
+        numpy.testing.assert_(coarseEs <= es + 1e-10)
+        numpy.testing.assert_almost_equal(coarseEs, expectedSurplus_(bundleRevenueDict, coarseBid, samples), 10)
+
+    def test_workerFailure(self):
+        grids = [numpy.arange(5.)]*3
+
+        # samples of the wrong dimension make every block fail in the workers
+        self.assertRaises(ValueError, _searchGrid, numpy.zeros(8), grids, numpy.zeros((10,2)), 10, 2, False)
+
+        # no workers or worker arguments are left behind
+        numpy.testing.assert_equal(multiprocessing.active_children(), [])
+        numpy.testing.assert_equal(_blockArgs, {})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,8 @@
 import unittest
 import numpy
 
-from ssapy.strategies.jointLocal import jointLocalUpdate , jointLocal
+from ssapy.strategies.jointLocal import jointLocalUpdate , jointLocal, jointLocalUpdateMc, jointLocalExact
+from ssapy.pricePrediction.jointGMM import jointGMM
 from ssapy import listBundles, msListRevenue
 
 class test_jointLocalBid(unittest.TestCase):
@@ -104,6 +105,41 @@ class test_jointLocalBid(unittest.TestCase):
         
         numpy.testing.assert_almost_equal(tol, 0., 8, "margLocal tol failed", True)
         
+    def test_jointLocalUpdateMc(self):
+        m = 5
+        bundles = listBundles(m)
+        revenue = msListRevenue(bundles, [45., 40., 30., 10., 5.], 2)
+        
+        samples = numpy.random.uniform(0, 50, (500,m))
+        bids    = numpy.random.uniform(0, 50, m)
+        
+        for gIdx in xrange(m):
+            numpy.testing.assert_almost_equal(jointLocalUpdate(bundles, revenue, bids, gIdx, samples),
+                                              jointLocalUpdateMc(bundles, revenue, bids, gIdx, samples),
+                                              8, "jointLocalUpdate != jointLocalUpdateMc", True)
+            
+    def test_jointLocalExact(self):
+        numpy.random.seed(13)
+        m = 3
+        bundles = listBundles(m)
+        revenue = msListRevenue(bundles, [45., 30., 10.], 2)
+        
+        X = numpy.vstack([numpy.random.multivariate_normal([10.,20.,5.], numpy.eye(m)*9. + 3., 2000),
+                          numpy.random.multivariate_normal([30.,10.,25.], numpy.eye(m)*16., 2000)])
+        
+        gmm = jointGMM(n_components = 2)
+        gmm.fit(X)
+        
+        initBids = numpy.ones(m)*20.
+        
+        exactBids, converged, itr, d = jointLocalExact(bundles, revenue, initBids, gmm, ret = 'all')
+        
+        numpy.testing.assert_(converged, "jointLocalExact did not converge")
+        
+        mcBids = jointLocal(bundles, revenue, initBids, gmm.sample(n_samples = 100000))
+        
+        numpy.testing.assert_allclose(exactBids, mcBids, rtol = 0, atol = 0.5)
+        
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
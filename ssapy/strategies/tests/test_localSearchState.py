@@ -0,0 +1,53 @@
+import unittest
+import numpy
+
+from ssapy.strategies.localSearchState import localSearchState
+from ssapy import listBundles, msListRevenue
+from ssapy.util import revenueTable, bundle2idx
+
+class test_localSearchState(unittest.TestCase):
+    def setUp(self):
+        self.m = 4
+        bundles = listBundles(self.m)
+        revenue = msListRevenue(bundles, [40., 30., 20., 10.], 2)
+        self.table = revenueTable(bundles, revenue)
+        
+        self.samples = numpy.random.random_integers(0, 50, (300, self.m)).astype(numpy.float)
+        
+    def test_setBid(self):
+        """
+        Refreshing one column at a time must agree with recomputing the state.
+        """
+        for strict in [False, True]:
+            bids = numpy.random.uniform(0, 50, self.m)
+            
+            state = localSearchState(self.table, bids, self.samples, strict)
+            
+            for itr in xrange(20):
+                j = numpy.random.randint(self.m)
+                bids[j] = numpy.random.random_integers(0, 50)
+                state.setBid(j, bids[j])
+                
+                fresh = localSearchState(self.table, bids, self.samples, strict)
+                
+                numpy.testing.assert_array_equal(state.won, fresh.won)
+                numpy.testing.assert_array_equal(state.idx, fresh.idx)
+                numpy.testing.assert_array_equal(state.counts, fresh.counts)
+                numpy.testing.assert_array_equal(state.nWon, fresh.nWon)
+                
+            if strict:
+                won = self.samples < bids
+            else:
+                won = self.samples <= bids
+            numpy.testing.assert_array_equal(state.idx, bundle2idx(won))
+            
+    def test_withGood(self):
+        state = localSearchState(self.table, numpy.zeros(self.m), self.samples)
+        
+        pos, neg = state.withGood(1)
+        
+        numpy.testing.assert_array_equal(pos, [4,5,6,7,12,13,14,15])
+        numpy.testing.assert_array_equal(neg, [0,1,2,3,8,9,10,11])
+        
+if __name__ == "__main__":
+    unittest.main()
@@ -4,12 +4,14 @@ import unittest
 import numpy
 
 from ssapy import listBundles, msListRevenue, msRandomValueVector
-from ssapy.strategies.margLocal import margLocalA, margLocalUpdate, margLocal
+from ssapy.strategies.margLocal import margLocalA, margLocalUpdate, margLocal,\
+    margLocalCdf, margPatternProbability
 
 
 class test_margLocalBid(unittest.TestCase):
     def setUp(self):
-        self.ppFile = os.path.realpath("./jointGmmScppHob_straightMU8_m5_n8_00013.pkl")
+        self.ppFile = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                   "jointGmmScppHob_straightMU8_m5_n8_00013.pkl")
         with open(self.ppFile,'r') as f:
             self.pp = pickle.load(f)
             
@@ -90,6 +92,28 @@ class test_margLocalBid(unittest.TestCase):
         
         numpy.testing.assert_almost_equal(tol, 0., 8, "margLocal tol failed", True)
         
+        #same answer from the (empirical) marginal cdfs
+        nCalls = [0]
+        def margCdf(x, margIdx):
+            nCalls[0] += 1
+            return numpy.mean(samples[:,margIdx] <= x)
+        
+        bids, converged, itr, tol = margLocalCdf(bundles, revenue, [25.,25.], margCdf, ret = 'all')
+        
+        numpy.testing.assert_array_equal(bids, numpy.asarray([45,0]), "margLocalCdf bids test failed", True)
+        
+        numpy.testing.assert_equal(itr,3,"margLocalCdf number of iterations failed.", True)
+        
+        # 2 initial evaluations + one per bid change (25->10, 25->45, 10->0)
+        numpy.testing.assert_equal(nCalls[0], 5, "margLocalCdf cdf cache failed.", True)
+        
+    def test_margPatternProbability(self):
+        pwin = numpy.asarray([0.2, 0.5, 0.9])
+        
+        p = margPatternProbability(pwin, 1)
+        
+        numpy.testing.assert_almost_equal(p, [0.8*0.1, 0.8*0.9, 0.2*0.1, 0.2*0.9])
+        
        
         
 #    def test_vanillia(self):
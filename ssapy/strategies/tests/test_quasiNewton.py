@@ -0,0 +1,49 @@
+import unittest
+import numpy
+
+from ssapy.strategies.quasiNewton import quasiNewtonSS, smoothedSurplusSamples
+from ssapy.pricePrediction.jointGMM import expectedSurplus_
+from ssapy import listBundles, msListRevenue
+from ssapy.util import revenueTable
+
+class test_quasiNewton(unittest.TestCase):
+    def setUp(self):
+        numpy.random.seed(16)
+        self.m = 3
+        bundles = listBundles(self.m)
+        self.table = revenueTable(bundles, msListRevenue(bundles, [40., 30., 10.], 2))
+        self.samples = numpy.random.uniform(0, 30, (2000, self.m))
+
+    def test_smoothedSurplusGrad(self):
+        bid = numpy.asarray([12., 20., 5.])
+        bandwidth = numpy.asarray([1., 2., 0.5])
+
+        es, grad = smoothedSurplusSamples(bid, self.table, self.samples, bandwidth)
+
+        h = 1e-5
+        for j in xrange(self.m):
+            d = numpy.zeros(self.m)
+            d[j] = h
+            fd = (smoothedSurplusSamples(bid + d, self.table, self.samples, bandwidth)[0] - \
+                  smoothedSurplusSamples(bid - d, self.table, self.samples, bandwidth)[0])/(2*h)
+            numpy.testing.assert_almost_equal(grad[j], fd, 6)
+
+        # vanishing bandwidth recovers the sample estimate
+        numpy.testing.assert_almost_equal(smoothedSurplusSamples(bid, self.table, self.samples, 1e-9)[0],
+                                          expectedSurplus_(self.table, bid, self.samples), 8)
+
+    def test_quasiNewtonSS(self):
+        initBid = numpy.asarray([10., 10., 10.])
+
+        bid, es, nItr, nFncCalls, warnFlag = quasiNewtonSS(self.table, initBid, self.samples, ret = 5)
+
+        numpy.testing.assert_equal(bid.shape, (self.m,))
+        numpy.testing.assert_(numpy.all(bid >= 0) and numpy.all(bid <= 40.))
+        # negative surplus, as returned by downHillSS
+        numpy.testing.assert_almost_equal(es, -expectedSurplus_(self.table, bid, self.samples), 8)
+        numpy.testing.assert_(-es > expectedSurplus_(self.table, initBid, self.samples))
+
+        numpy.testing.assert_array_equal(quasiNewtonSS(self.table, initBid, self.samples), bid)
+
+if __name__ == "__main__":
+    unittest.main()
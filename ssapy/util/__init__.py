@@ -3,6 +3,23 @@ import itertools
 from ssapy.util.padnums import pprint_table
 import sys
 
+def bundlePowers(m = 5):
+    """
+    Powers of two used to convert bundles to integer bitmask indices.
+    
+    Good 0 is the most significant bit so that the bitmask of a bundle
+    is also its row index in listBundles(m).
+    
+    Inputs
+    ------
+        m        := (int) number of goods.
+        
+    Returns
+    -------
+        powers   := (1d numpy array dtype = int) [2**(m-1), ..., 2, 1]
+    """
+    return 2**numpy.arange(m-1,-1,-1,dtype=numpy.int64)
+
 def listBundles(m = 5):
     """
     Return a numpy 2d array of all possible bundles that the agent can
@@ -14,6 +31,9 @@ def listBundles(m = 5):
         
     Return bundles as booleans for storage and computational efficiency
     
+    Row i of the returned array is the bundle with bitmask index i 
+    (see bundle2idx and idx2bundle).
+    
     Inputs
     ------
         m        := (int) number of goods.
@@ -22,43 +42,88 @@ def listBundles(m = 5):
     -------
         bundles  := (2d numpy array dtype = bool)
     """
-    return numpy.atleast_2d([b for b in itertools.product([False,True],repeat=m)]).astype(bool)
+    return idx2bundle(numpy.arange(2**m), m)
 
 def bundle2idx(bundle = None):
-        numpy.testing.assert_(bundle.dtype == bool,
-                              msg="bundle.dtype = {0} != bool".format(bundle.dtype))
-        idx = 0
-        for i in xrange(bundle.shape[0]):
-            idx = (2**((bundle.shape[0]-1)-i))*bundle[i]
-            
-        return idx
+    """
+    Convert a bundle, or an array of bundles (one per row), to integer
+    bitmask indices with a single dot product against powers of two.
+    
+    Inputs
+    ------
+        bundle   := (1d or 2d array-like, bool or 0/1) bundles; the last 
+                    axis indexes goods.
+                    
+    Returns
+    -------
+        idx      := (int or 1d numpy array dtype = int) bitmask index of each bundle.
+    """
+    bundle = numpy.asarray(bundle)
+    
+    return numpy.dot(bundle.astype(numpy.int64), bundlePowers(bundle.shape[-1]))
     
 def idx2bundle(index, nGoods = 5):
-    """Convert to decimal rather than enumerating power set
-       and selecting correct bundle
     """
+    Convert an integer bitmask index, or an array of indices, 
+    to the corresponding bundle(s).
+    
+    Inputs
+    ------
+        index    := (int or 1d array-like) bitmask indices
         
-    index = int(index)
-    assert index >= 0,\
-        "simYW::bundleFromIndex index must be a positive integer."
+        nGoods   := (int) number of goods
         
-    assert nGoods >0,\
-        "simYw::bundleFromIndex nGoods must be a strictly positive integer."
+    Returns
+    -------
+        bundle   := (1d or 2d numpy array dtype = bool) 
+                    bundle.shape = index.shape + (nGoods,)
+    """
+    index = numpy.asarray(index, dtype = numpy.int64)
     
-    binList = []
-    n = index
-    while n > 0:
-        binList.insert(0,n%2)
-        n = n >> 1
+    assert numpy.all(index >= 0),\
+        "idx2bundle index must be a positive integer."
         
-    # just checking the index wasn't
-    # past the maximum bundle
-    if len(binList) > nGoods: raise ValueError, "simYW::bundleFromIndex Error: Dec-Binary Conversion."
+    assert nGoods >0,\
+        "idx2bundle nGoods must be a strictly positive integer."
     
-    for i in xrange(nGoods-len(binList)):
-        binList.insert(0,0)
+    if numpy.any(index >= 2**nGoods):
+        raise ValueError("idx2bundle index exceeds the number of bundles 2**{0}".format(nGoods))
+    
+    return (index[...,numpy.newaxis] & bundlePowers(nGoods)) > 0
+
+def revenueTable(bundles, revenue = None):
+    """
+    Build a flat revenue lookup table of length 2**m indexed by bundle bitmask.
+    
+    Revenue for every row of a (nSamples, m) win matrix can then be looked up
+    with table[bundle2idx(goodsWon)].
+    
+    Inputs
+    ------
+        bundles  := (2d array-like) bundles with revenue given in 1:1 correspondence, 
+                    or a dictionary mapping tuple(bundle) -> revenue, 
+                    or an existing revenue table (returned unchanged).
+        
+        revenue  := (1d array-like) revenue of each bundle. Required if 
+                    bundles is a 2d array.
+                    
+    Returns
+    -------
+        table    := (1d numpy array) table[bundle2idx(b)] is the revenue of bundle b.
+    """
+    if isinstance(bundles, dict):
+        revenue = numpy.atleast_1d(bundles.values()).astype(numpy.float)
+        bundles = numpy.atleast_2d(bundles.keys())
         
-    return numpy.atleast_1d(binList)
+    elif revenue is None:
+        return numpy.asarray(bundles, dtype = numpy.float)
+    
+    bundles = numpy.atleast_2d(bundles)
+    
+    table = numpy.zeros(2**bundles.shape[1])
+    table[bundle2idx(bundles)] = revenue
+    
+    return table
 
 def cost(bundles, price):
     """Compute the price of a list of bundles given closing prices of each good
@@ -84,29 +149,17 @@ def cost(bundles, price):
     
     price = numpy.atleast_1d(price).astype(numpy.float)
     
-    if (price == float('inf')).any():
-        # if there are items which are unobtainable (cost = inf)
-        # then the cost for the bundles containing that good should
-        # be inf but the bundles not containing those goods should be the 
-        # cost of other goods
-        
-        # lists are mutable, deep copy the original price vector
-        # in order to preserve the argument
-        unobtainableGoods = numpy.nonzero(price == float('inf'))[0]
-        # make a deep copy so not to mutate func. argument
-        priceInfZero = numpy.atleast_1d(numpy.array(price))
-        priceInfZero[unobtainableGoods] = 0
+    # goods which are unobtainable (price = inf) make every bundle 
+    # containing them cost inf; all other bundles cost the sum of 
+    # the remaining prices
+    unobtainable = numpy.isinf(price)
+    
+    cost = numpy.dot(bundles, numpy.where(unobtainable, 0.0, price))
+    
+    if unobtainable.any():
+        cost[numpy.dot(bundles, unobtainable.astype(int)) > 0] = numpy.float('inf')
         
-        cost = []
-        for idx in xrange(bundles.shape[0]):
-            if (bundles[idx][unobtainableGoods] == 0).all():
-                cost.append(numpy.dot(bundles[idx],priceInfZero))
-            else:
-                cost.append(float('inf'))
-                
-        return numpy.atleast_1d(cost)
-    else:
-        return numpy.atleast_1d([numpy.dot(bundle,price) for bundle in bundles])
+    return numpy.atleast_1d(cost)
     
 def surplus(bundles, valuation, priceVector):
         """
@@ -213,6 +266,70 @@ def acq(bundles, revenue, priceVector, verbose = False, ties = 'random'):
     return optBundle, optSurplus
             
         
+def marginalUtilities(bundles, revenue, priceVector):
+    """
+    Computes the marginal utility of every good given a revenue function
+    represented as a list of bundles and revenue arrays and one or many 
+    point price predictions.
+    
+    The marginal utility of good j is the optimal surplus with price[j] = 0 less
+    the optimal surplus with price[j] = inf. Both are masked maxima of one 
+    surplus matrix (prices x bundles x goods) so no acq(...) call is needed.
+    
+    INPUTS:
+        bundles       :=     (2d array-like)
+                             rows indicate individual bundles
+                             columns are individual goods
+                             
+        revenue       :=     (1d array-like) 
+                             a list of revenues in 1:1 correspondence 
+                             with bundles (rows).
+                             
+        priceVector   :=     (1d or 2d array-like) 
+                             A point price prediction or a matrix of point price
+                             predictions, one per row (e.g. price samples). 
+                             priceVector.shape[-1] == bundles.shape[1] == number of goods
+    Returns
+    -------
+        marginal utility (1d array-like) one per good or 
+                         (2d array-like) one row per price vector
+    """
+    bundles     = numpy.atleast_2d(bundles).astype(bool)
+    revenue     = numpy.atleast_1d(revenue).astype(numpy.float)
+    priceVector = numpy.asarray(priceVector, dtype = numpy.float)
+    
+    prices = numpy.atleast_2d(priceVector)
+    
+    unobtainable = numpy.isinf(prices).astype(int)
+    prices       = numpy.where(unobtainable, 0.0, prices)
+    
+    # surplus of each bundle ignoring unobtainable goods 
+    # and the number of unobtainable goods it contains,
+    # shape = (nPrices, nBundles)
+    splus  = revenue - numpy.dot(prices, bundles.T)
+    nInf   = numpy.dot(unobtainable, bundles.T)
+    
+    # shape = (nPrices, nBundles, nGoods)
+    inBundle = bundles[numpy.newaxis,:,:]
+    
+    # price[j] = 0: refund price[j] to the bundles containing j
+    # price[j] = inf: only bundles without j are obtainable
+    splusZero = splus[:,:,numpy.newaxis] + inBundle*prices[:,numpy.newaxis,:]
+    validZero = (nInf[:,:,numpy.newaxis] - inBundle*unobtainable[:,numpy.newaxis,:]) == 0
+    
+    validInf  = (~inBundle) & (nInf == 0)[:,:,numpy.newaxis]
+    
+    margUtil = numpy.max(numpy.where(validZero, splusZero, -numpy.inf), 1) -\
+               numpy.max(numpy.where(validInf, splus[:,:,numpy.newaxis], -numpy.inf), 1)
+    
+    if (margUtil < 0).any():
+        raise ValueError("marginalUtilities(...) - Negative Marginal Utility (shouldn't happen).")
+    
+    if priceVector.ndim < 2:
+        return margUtil[0]
+    else:
+        return margUtil
+            
 def marginalUtility(bundles, revenue, priceVector, goodIdx):
     """
     Computes the marginal utility of a specific good given a revenue function
@@ -237,24 +354,4 @@ def marginalUtility(bundles, revenue, priceVector, goodIdx):
     -------
         marginal utility (float)
     """
-#        priceVector = numpy.atleast_1d(priceVector)
-    priceVector = numpy.asarray(priceVector,dtype = numpy.float)
-    
-    tempPriceInf = priceVector.copy()
-    tempPriceInf[goodIdx] = numpy.float('inf')
-    
-    tempPriceZero = priceVector.copy()
-    tempPriceZero[goodIdx] = numpy.float(0.0)
-    
-
-    predictedSurplusInf = acq(bundles, revenue,
-                              tempPriceInf)[1]                                               
-                                                    
-    predictedSurplusZero = acq(bundles, revenue,
-                               tempPriceZero)[1]   
-                                                      
-    margUtil = predictedSurplusZero - predictedSurplusInf
-    if margUtil < 0:
-        raise ValueError("simYW.marginalUtility(...) - Negative Marginal Utility (shouldn't happen).")
-    
-    return margUtil
\ No newline at end of file
+    return marginalUtilities(bundles, revenue, priceVector)[goodIdx]
\ No newline at end of file
@@ -0,0 +1,166 @@
+"""
+this is /ssapy/util/chunkScheduler.py
+
+Dynamic scheduling of game simulations over a multiprocessing.Pool.
+
+Splitting nGames statically as [nGames//nProc]*nProc lets the slowest worker
+set the wall clock time whenever the cost per game varies (e.g. iterative
+bidders converging in 1 or 100 sweeps). Here the games are handed out in
+small chunks which idle workers pull from the pool's task queue. Chunk sizes
+follow guided self-scheduling (a fraction of the remaining games, so chunks
+shrink towards the end) and are further limited so that a chunk takes about
+targetTime seconds given the per game latency measured on the chunks that
+have finished so far. Results are returned in game order.
+"""
+import Queue
+import math
+import time
+
+def _timedChunk(func, start, stop, kwds):
+    t = time.time()
+    result = func(start, stop, **kwds)
+    return start, stop, time.time() - t, result
+
+class chunkScheduler(object):
+    """
+    Chooses the size of the next chunk of items.
+
+    Parameters
+    ----------
+    nItems: int
+        Total number of items (games).
+
+    nProc: int
+        Number of workers.
+
+    minChunk: int, optional - default = 1
+        Smallest chunk handed out (except for the last one).
+
+    maxChunk: int, optional - default = None (unbounded)
+        Largest chunk handed out.
+
+    targetTime: float, optional - default = 0.5
+        Desired run time of a chunk in seconds once the latency is known.
+    """
+    def __init__(self, nItems, nProc, minChunk = 1, maxChunk = None, targetTime = 0.5):
+        self.nItems     = nItems
+        self.nProc      = nProc
+        self.minChunk   = max(1, minChunk)
+        self.maxChunk   = maxChunk
+        self.targetTime = targetTime
+
+        self.next = 0
+
+        # finished items and the worker time they took
+        self.doneItems = 0
+        self.doneTime  = 0.0
+
+    def remaining(self):
+        return self.nItems - self.next
+
+    def latency(self):
+        """
+        Measured seconds per item, None before the first chunk finished.
+        """
+        if self.doneItems == 0:
+            return None
+        return self.doneTime/self.doneItems
+
+    def chunkSize(self):
+        remaining = self.remaining()
+
+        # guided self-scheduling, no chunk takes more than a fraction
+        # of the work left for each worker
+        size = int(math.ceil(remaining/(2.0*self.nProc)))
+
+        latency = self.latency()
+        if latency is None:
+            size = int(math.ceil(remaining/(4.0*self.nProc)))
+        elif latency > 0:
+            size = min(size, int(self.targetTime/latency))
+
+        if self.maxChunk is not None:
+            size = min(size, self.maxChunk)
+
+        return min(remaining, max(size, self.minChunk))
+
+    def nextChunk(self):
+        """
+        (start, stop) of the next chunk or None if all items are handed out.
+        """
+        if self.remaining() <= 0:
+            return None
+
+        start = self.next
+        self.next += self.chunkSize()
+
+        return start, self.next
+
+    def record(self, n, elapsed):
+        """
+        Account for a finished chunk of n items which took elapsed seconds.
+        """
+        self.doneItems += n
+        self.doneTime  += elapsed
+
+def dynamicMap(pool, func, nItems, nProc, kwds = {}, inFlight = 2, **kwargs):
+    """
+    Evaluate func(start, stop, **kwds) on pool for dynamically sized chunks
+    [start, stop) covering range(nItems).
+
+    At most inFlight*nProc chunks are queued at a time, so that idle workers
+    always find work while the chunk sizes can still follow the measured
+    latency. func must be picklable (a module level function).
+
+    Parameters
+    ----------
+    pool: multiprocessing.Pool
+
+    func: function
+        func(start, stop, **kwds) -> result for items [start, stop)
+
+    nItems, nProc, **kwargs:
+        see chunkScheduler (minChunk, maxChunk, targetTime)
+
+    Returns
+    -------
+    results: list
+        The results of all chunks ordered by start.
+
+    bounds: list
+        The matching (start, stop) of each chunk.
+    """
+    scheduler = chunkScheduler(nItems, nProc, **kwargs)
+
+    done    = Queue.Queue()
+    pending = []
+
+    def submit():
+        chunk = scheduler.nextChunk()
+        if chunk is None:
+            return
+        start, stop = chunk
+        pending.append(pool.apply_async(_timedChunk, (func, start, stop, kwds), callback = done.put))
+
+    for i in xrange(inFlight*nProc):
+        submit()
+
+    finished = []
+    while len(finished) < len(pending):
+        try:
+            start, stop, elapsed, result = done.get(timeout = 0.05)
+        except Queue.Empty:
+            # a failed job never calls back, re-raise its exception here
+            for r in pending:
+                if r.ready() and not r.successful():
+                    r.get()
+            continue
+
+        scheduler.record(stop - start, elapsed)
+        finished.append((start, stop, result))
+
+        submit()
+
+    finished.sort(key = lambda f: f[0])
+
+    return [f[2] for f in finished], [(f[0], f[1]) for f in finished]
@@ -5,7 +5,8 @@ from ssapy.agents.averageMU import averageMU
 from ssapy.agents.bidEvaluator import bidEvaluatorSMU8, bidEvaluatorSMU64, bidEvaluatorTMUS8, bidEvaluatorRaTMUS8
  
 #from aucSim.simultaneousAuction import *
-from ssapy.auctions.simultaneousAuction import simultaneousAuction 
+from ssapy.auctions.simultaneousAuction import clearAuctions
+from ssapy.agents.marketSchedule import batchRevenue as msBatchRevenue
 
 import numpy
 import multiprocessing
@@ -33,6 +34,24 @@ class parallelWorkerBase(object):
     def __call__(self,*args, **kwargs):
         raise AssertionError('Cannot Call a parallelWorkerBase')
     
+    def surplusFromBids(self, bids, v, l):
+        """
+        Clear every game at once and return the surplus of each agent in each game.
+        
+        bids := (nGames, nAgents, m) bids placed in each game
+        v    := (nGames, nAgents, m) value vector of each agent in each game
+        l    := (nGames, nAgents) lambda of each agent in each game
+        """
+        winners, finalPrices, winningBids = clearAuctions(bids)
+        
+        agentSurplus = numpy.zeros(bids.shape[:2])
+        for agentIdx in xrange(bids.shape[1]):
+            bundleWon = winners == agentIdx
+            agentSurplus[:,agentIdx] = msBatchRevenue(bundleWon, v[:,agentIdx,:], l[:,agentIdx]) -\
+                                        numpy.sum(bundleWon*finalPrices,1)
+                                        
+        return agentSurplus
+    
     def agentsFromType(self,**kwargs):
         """
         Construct agents from a list of strings. An agent factory.
@@ -143,31 +162,31 @@ class pwEqVl(parallelWorkerBase):
                                         m                  = self.m,
                                         margDistPrediction = self.margDistPrediction)
                
-        agentSurplus = []
+        nAgents = len(agentList)
+        
+        bids = numpy.zeros((self.nGames, nAgents, self.m))
+        v    = numpy.zeros((self.nGames, nAgents, self.m))
+        l    = numpy.zeros((self.nGames, nAgents), dtype = int)
         
         for g in xrange(0,self.nGames):
                         
-            v = numpy.random.random_integers(low = self.vmin, high = self.vmax, size= self.m)
+            vg = numpy.random.random_integers(low = self.vmin, high = self.vmax, size= self.m)
             
-            v.sort()
+            vg.sort()
             
-            v = v[::-1]
+            vg = vg[::-1]
             
-            l = numpy.random.random_integers(low = 1, high = self.m)
+            lg = numpy.random.random_integers(low = 1, high = self.m)
             
             for agent in agentList:
-                agent.v = v
-                agent.l = l
-            
-            auction = simultaneousAuction(agentList = agentList)
-            
-            auction.runAuction()
+                agent.v = vg
+                agent.l = lg
             
-            auction.notifyAgents()
+            bids[g,:,:] = [agent.bid() for agent in agentList]
+            v[g,:,:]    = vg
+            l[g,:]      = lg
             
-            agentSurplus.append( auction.agentSurplus() )
-            
-        return numpy.atleast_2d(agentSurplus).astype(numpy.float)
+        return self.surplusFromBids(bids, v, l)
     
     
 class pwEqNgames(parallelWorkerBase):
@@ -182,25 +201,25 @@ class pwEqNgames(parallelWorkerBase):
                                         m                  = self.m,
                                         margDistPrediction = self.margDistPrediction)
         
-        agentSurplus = []
+        nAgents = len(agentList)
+        
+        bids = numpy.zeros((self.nGames, nAgents, self.m))
+        v    = numpy.zeros((self.nGames, nAgents, self.m))
+        l    = numpy.zeros((self.nGames, nAgents), dtype = int)
         
         for g in xrange(self.nGames):
             
             # all agents draw new valuation function
-            for agent in agentList:
+            for agentIdx, agent in enumerate(agentList):
                 agent.randomValuation(vmin = self.vmin,
                                       vmax = self.vmax,
                                       m     = self.m)
                 
-            auction = simultaneousAuction(agentList = agentList)
-            
-            auction.runAuction()
-            
-            auction.notifyAgents()
+                bids[g,agentIdx,:] = agent.bid()
+                v[g,agentIdx,:]    = agent.v
+                l[g,agentIdx]      = agent.l
             
-            agentSurplus.append( auction.agentSurplus() )
-            
-        return numpy.atleast_2d(agentSurplus).astype(numpy.float)  
+        return self.surplusFromBids(bids, v, l)
     
 class pwVarNgames(parallelWorkerBase):
     """
@@ -219,24 +238,25 @@ class pwVarNgames(parallelWorkerBase):
                                         m                  = self.m,
                                         margDistPrediction = self.margDistPrediction)
                                         
-        agentSurplus = []
+        nAgents = len(agentList)
+        
+        bids = numpy.zeros((nGames, nAgents, self.m))
+        v    = numpy.zeros((nGames, nAgents, self.m))
+        l    = numpy.zeros((nGames, nAgents), dtype = int)
         
         for g in xrange(nGames):
             
             # all agents draw new valuation function
-            for agent in agentList:
+            for agentIdx, agent in enumerate(agentList):
                 agent.randomValuation(vmin = self.vmin,
                                       vmax = self.vmax,
                                       m     = self.m)
-                auction = simultaneousAuction(agentList = agentList)
-            
-            auction.runAuction()
-            
-            auction.notifyAgents()
-            
-            agentSurplus.append( auction.agentSurplus() )
+                
+                bids[g,agentIdx,:] = agent.bid()
+                v[g,agentIdx,:]    = agent.v
+                l[g,agentIdx]      = agent.l
             
-        return numpy.atleast_2d(agentSurplus).astype(numpy.float) 
+        return self.surplusFromBids(bids, v, l)
         
         
     
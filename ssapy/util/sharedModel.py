@@ -0,0 +1,126 @@
+"""
+this is /ssapy/util/sharedModel.py
+
+Publish a (fitted) price prediction once so that worker processes can use it
+without receiving a pickled copy with every task.
+
+The numpy arrays held by the model (e.g. jointGMM.weights_, means_, covars_)
+are written to .npy files in a fresh directory, in shared memory (/dev/shm)
+when available, and the model with those attributes removed is pickled next
+to them. A sharedModel handle only carries the directory name. Workers call
+get() which memory maps the arrays read-only, puts them back on the unpickled
+model and keeps the result for later tasks of the same publication.
+"""
+import numpy
+import cPickle as pickle
+import copy
+import os
+import shutil
+import tempfile
+
+# (pid, directory) -> model attached in this process
+_attached = {}
+
+def sharedDir():
+    """
+    Directory for files meant to live in memory: /dev/shm if writable, else None
+    (the system temporary directory).
+    """
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return None
+
+class sharedModel(object):
+    """
+    Handle to a published model (or list of models).
+
+    INPUTS
+    ------
+    model   := any picklable object; its ndarray attributes are stored as
+               memory mapped files. Lists and tuples are published element-wise.
+
+    dir     := (string) parent directory of the publication, defaults to
+               /dev/shm or the system temporary directory.
+    """
+    def __init__(self, model, dir = None):
+        if dir == None:
+            dir = sharedDir()
+
+        self.path  = tempfile.mkdtemp(prefix = 'ssapyModel_', dir = dir)
+        self.owner = os.getpid()
+
+        if isinstance(model, (list, tuple)):
+            self.isList = True
+            self.nItems = len(model)
+            items = model
+        else:
+            self.isList = False
+            self.nItems = 1
+            items = [model]
+
+        for idx, item in enumerate(items):
+            self._publish(idx, item)
+
+    def _publish(self, idx, model):
+        if hasattr(model, '__dict__'):
+            arrays = dict((k,v) for k,v in vars(model).iteritems() if isinstance(v, numpy.ndarray))
+        else:
+            arrays = {}
+
+        stub = copy.copy(model)
+        for k in arrays:
+            setattr(stub, k, None)
+
+        with open(os.path.join(self.path, '{0}.pkl'.format(idx)), 'wb') as f:
+            pickle.dump((stub, sorted(arrays.keys())), f, pickle.HIGHEST_PROTOCOL)
+
+        for k, v in arrays.iteritems():
+            numpy.save(os.path.join(self.path, '{0}_{1}.npy'.format(idx, k)), numpy.ascontiguousarray(v))
+
+    def _attach(self, idx):
+        with open(os.path.join(self.path, '{0}.pkl'.format(idx)), 'rb') as f:
+            model, names = pickle.load(f)
+
+        for k in names:
+            setattr(model, k, numpy.load(os.path.join(self.path, '{0}_{1}.npy'.format(idx, k)), mmap_mode = 'r'))
+
+        return model
+
+    def get(self):
+        """
+        The published model backed by read-only memory mapped arrays.
+        Attached once per process and publication.
+        """
+        key = (os.getpid(), self.path)
+        if key not in _attached:
+            # forget publications which have been released since
+            for k in [k for k in _attached if not os.path.isdir(k[1])]:
+                del _attached[k]
+
+            items = [self._attach(idx) for idx in xrange(self.nItems)]
+
+            _attached[key] = items if self.isList else items[0]
+
+        return _attached[key]
+
+    def release(self):
+        """
+        Remove the published files. Only the publishing process deletes them.
+        Workers which already attached keep valid mappings.
+        """
+        if os.getpid() == self.owner and os.path.isdir(self.path):
+            shutil.rmtree(self.path, ignore_errors = True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.release()
+
+def attachModel(model):
+    """
+    Resolve model if it is a sharedModel handle, otherwise return it unchanged.
+    """
+    if isinstance(model, sharedModel):
+        return model.get()
+    return model
@@ -0,0 +1,53 @@
+import unittest
+import numpy
+import itertools
+
+from ssapy.util import listBundles, bundle2idx, idx2bundle, revenueTable
+from ssapy.agents.marketSchedule import listRevenue, dictRevenue
+
+class test_bundles(unittest.TestCase):
+    def test_listBundles(self):
+        """
+        listBundles must keep the itertools.product ordering.
+        """
+        m = 4
+        bundles = listBundles(m)
+        
+        numpy.testing.assert_equal(bundles.dtype, bool)
+        numpy.testing.assert_equal(bundles, 
+            numpy.atleast_2d([b for b in itertools.product([False,True],repeat=m)]))
+        
+    def test_bundle2idx(self):
+        m = 5
+        bundles = listBundles(m)
+        
+        numpy.testing.assert_equal(bundle2idx(bundles), numpy.arange(2**m))
+        numpy.testing.assert_equal(bundle2idx(numpy.asarray([True,False,False])), 4)
+        
+    def test_idx2bundle(self):
+        numpy.testing.assert_equal(idx2bundle(4,3), numpy.asarray([True,False,False]))
+        numpy.testing.assert_equal(idx2bundle(numpy.arange(8),3), listBundles(3))
+        self.assertRaises(ValueError, idx2bundle, 8, 3)
+        
+    def test_revenueTable(self):
+        m = 3
+        v = [20.,15.,10.]
+        l = 2
+        bundles = listBundles(m)
+        revenue = listRevenue(bundles, v, l)
+        
+        table = revenueTable(bundles, revenue)
+        numpy.testing.assert_equal(table, revenue)
+        
+        numpy.testing.assert_equal(revenueTable(dictRevenue(v,l)), revenue)
+        
+        numpy.testing.assert_equal(revenueTable(table), revenue)
+        
+        # reversed bundle order must land in the same slots
+        numpy.testing.assert_equal(revenueTable(bundles[::-1], revenue[::-1]), revenue)
+        
+        goodsWon = numpy.asarray([[True,True,False],[False,False,True]])
+        numpy.testing.assert_equal(table[bundle2idx(goodsWon)], [15.,0.])
+        
+if __name__ == "__main__":
+    unittest.main()
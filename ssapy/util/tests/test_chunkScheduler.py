@@ -0,0 +1,65 @@
+import unittest
+import numpy
+import multiprocessing
+import time
+
+from ssapy.util.chunkScheduler import chunkScheduler, dynamicMap
+
+def _gameRange(start, stop, scale = 1):
+    # every 10th game is expensive
+    time.sleep(0.002*sum(10 if g % 10 == 0 else 1 for g in xrange(start, stop)))
+    return scale*numpy.arange(start, stop)
+
+def _fail(start, stop):
+    if start > 0:
+        raise ValueError("chunk {0}".format(start))
+    return start
+
+class test_chunkScheduler(unittest.TestCase):
+    def test_chunks(self):
+        scheduler = chunkScheduler(1000, 4)
+
+        chunks = []
+        chunk = scheduler.nextChunk()
+        while chunk is not None:
+            chunks.append(chunk)
+            chunk = scheduler.nextChunk()
+
+        # the chunks cover all items and shrink towards the end
+        numpy.testing.assert_equal(chunks[0][0], 0)
+        numpy.testing.assert_equal(chunks[-1][1], 1000)
+        numpy.testing.assert_array_equal([c[1] for c in chunks[:-1]], [c[0] for c in chunks[1:]])
+
+        sizes = numpy.diff(chunks,axis=1).ravel()
+        numpy.testing.assert_(numpy.all(numpy.diff(sizes) <= 0))
+        numpy.testing.assert_(sizes[0] <= 1000/(4*4) + 1)
+
+    def test_latency(self):
+        scheduler = chunkScheduler(10000, 2, targetTime = 0.5)
+        scheduler.nextChunk()
+
+        # 0.1 seconds per game -> chunks of 5 games
+        scheduler.record(10, 1.0)
+        numpy.testing.assert_equal(scheduler.chunkSize(), 5)
+
+        # but never less than minChunk
+        scheduler.minChunk = 8
+        numpy.testing.assert_equal(scheduler.chunkSize(), 8)
+
+    def test_dynamicMap(self):
+        pool = multiprocessing.Pool(3)
+        try:
+            results, bounds = dynamicMap(pool, _gameRange, 200, 3, {'scale' : 2}, targetTime = 0.02)
+
+            # results in game order
+            numpy.testing.assert_array_equal(numpy.concatenate(results), 2*numpy.arange(200))
+            numpy.testing.assert_equal(bounds[0][0], 0)
+            numpy.testing.assert_equal(bounds[-1][1], 200)
+
+            self.assertRaises(ValueError, dynamicMap, pool, _fail, 10, 3)
+        finally:
+            pool.terminate()
+            pool.join()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import numpy
+
+from ssapy.util import listBundles, cost, acq, marginalUtilities
+from ssapy.agents.marketSchedule import listRevenue, randomValueVector
+
+class test_marginalUtility(unittest.TestCase):
+    def test_cost(self):
+        bundles = listBundles(2)
+        
+        numpy.testing.assert_equal(cost(bundles, [3., 5.]), [0., 5., 3., 8.])
+        numpy.testing.assert_equal(cost(bundles, [3., numpy.inf]), [0., numpy.inf, 3., numpy.inf])
+        
+    def test_marginalUtilities(self):
+        """
+        v = [20,10], l = 1, prices = [5,5]
+        good 0: acq with p0 = 0 -> 20, acq with p0 = inf -> 10 - 5 = 5
+        good 1: acq with p1 = 0 -> 20 - 5 = 15, acq with p1 = inf -> 15
+        """
+        bundles = listBundles(2)
+        revenue = listRevenue(bundles, [20, 10], 1)
+        
+        numpy.testing.assert_equal(marginalUtilities(bundles, revenue, [5., 5.]), [15., 0.])
+        
+    def test_marginalUtilitiesAcq(self):
+        """
+        marginalUtilities must agree with two acq(...) calls per good,
+        including price vectors with unobtainable goods.
+        """
+        m = 5
+        bundles = listBundles(m)
+        
+        for itr in xrange(50):
+            v, l = randomValueVector(1, 50, m)
+            revenue = listRevenue(bundles, v, l)
+            
+            price = numpy.random.random_integers(0, 30, m).astype(numpy.float)
+            price[numpy.random.rand(m) < 0.2] = numpy.inf
+            
+            mu = marginalUtilities(bundles, revenue, price)
+            
+            for goodIdx in xrange(m):
+                pZero = price.copy()
+                pZero[goodIdx] = 0.
+                pInf = price.copy()
+                pInf[goodIdx] = numpy.inf
+                
+                numpy.testing.assert_almost_equal(mu[goodIdx], 
+                    acq(bundles, revenue, pZero)[1] - acq(bundles, revenue, pInf)[1])
+                
+    def test_marginalUtilitiesBatch(self):
+        """
+        A matrix of prices gives one row of marginal utilities per price vector.
+        """
+        m = 4
+        bundles = listBundles(m)
+        v, l = randomValueVector(1, 50, m)
+        revenue = listRevenue(bundles, v, l)
+        
+        prices = numpy.random.uniform(0, 30, (20, m))
+        prices[numpy.random.rand(20, m) < 0.1] = numpy.inf
+        
+        mu = marginalUtilities(bundles, revenue, prices)
+        
+        numpy.testing.assert_equal(mu.shape, (20, m))
+        
+        for price, row in zip(prices, mu):
+            numpy.testing.assert_almost_equal(row, marginalUtilities(bundles, revenue, price))
+        
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import numpy
+import pickle
+import os
+import multiprocessing
+
+from ssapy.util.sharedModel import sharedModel, attachModel
+from ssapy.pricePrediction.jointGMM import jointGMM
+
+def _meansInWorker(shared):
+    return numpy.array(shared.get().means_)
+
+class test_sharedModel(unittest.TestCase):
+    def setUp(self):
+        self.gmm = jointGMM(n_components = 2)
+        self.gmm.weights_ = numpy.array([0.3,0.7])
+        self.gmm.means_   = numpy.array([[3.,5.],[18.,10.]])
+        self.gmm.covars_  = numpy.array([numpy.eye(2), [[4.,1.],[1.,4.]]])
+        
+    def test_sharedModel(self):
+        with sharedModel(self.gmm) as shared:
+            # the handle itself carries no model parameters
+            numpy.testing.assert_(len(pickle.dumps(shared)) < len(pickle.dumps(self.gmm)))
+            
+            gmm = attachModel(shared)
+            
+            numpy.testing.assert_(isinstance(gmm.means_, numpy.memmap))
+            numpy.testing.assert_array_equal(gmm.covars_, self.gmm.covars_)
+            numpy.testing.assert_array_almost_equal(gmm.score(gmm.means_), self.gmm.score(self.gmm.means_))
+            
+            # attached once per process
+            numpy.testing.assert_(shared.get() is gmm)
+            
+            pool = multiprocessing.Pool(1)
+            numpy.testing.assert_array_equal(pool.apply(_meansInWorker, (shared,)), self.gmm.means_)
+            pool.close()
+            pool.join()
+            
+        numpy.testing.assert_(not os.path.exists(shared.path))
+        
+    def test_sharedModelList(self):
+        with sharedModel([self.gmm, numpy.ones(3)]) as shared:
+            models = shared.get()
+            
+            numpy.testing.assert_equal(len(models), 2)
+            numpy.testing.assert_array_equal(models[0].weights_, self.gmm.weights_)
+            numpy.testing.assert_array_equal(models[1], numpy.ones(3))
+        
+        numpy.testing.assert_(attachModel(self.gmm) is self.gmm)
+        
+if __name__ == "__main__":
+    unittest.main()